@@ -0,0 +1,184 @@
+import json
+import random
+import hashlib
+import argparse
+import itertools
+
+from pathlib import Path
+from typing import Dict, List
+
+
+# Head of the vocabulary, so queries and titles read like the ICS crawl
+SEED_WORDS = (
+    "computer science informatics research student faculty software engineering data machine learning "
+    "systems network security algorithm theory graphics vision database design human interaction course "
+    "lecture project lab paper conference professor undergraduate graduate admission program master "
+    "statistics artificial intelligence seminar department university irvine california bren school "
+    "information retrieval search engine web crawler index ranking compiler architecture distributed "
+    "parallel computing robotics biology genomics privacy cryptography visualization ubiquitous health "
+    "game education colloquium thesis dissertation advisor scholarship internship career news event "
+    "award grant publication journal workshop tutorial homework assignment exam schedule office hours"
+).split()
+
+SUBDOMAINS = (
+    "www", "cs", "informatics", "stat", "cml", "sdcl", "wics", "ngs", "vision", "mswe",
+    "isg", "hobbes", "grape", "intranet", "flamingo", "asterix", "evoke", "mhcid"
+)
+
+SYLLABLES = (
+    "ba", "be", "bi", "co", "da", "de", "di", "fa", "fo", "ga", "ge", "ka", "ko", "la", "le", "li",
+    "lo", "ma", "me", "mi", "mo", "na", "ne", "no", "pa", "pe", "po", "ra", "re", "ri", "ro", "sa",
+    "se", "si", "so", "ta", "te", "ti", "to", "va", "ve", "vi", "za", "zo", "tion", "ment", "ing", "er"
+)
+
+
+class CorpusGenerator:
+    """
+    Writes a synthetic ICS-like crawl in the DEV layout (<domain>/<hash>.json with url, content, encoding).
+
+    Word frequencies follow a Zipf distribution over the vocabulary, mixed with a
+    handful of page-specific keywords so pages are not all near-duplicates of one
+    another under SimHash. Pages have the title/heading/bold/paragraph structure
+    the indexer weights, and links favour popular pages on the same subdomain, so
+    HITS and PageRank have a skewed graph to work on. A fraction of pages are
+    near-copies of earlier ones to exercise SimHash deduplication.
+    """
+    def __init__(self, num_docs: int = 2000, vocab_size: int = 20000, zipf_exponent: float = 1.1,
+                 words_per_doc: int = 400, links_per_doc: int = 8, duplicate_rate: float = 0.02,
+                 keywords_per_doc: int = 30, keyword_share: float = 0.4, seed: int = 121):
+        self.num_docs = num_docs
+        self.keywords_per_doc = keywords_per_doc
+        self.keyword_share = keyword_share
+        self.keywords: List[str] = []
+        self.words_per_doc = words_per_doc
+        self.links_per_doc = links_per_doc
+        self.duplicate_rate = duplicate_rate
+        self.rng = random.Random(seed)
+        self.vocabulary = self._build_vocabulary(vocab_size)
+        self.word_weights = list(itertools.accumulate(
+            1.0 / rank ** zipf_exponent for rank in range(1, len(self.vocabulary) + 1)
+        ))
+        self.urls = [self._make_url(doc_idx) for doc_idx in range(num_docs)]
+        self.link_weights = list(itertools.accumulate(1.0 / rank for rank in range(1, num_docs + 1)))
+
+    def _build_vocabulary(self, vocab_size: int) -> List[str]:
+        vocabulary = list(dict.fromkeys(SEED_WORDS))[:vocab_size]
+        seen = set(vocabulary)
+        while len(vocabulary) < vocab_size:
+            word = "".join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(2, 4)))
+            if word not in seen:
+                seen.add(word)
+                vocabulary.append(word)
+        return vocabulary
+
+    def _make_url(self, doc_idx: int) -> str:
+        subdomain = SUBDOMAINS[int(self.rng.paretovariate(1.2)) % len(SUBDOMAINS)]
+        depth = self.rng.randint(1, 3)
+        path = "/".join(self.rng.choice(self.vocabulary[:500]) for _ in range(depth))
+        return f"https://{subdomain}.ics.uci.edu/{path}/{doc_idx}.html"
+
+    def _words(self, count: int) -> List[str]:
+        words = self.rng.choices(self.vocabulary, cum_weights=self.word_weights, k=count)
+        if self.keywords:
+            words = [self.rng.choice(self.keywords) if self.rng.random() < self.keyword_share else word for word in words]
+        return words
+
+    def _sentence(self, length: int) -> str:
+        return " ".join(self._words(length)).capitalize() + "."
+
+    def _links(self, doc_idx: int) -> List[str]:
+        host = self.urls[doc_idx].split("/")[2]
+        targets = self.rng.choices(self.urls, cum_weights=self.link_weights, k=self.links_per_doc * 2)
+        # Prefer same-subdomain targets, as real department sites do
+        targets.sort(key=lambda url: url.split("/")[2] != host)
+        links = [url for url in targets[:self.links_per_doc] if url != self.urls[doc_idx]]
+        if self.rng.random() < 0.3:
+            links.append(self.urls[doc_idx] + "#" + self.rng.choice(self.vocabulary[:100]))
+        if self.rng.random() < 0.2:
+            links.append(f"https://www.{self.rng.choice(self.vocabulary[:50])}.org/")
+        return links
+
+    def _html(self, doc_idx: int) -> str:
+        # What this page is about, drawn from outside the shared head of the vocabulary
+        self.keywords = self.rng.sample(self.vocabulary[100:], min(self.keywords_per_doc, len(self.vocabulary) - 100))
+        title = " ".join(self._words(self.rng.randint(2, 6))).title()
+        body_words = max(20, int(self.rng.gauss(self.words_per_doc, self.words_per_doc / 3)))
+        paragraphs = []
+        remaining = body_words
+        while remaining > 0:
+            length = min(remaining, self.rng.randint(20, 80))
+            sentences = [self._sentence(self.rng.randint(6, 18)) for _ in range(max(1, length // 12))]
+            if self.rng.random() < 0.4:
+                sentences.insert(1, f"<b>{' '.join(self._words(3))}</b>")
+            paragraphs.append(f"<p>{' '.join(sentences)}</p>")
+            if self.rng.random() < 0.25:
+                paragraphs.append(f"<h2>{' '.join(self._words(3)).title()}</h2>")
+            remaining -= length
+
+        links = "".join(
+            f'<li><a href="{url}">{" ".join(self._words(2))}</a></li>' for url in self._links(doc_idx)
+        )
+        return (
+            f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{title}</title></head><body>"
+            f"<div class=\"nav\"><a href=\"/\">Home</a> | <a href=\"/about\">About</a></div>"
+            f"<h1>{title}</h1>{''.join(paragraphs)}<ul>{links}</ul>"
+            f"<div class=\"footer\">Donald Bren School of Information and Computer Sciences</div>"
+            f"</body></html>"
+        )
+
+    def generate(self, corpus_dir: str) -> Dict[str, int]:
+        """Write the corpus, returns document and byte counts"""
+        root = Path(corpus_dir)
+        total_bytes = 0
+        pages: List[str] = []
+        for doc_idx, url in enumerate(self.urls):
+            if pages and self.rng.random() < self.duplicate_rate:
+                # Near-duplicate: an earlier page with a sentence appended
+                html = self.rng.choice(pages).replace("</body>", f"<p>{self._sentence(8)}</p></body>")
+            else:
+                html = self._html(doc_idx)
+            if len(pages) < 200:
+                pages.append(html)
+
+            domain_dir = root / url.split("/")[2].replace(".", "_")
+            domain_dir.mkdir(parents=True, exist_ok=True)
+            record = json.dumps({'url': url, 'content': html, 'encoding': 'utf-8'})
+            with open(domain_dir / f"{hashlib.sha256(url.encode()).hexdigest()}.json", "w") as f:
+                f.write(record)
+            total_bytes += len(record)
+
+        return {'docs': len(self.urls), 'bytes': total_bytes}
+
+    def write_vocabulary(self, path: str) -> None:
+        """Vocabulary in frequency rank order, used to draw benchmark queries"""
+        with open(path, "w") as f:
+            json.dump(self.vocabulary, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic ICS-like corpus in the DEV format")
+    parser.add_argument("out_dir", help="Corpus is written to <out_dir>/DEV, vocabulary to <out_dir>/vocabulary.json")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--vocab", type=int, default=20000)
+    parser.add_argument("--words-per-doc", type=int, default=400)
+    parser.add_argument("--links-per-doc", type=int, default=8)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of word frequencies")
+    parser.add_argument("--seed", type=int, default=121)
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(
+        num_docs=args.docs,
+        vocab_size=args.vocab,
+        zipf_exponent=args.zipf,
+        words_per_doc=args.words_per_doc,
+        links_per_doc=args.links_per_doc,
+        seed=args.seed
+    )
+    out_dir = Path(args.out_dir)
+    stats = generator.generate(out_dir / "DEV")
+    generator.write_vocabulary(out_dir / "vocabulary.json")
+    print(f"Wrote {stats['docs']} documents ({stats['bytes'] / 1024 / 1024:.1f} MB) to {out_dir / 'DEV'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import io
+import os
+import json
+import time
+import random
+import shutil
+import tarfile
+import zipfile
+import argparse
+import contextlib
+
+from pathlib import Path
+from typing import Dict
+
+from benchmarks.query_latency import prepare_corpus, peak_rss_mb
+
+
+def sample_corpus(source_dir: Path, sample_dir: Path, num_files: int, seed: int) -> Path:
+    """Link a random subset of an existing DEV-layout corpus into sample_dir"""
+    files = sorted(source_dir.glob("*/*.json"))
+    chosen = random.Random(seed).sample(files, min(num_files, len(files)))
+    shutil.rmtree(sample_dir, ignore_errors=True)
+    for path in chosen:
+        target = sample_dir / path.parent.name / path.name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            target.symlink_to(path.resolve())
+        except OSError:
+            shutil.copy2(path, target)
+    return sample_dir
+
+
+def pack_corpus(data_dir: Path, corpus_format: str) -> Path:
+    """Repack a DEV-layout corpus as a zip, tar.gz or JSONL file next to it (reused when present)"""
+    if corpus_format == "dir":
+        return data_dir
+    files = sorted(data_dir.glob("*/*.json"))
+    suffix = {'zip': '.zip', 'tar': '.tar.gz', 'jsonl': '.jsonl'}[corpus_format]
+    packed = data_dir.with_name(data_dir.name + suffix)
+    if packed.exists():
+        return packed
+    print(f"Packing {len(files)} files into {packed}")
+    if corpus_format == "zip":
+        with zipfile.ZipFile(packed, "w", zipfile.ZIP_DEFLATED) as archive:
+            for path in files:
+                archive.write(path, path.relative_to(data_dir))
+    elif corpus_format == "tar":
+        with tarfile.open(packed, "w:gz") as archive:
+            for path in files:
+                archive.add(path, str(path.relative_to(data_dir)))
+    else:
+        with open(packed, "w") as out:
+            for path in files:
+                with open(path) as f:
+                    out.write(json.dumps(json.load(f)) + "\n")
+    return packed
+
+
+def run_build(data_dir: Path, mode: str, num_workers: int, corpus_format: str = "dir") -> Dict:
+    """Run the full indexing pipeline with the build profiler active (cwd must be the work dir)"""
+    from indexer import Indexer, run_pipeline
+    from multithread_indexer import MultithreadedIndexer
+    from utils.build_profiler import BuildProfiler, activate
+    from utils.constants import PARTIAL_DIR, RANGE_DIR, CONFIG
+
+    # Leftover partials from an earlier run would be merged into this build
+    for stale_dir in (PARTIAL_DIR, RANGE_DIR):
+        shutil.rmtree(stale_dir, ignore_errors=True)
+
+    input_files = list(data_dir.glob("*/*.json"))
+    corpus_bytes = sum(path.stat().st_size for path in input_files)
+    corpus_path = pack_corpus(data_dir, corpus_format)
+    if mode == "threaded":
+        indexer = MultithreadedIndexer(str(corpus_path), num_workers=num_workers)
+    else:
+        indexer = Indexer(str(corpus_path))
+
+    profiler = BuildProfiler()
+    activate(profiler)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_pipeline(indexer)
+    finally:
+        activate(None)
+    wall_s = time.perf_counter() - wall_start
+    cpu_s = time.process_time() - cpu_start
+
+    return {
+        'mode': mode,
+        'corpus_format': corpus_format,
+        'read_ahead_docs': CONFIG['read_ahead_docs'],
+        'workers': num_workers if mode == "threaded" else 1,
+        'input_files': len(input_files),
+        'docs_indexed': len(indexer.documents),
+        'corpus_bytes': corpus_bytes,
+        'wall_s': wall_s,
+        'cpu_s': cpu_s,
+        'docs_per_s': len(input_files) / wall_s,
+        'bytes_per_s': corpus_bytes / wall_s,
+        'peak_rss_mb': peak_rss_mb(),
+        'max_index_size': CONFIG['max_index_size'],
+        **profiler.report()
+    }
+
+
+def print_report(report: Dict) -> None:
+    print(f"\n{report['mode']} indexer, {report['workers']} worker(s), {report['corpus_format']} corpus: "
+          f"{report['input_files']} files ({report['corpus_bytes'] / 1024 / 1024:.1f} MB), "
+          f"{report['docs_indexed']} indexed after dedup")
+    print(f"Wall {report['wall_s']:.2f} s, CPU {report['cpu_s']:.2f} s, "
+          f"{report['docs_per_s']:.1f} docs/s, {report['bytes_per_s'] / 1024 / 1024:.2f} MB/s")
+    if report['peak_rss_mb'] is not None:
+        print(f"Peak RSS {report['peak_rss_mb']:.1f} MB")
+    print(f"Partial flushes: {report['flushes']['count']} ({report['flushes']['bytes'] / 1024 / 1024:.1f} MB)")
+
+    print(f"\n{'Stage':<16} {'Wall s':>9} {'CPU s':>9} {'Calls':>9}")
+    for name, stats in report['stages'].items():
+        print(f"{name:<16} {stats['wall_s']:>9.3f} {stats['cpu_s']:>9.3f} {stats['calls']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexing throughput benchmark with per-stage profiling")
+    parser.add_argument("work_dir", help="Directory for the corpus and build outputs")
+    parser.add_argument("--mode", choices=("single", "threaded"), default="single")
+    parser.add_argument("--workers", type=int, default=4, help="Threads for --mode threaded")
+    parser.add_argument("--docs", type=int, default=2000, help="Documents to generate when no corpus exists")
+    parser.add_argument("--sample-from", help="Sample an existing DEV-layout corpus instead of generating one")
+    parser.add_argument("--sample", type=int, default=1000, help="Files to sample with --sample-from")
+    parser.add_argument("--format", choices=("dir", "zip", "tar", "jsonl"), default="dir",
+                        help="Read the corpus as a directory, or repacked as a zip, tar.gz or JSONL file")
+    parser.add_argument("--read-ahead", type=int, default=None,
+                        help="Documents decoded ahead of the indexer (CONFIG['read_ahead_docs']), 0 reads inline")
+    parser.add_argument("--seed", type=int, default=121)
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    work_dir = Path(args.work_dir).resolve()
+    work_dir.mkdir(parents=True, exist_ok=True)
+    if args.sample_from:
+        data_dir = sample_corpus(Path(args.sample_from).resolve(), work_dir / "sample", args.sample, args.seed)
+    else:
+        prepare_corpus(work_dir, args.docs, args.seed)
+        data_dir = work_dir / "DEV"
+
+    if args.read_ahead is not None:
+        from utils.constants import CONFIG
+        CONFIG['read_ahead_docs'] = args.read_ahead
+
+    json_path = Path(args.json).resolve() if args.json else None
+    os.chdir(work_dir)
+    report = run_build(data_dir, args.mode, args.workers, args.format)
+    print_report(report)
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import subprocess
+import contextlib
+
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.corpus_generator import CorpusGenerator
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# (name, min terms, max terms), matching the rows of the README latency table
+QUERY_SETS = (
+    ("single", 1, 1),
+    ("multi", 2, 4),
+    ("complex", 5, 8)
+)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process, None where the resource module is unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    cuts = statistics.quantiles(latencies_ms, n=100, method="inclusive") if len(latencies_ms) > 1 else latencies_ms * 99
+    total_s = sum(latencies_ms) / 1000
+    return {
+        'queries': len(latencies_ms),
+        'mean_ms': statistics.fmean(latencies_ms),
+        'p50_ms': cuts[49],
+        'p95_ms': cuts[94],
+        'p99_ms': cuts[98],
+        'max_ms': max(latencies_ms),
+        'qps': len(latencies_ms) / total_s if total_s else 0.0
+    }
+
+
+def make_queries(vocabulary: List[str], count: int, min_terms: int, max_terms: int, rng: random.Random) -> List[str]:
+    """Queries drawn with a Zipf bias towards frequent words, like real query logs"""
+    head = vocabulary[:2000]
+    weights = [1.0 / rank for rank in range(1, len(head) + 1)]
+    return [
+        " ".join(rng.choices(head, weights=weights, k=rng.randint(min_terms, max_terms)))
+        for _ in range(count)
+    ]
+
+
+def prepare_corpus(work_dir: Path, num_docs: int, seed: int) -> None:
+    if (work_dir / "DEV").exists() and (work_dir / "vocabulary.json").exists():
+        return
+    print(f"Generating {num_docs} documents in {work_dir / 'DEV'}")
+    generator = CorpusGenerator(num_docs=num_docs, seed=seed)
+    generator.generate(work_dir / "DEV")
+    generator.write_vocabulary(work_dir / "vocabulary.json")
+
+
+def build_index(work_dir: Path) -> float:
+    """Run indexer.py against work_dir/DEV, returns wall time in seconds"""
+    print(f"Building index in {work_dir}")
+    started_at = time.perf_counter()
+    build = subprocess.run([sys.executable, str(REPO_DIR / "indexer.py")], cwd=work_dir,
+                           capture_output=True, text=True)
+    if build.returncode != 0:
+        print(build.stderr[-4000:])
+        raise RuntimeError(f"indexer.py exited with status {build.returncode}")
+    return time.perf_counter() - started_at
+
+
+def run_query_sets(queries_per_set: int, warmup: int, seed: int, use_result_cache: bool) -> Dict:
+    """Replay every query set against SearchEngine.search in this process (cwd must be the work dir)"""
+    from search import SearchEngine, open_file_handler
+    from utils.constants import CONFIG
+
+    if not use_result_cache:
+        CONFIG['result_cache_size'] = 0
+
+    with open("vocabulary.json") as f:
+        vocabulary = json.load(f)
+    rng = random.Random(seed)
+
+    load_start = time.perf_counter()
+    engine = SearchEngine()
+    report = {'sets': {}}
+    with open_file_handler() as fh:
+        report['load_ms'] = (time.perf_counter() - load_start) * 1000
+
+        # First queries pay for lazy imports and a cold postings cache
+        with contextlib.redirect_stdout(io.StringIO()):
+            for query in make_queries(vocabulary, warmup, 1, 4, rng):
+                engine.search(query, 10, fh)
+
+        for name, min_terms, max_terms in QUERY_SETS:
+            latencies = []
+            approximate = 0
+            for query in make_queries(vocabulary, queries_per_set, min_terms, max_terms, rng):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    started_at = time.perf_counter()
+                    results = engine.search(query, 10, fh)
+                    latencies.append((time.perf_counter() - started_at) * 1000)
+                approximate += any(result.approximate for result in results)
+            report['sets'][name] = {**latency_summary(latencies), 'approximate': approximate}
+
+        report['postings_cache'] = fh.cache_stats()
+        if fh.champions is not None:
+            report['champion_cache'] = fh.champions.cache_stats()
+    report['peak_rss_mb'] = peak_rss_mb()
+    return report
+
+
+def print_report(report: Dict) -> None:
+    print(f"\n{'Query set':<10} {'Queries':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'Max ms':>9} {'QPS':>8}")
+    for name, stats in report['sets'].items():
+        print(
+            f"{name:<10} {stats['queries']:>8} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+            f"{stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f} {stats['qps']:>8.1f}"
+        )
+    print(f"\nEngine load:     {report['load_ms']:.0f} ms")
+    if report.get('build_s') is not None:
+        print(f"Index build:     {report['build_s']:.1f} s")
+    if report['peak_rss_mb'] is not None:
+        print(f"Peak RSS:        {report['peak_rss_mb']:.1f} MB")
+    print(f"Postings cache:  {report['postings_cache']['hit_rate']:.1%} hit rate")
+    if 'champion_cache' in report:
+        print(f"Champion cache:  {report['champion_cache']['hit_rate']:.1%} hit rate")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query latency benchmark on a synthetic corpus")
+    parser.add_argument("work_dir", help="Directory for the generated corpus and index (reused when present)")
+    parser.add_argument("--docs", type=int, default=2000, help="Documents to generate")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per query set")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=121)
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index even if one exists")
+    parser.add_argument("--result-cache", action="store_true", help="Keep the query result cache enabled")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    work_dir = Path(args.work_dir).resolve()
+    work_dir.mkdir(parents=True, exist_ok=True)
+    prepare_corpus(work_dir, args.docs, args.seed)
+
+    build_s = None
+    if args.rebuild or not (work_dir / "full_analytics" / "index_peek.pkl").exists():
+        build_s = build_index(work_dir)
+
+    json_path = Path(args.json).resolve() if args.json else None
+    os.chdir(work_dir)
+    report = run_query_sets(args.queries, args.warmup, args.seed, args.result_cache)
+    report['build_s'] = build_s
+    report['docs'] = args.docs
+    print_report(report)
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -69,15 +69,6 @@ class DocumentProcessor:
             token_count=len(tokenize(text))
         )
 
-    def is_near_duplicate(self, simhash: str, existing_docs: Dict[int, Document], threshold: float) -> bool:
-        """Check if document is a near-duplicate"""
-        for existing_doc in existing_docs.values():
-            similarity_score = 1 - self.simhasher.hamming_distance(simhash, existing_doc.simhash) / self.simhasher.b
-            if similarity_score >= threshold:
-                # print(f"\tNear-duplicate document detected to {existing_doc.doc_id}, being {100*similarity_score:.2f}% similar")
-                return True
-        return False
-
     def extract_links(self, soup: BeautifulSoup, base_url: str) -> List[str]:
         """Extract and normalize all links from the document"""
         links = []
@@ -7,7 +7,8 @@ from collections import defaultdict
 from typing import Dict, List, Tuple
 from dataclasses import dataclass
 
-from components.document_processor import Document
+from utils.doc_table import DocumentTable
+from utils.build_profiler import stage, record_flush
 from utils.constants import (
     CONFIG,
     PARTIAL_DIR,
@@ -33,7 +34,7 @@ class IndexManager:
         self.partial_index_count = 0
         self.index_size = sys.getsizeof(self.index)
 
-    def _calculate_tf_idf_for_postings(self, postings: List[Posting], documents: Dict[int, Document], num_docs: int) -> List[Posting]:
+    def calculate_tf_idf_for_postings(self, postings: List[Posting], documents: DocumentTable, num_docs: int) -> List[Posting]:
         """Generic function to calculate TF-IDF scores for a list of postings"""
         # IDF calculation
         doc_freq = len(postings)
@@ -42,7 +43,7 @@ class IndexManager:
         # Calculate TF-IDF for each posting
         for posting in postings:
             try:
-                tf = posting.frequency / documents[posting.doc_id].token_count
+                tf = posting.frequency / documents.token_count(posting.doc_id)
             except ZeroDivisionError:
                 tf = 0
             weighted_tf = tf * (1 + posting.importance)
@@ -79,14 +80,16 @@ class IndexManager:
             
         partial_path = self.partial_dir / f"partial_{self.partial_index_count}.json"
         
-        index_output = {
-            token: [(p.doc_id, p.frequency, p.importance, p.tf_idf, p.positions)
-                for p in postings]
-            for token, postings in self.index.items()
-        }
-        
-        with open(partial_path, 'w') as f:
-            json.dump(index_output, f)
+        with stage('flush'):
+            index_output = {
+                token: [(p.doc_id, p.frequency, p.importance, p.tf_idf, p.positions)
+                    for p in postings]
+                for token, postings in self.index.items()
+            }
+            
+            with open(partial_path, 'w') as f:
+                json.dump(index_output, f)
+        record_flush(partial_path)
             
         self.partial_index_count += 1
         self.index.clear()
@@ -124,7 +127,7 @@ class IndexManager:
             with open(range_path, 'w') as f:
                 json.dump(index_output, f)
 
-    def calculate_range_tf_idf(self, documents: Dict[int, Document]) -> None:
+    def calculate_range_tf_idf(self, documents: DocumentTable) -> None:
         """Calculate TF-IDF scores for range indexes"""
         num_docs = len(documents)
         print(f"\n========================================")
@@ -145,7 +148,7 @@ class IndexManager:
                 ]
                 
                 # Calculate TF-IDF using shared function
-                updated_postings = self._calculate_tf_idf_for_postings(posting_objects, documents, num_docs)
+                updated_postings = self.calculate_tf_idf_for_postings(posting_objects, documents, num_docs)
                 
                 # Convert back to serializable format
                 updated_range[token] = [
@@ -1,22 +1,34 @@
-from collections import defaultdict
+from collections import Counter, defaultdict
 from typing import Dict, List, Tuple
 from functools import lru_cache
 
-from utils.tokenizer import tokenize
+from utils.tokenizer import tokenize, token_offsets, TOKEN_PATTERN
+from utils.build_profiler import stage
 from utils.constants import CONFIG
 
 
 class TokenProcessor:
+    def __init__(self):
+        # Unstemmed words seen in indexed text, for autocomplete
+        self.surface_counts: Counter = Counter()
+
     @lru_cache(maxsize=CONFIG['max_cache_size'])
     def _tokenize_with_cache(self, text: str):
         return tokenize(text)
 
+    def token_offsets(self, text: str) -> List[int]:
+        """Character offset of each indexed token position of text, for the document store"""
+        with stage('tokenize'):
+            return token_offsets(text, self._tokenize_with_cache(text))
+
     def process_tokens(self, text: str, important_text: Dict[str, float]) -> Dict[str, Tuple[int, float, List[int]]]:
         """Process tokens and track their positions"""
         freq_map = defaultdict(lambda: (0, 0.0, []))  # (freq, importance, positions)
         
         # Process regular text
         regular_tokens = self._tokenize_with_cache(text)
+        with stage('tokenize'):
+            self.surface_counts.update(TOKEN_PATTERN.findall(text.lower()))
         
         for pos, token in enumerate(regular_tokens):
             freq, imp, positions = freq_map[token]
@@ -0,0 +1,392 @@
+import os
+import sys
+import json
+import time
+import heapq
+import pickle
+import socket
+import argparse
+import threading
+import subprocess
+
+from tqdm import tqdm
+from pathlib import Path
+from itertools import groupby
+from operator import itemgetter
+from contextlib import contextmanager
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from indexer import Indexer, run_pipeline
+from components.document_processor import DocumentProcessor
+from components.token_processor import TokenProcessor
+from components.index_manager import IndexManager, Posting
+from utils.build_coordinator import BuildCoordinator, worker_name, DONE, FAILED
+from utils.build_profiler import stage
+from utils.corpus_source import open_corpus
+from utils.doc_store import DocumentStoreWriter, DocumentStore
+from utils.constants import (
+    DEV_DIR,
+    RANGE_DIR,
+    DISTRIBUTED_DIR,
+    COORDINATOR_DB,
+    CONFIG
+)
+
+RUNS_DIR = Path(DISTRIBUTED_DIR) / "runs"
+ACCEPTED_FILE = Path(DISTRIBUTED_DIR) / "accepted.json"
+
+
+def _atomic_path(path: Path) -> Path:
+    """Temporary sibling to write to before os.replace, unique per process on any host sharing the directory"""
+    return path.with_name(f".{path.name}.{socket.gethostname()}.{os.getpid()}.tmp")
+
+
+def _range_records(run_path: str, offset: int):
+    """(term, postings) records of one term range of a run, read one at a time"""
+    with open(run_path, "rb") as run_file:
+        run_file.seek(offset)
+        while True:
+            record = pickle.load(run_file)
+            if record is None:
+                return
+            yield record
+
+
+class AcceptedDocuments:
+    """Token counts of the documents kept after deduplication, what the merge needs for TF-IDF"""
+    def __init__(self, path: Path = ACCEPTED_FILE):
+        with open(path) as f:
+            self.token_counts = {int(doc_id): count for doc_id, count in json.load(f).items()}
+
+    def __len__(self) -> int:
+        return len(self.token_counts)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self.token_counts
+
+    def token_count(self, doc_id: int) -> int:
+        return self.token_counts[doc_id]
+
+
+class UnitWorker:
+    """
+    Worker process of a distributed build, pulls units from the coordinator until the build is done.
+
+    Index units are parsed into a sorted run: the unit's postings, grouped by term
+    range and sorted by term, with the unit's document metadata alongside. Merge
+    units combine one term range from every run into a range index file, reading
+    the runs term by term, so a merge holds one term per run in memory.
+    """
+    def __init__(self, coordinator: BuildCoordinator, crash_after: Optional[int] = None, poll_s: float = 0.5):
+        self.coordinator = coordinator
+        self.name = worker_name()
+        self.crash_after = crash_after   # Testing hook, exit without a word after this many documents
+        self.poll_s = poll_s
+        self.doc_processor = DocumentProcessor()
+        self.token_processor = TokenProcessor()
+        self.index_manager = IndexManager()
+        self.source = None
+        self.accepted: Optional[AcceptedDocuments] = None
+        self.documents_processed = 0
+
+    def run(self) -> None:
+        while not self.coordinator.exists():
+            time.sleep(self.poll_s)
+        while True:
+            unit = self.coordinator.lease(self.name)
+            if unit is None:
+                if self.coordinator.meta('status') == 'done':
+                    return
+                time.sleep(self.poll_s)
+                continue
+
+            try:
+                with self._heartbeat(unit['unit_id']):
+                    if unit['phase'] == 'index':
+                        result = self.index_unit(unit)
+                    else:
+                        result = self.merge_unit(unit)
+            except Exception as e:
+                print(f"Worker {self.name} failed {unit['phase']} unit {unit['unit_id']}: {e}")
+                self.coordinator.fail(unit['unit_id'], self.name, repr(e))
+                continue
+
+            if not self.coordinator.complete(unit['unit_id'], self.name, result):
+                print(f"Worker {self.name} lost the lease on unit {unit['unit_id']}, result dropped")
+
+    @contextmanager
+    def _heartbeat(self, unit_id: int):
+        """Keep renewing the unit's lease while it is being worked on"""
+        stopped = threading.Event()
+
+        def renew():
+            while not stopped.wait(self.coordinator.lease_s / 3):
+                if not self.coordinator.renew(unit_id, self.name):
+                    return
+
+        thread = threading.Thread(target=renew, name=f"lease-{unit_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def index_unit(self, unit: Dict) -> Dict:
+        if self.source is None:
+            self.source = open_corpus(self.coordinator.meta('corpus'))
+        RUNS_DIR.mkdir(parents=True, exist_ok=True)
+        run_path = RUNS_DIR / f"unit_{unit['unit_id']:05d}.run"
+        docs_path = RUNS_DIR / f"unit_{unit['unit_id']:05d}.docs.jsonl"
+        surface_path = RUNS_DIR / f"unit_{unit['unit_id']:05d}.surface.json"
+        store_path = RUNS_DIR / f"unit_{unit['unit_id']:05d}.store"
+        store_index_path = RUNS_DIR / f"unit_{unit['unit_id']:05d}.store_index.pkl"
+        self.token_processor.surface_counts.clear()
+
+        # Near-duplicates are only dropped at merge time, against documents from every unit
+        postings = defaultdict(list)
+        doc_store = DocumentStoreWriter(_atomic_path(store_path), _atomic_path(store_index_path))
+        with open(_atomic_path(docs_path), "w") as docs_file:
+            for position, (source_name, data) in enumerate(self.source.read_unit(unit['spec'])):
+                if self.crash_after is not None and self.documents_processed >= self.crash_after:
+                    os._exit(1)
+                self.documents_processed += 1
+
+                doc_id = unit['doc_id_start'] + position
+                if doc_id >= unit['doc_id_end']:
+                    raise RuntimeError(f"unit has more documents than the {unit['spec']['docs']} planned")
+                try:
+                    if data['url'].lower().endswith('.txt'):
+                        continue
+
+                    with stage('parse_html'):
+                        soup, text = self.doc_processor.soupify(data)
+                        weighted_text = self.doc_processor.extract_important_text(soup)
+                    with stage('simhash'):
+                        doc = self.doc_processor.create_document(data, text, doc_id)
+                    with stage('parse_html'):
+                        links = self.doc_processor.extract_links(soup, data['url'])
+                    with stage('postings'):
+                        freq_map = self.token_processor.process_tokens(text, weighted_text)
+                        for token, (freq, imp, positions) in freq_map.items():
+                            postings[token].append((doc_id, freq, imp, 0.0, positions))
+
+                    with stage('doc_store'):
+                        doc_store.add(doc_id, text, self.token_processor.token_offsets(text))
+                    docs_file.write(json.dumps([doc_id, doc.url, doc.token_count, doc.simhash, links]) + "\n")
+                except Exception as e:
+                    print(f"\tError processing {source_name}: {e}")
+
+        # One pickled record per term, terms sorted and grouped by range, each range
+        # ended by None, so a merge reads only its range and one term at a time
+        ranges = defaultdict(list)
+        for token in sorted(postings):
+            ranges[self.index_manager.get_term_range(token)].append(token)
+        offsets = {}
+        with open(_atomic_path(run_path), "wb") as run_file, stage('flush'):
+            for term_range in sorted(ranges):
+                offsets[term_range] = run_file.tell()
+                for token in ranges[term_range]:
+                    pickle.dump((token, postings[token]), run_file, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(None, run_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with open(_atomic_path(surface_path), "w") as f:
+            json.dump(self.token_processor.surface_counts, f)
+        with stage('doc_store'):
+            doc_store.close()
+
+        os.replace(_atomic_path(docs_path), docs_path)
+        os.replace(_atomic_path(surface_path), surface_path)
+        os.replace(_atomic_path(store_path), store_path)
+        os.replace(_atomic_path(store_index_path), store_index_path)
+        os.replace(_atomic_path(run_path), run_path)
+        return {'run': str(run_path), 'docs': str(docs_path), 'surface': str(surface_path),
+                'store': str(store_path), 'store_index': str(store_index_path), 'ranges': offsets}
+
+    def merge_unit(self, unit: Dict) -> Dict:
+        if self.accepted is None:
+            self.accepted = AcceptedDocuments()
+        term_range = unit['spec']['range']
+
+        # Runs in unit order hold ascending doc_id blocks, and heapq.merge is stable,
+        # so each term's postings come out sorted by doc_id
+        runs = []
+        for index_unit in self.coordinator.units('index'):
+            offset = index_unit['result']['ranges'].get(term_range)
+            if offset is not None:
+                runs.append(_range_records(index_unit['result']['run'], offset))
+
+        range_path = Path(RANGE_DIR) / f"index_{term_range}.json"
+        terms = 0
+        with open(_atomic_path(range_path), "w") as f, stage('merge'):
+            f.write("{")
+            for token, group in groupby(heapq.merge(*runs, key=itemgetter(0)), key=itemgetter(0)):
+                merged = [
+                    Posting(doc_id, freq, imp, 0.0, positions)
+                    for _, unit_postings in group
+                    for doc_id, freq, imp, _, positions in unit_postings
+                    if doc_id in self.accepted
+                ]
+                if not merged:
+                    continue
+                self.index_manager.calculate_tf_idf_for_postings(merged, self.accepted, len(self.accepted))
+                serialized = [(p.doc_id, p.frequency, p.importance, p.tf_idf, p.positions) for p in merged]
+                f.write(f'{"," if terms else ""}{json.dumps(token)}: {json.dumps(serialized)}')
+                terms += 1
+            f.write("}")
+        os.replace(_atomic_path(range_path), range_path)
+        return {'path': str(range_path), 'terms': terms}
+
+
+class DistributedIndexer(Indexer):
+    """
+    Coordinator side of a distributed build.
+
+    The corpus is partitioned into units queued in the coordinator database, and
+    worker processes (started here, or by hand with the worker command, possibly
+    several per machine) index them into sorted runs. Deduplication then walks the
+    runs' documents in corpus order, so the same documents are kept as by the
+    single-threaded indexer, and merge units turn the runs into range indexes.
+    The database records finished units, so a build that is interrupted carries
+    on where it stopped when started again.
+    """
+    def __init__(self, data_dir: str = DEV_DIR, num_workers: int = CONFIG['distributed_workers'],
+                 unit_docs: int = CONFIG['distributed_unit_docs'], restart: bool = False,
+                 poll_s: float = 0.5):
+        super().__init__(data_dir)
+        self.num_workers = num_workers
+        self.unit_docs = unit_docs
+        self.restart = restart
+        self.poll_s = poll_s
+        self.coordinator = BuildCoordinator()
+        self.workers: List[Optional[subprocess.Popen]] = [None] * num_workers
+
+    def plan(self) -> None:
+        """Queue the index units, unless resuming a build of the same corpus"""
+        corpus = str(self.data_dir.resolve())
+        if self.coordinator.exists() and not self.restart:
+            planned = (self.coordinator.meta('corpus'), self.coordinator.meta('unit_docs'))
+            if planned != (corpus, str(self.unit_docs)):
+                raise ValueError(f"{self.coordinator.db_path} belongs to a build of {planned[0]} "
+                                 f"in units of {planned[1]} documents, run with --restart to start over")
+            print(f"Resuming the build in {self.coordinator.db_path}")
+            return
+
+        # A fresh build, nothing from a previous one may leak into the merge
+        for path in [*RUNS_DIR.glob("unit_*"), *Path(RANGE_DIR).glob("index_*.json"), ACCEPTED_FILE]:
+            path.unlink(missing_ok=True)
+        with stage('partition'):
+            units = self.source.partition(self.unit_docs)
+        self.coordinator.create({'corpus': corpus, 'unit_docs': self.unit_docs, 'status': 'indexing'})
+        self.coordinator.add_units('index', units)
+        print(f"Planned {len(units)} index units of up to {self.unit_docs} documents")
+
+    def _keep_workers(self) -> None:
+        """Replace local workers that exited, a crashed worker's unit is re-leased once its lease is taken back"""
+        for slot, process in enumerate(self.workers):
+            if process is None or process.poll() is not None:
+                if process is not None:
+                    print(f"\nWorker {process.pid} exited with {process.returncode}, starting a new one")
+                self.workers[slot] = subprocess.Popen(
+                    [sys.executable, os.path.abspath(__file__), "worker", "--db", str(self.coordinator.db_path)]
+                )
+
+    def _stop_workers(self) -> None:
+        for process in self.workers:
+            if process is None:
+                continue
+            try:
+                process.wait(timeout=10 * self.poll_s)
+            except subprocess.TimeoutExpired:
+                process.terminate()
+                process.wait()
+
+    def wait_for(self, phase: str) -> None:
+        """Block until every unit of a phase is done, keeping the local workers running"""
+        total = len(self.coordinator.units(phase))
+        with tqdm(total=total, desc=f"{phase.capitalize()} units") as pbar:
+            while True:
+                counts = self.coordinator.progress(phase)
+                pbar.update(counts[DONE] - pbar.n)
+                if counts[FAILED]:
+                    errors = {unit['unit_id']: unit['error'] for unit in self.coordinator.units(phase)
+                              if unit['state'] == FAILED}
+                    raise RuntimeError(f"{len(errors)} {phase} units failed after "
+                                       f"{self.coordinator.max_attempts} attempts: {errors}")
+                if counts[DONE] == total:
+                    return
+                self._keep_workers()
+                time.sleep(self.poll_s)
+
+    def accept_documents(self) -> None:
+        """
+        Deduplicate the runs' documents in doc_id order, first seen wins as in the
+        single-threaded indexer, and copy the accepted ones into the document store.
+        """
+        accepted = {}
+        for unit in self.coordinator.units('index'):
+            unit_store = DocumentStore(unit['result']['store'], unit['result']['store_index'])
+            with open(unit['result']['docs']) as f:
+                for line in f:
+                    doc_id, url, token_count, simhash, links = json.loads(line)
+                    if self.documents.is_near_duplicate(simhash, CONFIG['similarity_threshold']):
+                        continue
+                    self.documents.add(doc_id, url, token_count, simhash, links)
+                    accepted[doc_id] = token_count
+                    self.doc_store.add(doc_id, *unit_store.get(doc_id))
+            unit_store.close()
+            with open(unit['result']['surface']) as f:
+                self.token_processor.surface_counts.update(json.load(f))
+            self.next_doc_id = unit['doc_id_end']
+        with open(_atomic_path(ACCEPTED_FILE), "w") as f:
+            json.dump(accepted, f)
+        os.replace(_atomic_path(ACCEPTED_FILE), ACCEPTED_FILE)
+
+    def build_index(self) -> None:
+        self.plan()
+        try:
+            self.wait_for('index')
+
+            print("\nDeduplicating documents across units...")
+            with stage('dedup'):
+                self.accept_documents()
+
+            if not self.coordinator.units('merge'):
+                term_ranges = sorted({term_range for unit in self.coordinator.units('index')
+                                      for term_range in unit['result']['ranges']})
+                self.coordinator.add_units('merge', [{'range': term_range} for term_range in term_ranges])
+                self.coordinator.set_meta(status='merging')
+            self.wait_for('merge')
+            self.coordinator.set_meta(status='done')
+        finally:
+            self._stop_workers()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed index build: a coordinator and worker processes")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Plan or resume a build, run it with local workers, then save and publish")
+    run.add_argument("corpus", nargs="?", default=DEV_DIR,
+                     help="DEV-layout directory, zip/tar archive or JSONL file of crawl records")
+    run.add_argument("--workers", type=int, default=CONFIG['distributed_workers'],
+                     help="Local worker processes, 0 to rely on workers started separately")
+    run.add_argument("--unit-docs", type=int, default=CONFIG['distributed_unit_docs'],
+                     help="Documents per work unit")
+    run.add_argument("--restart", action="store_true", help="Discard the previous build's progress")
+
+    worker = commands.add_parser("worker", help="Pull and run units of the build until it is done")
+    worker.add_argument("--db", default=COORDINATOR_DB, help="Coordinator database of the build")
+    worker.add_argument("--crash-after", type=int, default=None,
+                        help="Exit abruptly after this many documents, to test lease recovery")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run_pipeline(DistributedIndexer(args.corpus, args.workers, args.unit_docs, args.restart))
+    else:
+        UnitWorker(BuildCoordinator(args.db), crash_after=args.crash_after).run()
+
+
+if __name__ == "__main__":
+    main()
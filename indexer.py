@@ -1,9 +1,11 @@
 import json
+import shutil
+import argparse
 
 from tqdm import tqdm
 from pathlib import Path
 from bs4 import BeautifulSoup
-from typing import Dict, List, Callable, Optional
+from typing import Dict, Iterable, List, Callable, Optional
 
 from components.document_processor import DocumentProcessor, Document
 from components.token_processor import TokenProcessor
@@ -11,26 +13,45 @@ from components.index_manager import IndexManager
 from utils.hits import HITS
 from utils.pagerank import PageRank
 from utils.index_generator import IndexGenerator
+from utils.impact_index import ImpactIndexGenerator
+from utils.shard_builder import ShardBuilder
+from utils.static_store import StaticStoreBuilder
+from utils.index_versions import VERSION_ARTIFACTS, staged_path, publish_version, promote_build
 from utils.partials_handler import convert_json_to_pickle
+from utils.build_profiler import stage
+from utils.corpus_source import SourceDocument, ReadAhead, open_corpus
+from utils.doc_table import DocumentTable
+from utils.doc_store import DocumentStoreWriter
 from utils.constants import (
     TEST_DIR,
     ANALYST_DIR,
     DEV_DIR,
     DOCS_FILE,
+    LINK_SCORES_FILE,
+    LINK_GRAPH_FILE,
+    DOC_URLS_FILE,
     INDEX_FILE,
-    FULL_ANALYTICS_DIR,
+    BUILD_STAGING_DIR,
     CONFIG,
-    INDEX_PEEK_FILE, 
-    INDEX_MAP_FILE
+    SURFACE_FORMS_FILE,
+    DOC_STORE_FILE,
+    DOC_STORE_INDEX_FILE,
+    SHARD_DIR
 )
 
 class Indexer:
     def __init__(self, data_dir: str = DEV_DIR):
+        # A DEV-layout directory, a zip/tar archive or a JSONL file, see utils.corpus_source
         self.data_dir = Path(data_dir)
-        self.stats_dir = Path(FULL_ANALYTICS_DIR)
-        self.stats_dir.mkdir(exist_ok=True)
+        self.source = open_corpus(data_dir)
+        # Outputs are staged and only replace the served full_analytics files once published, see run_pipeline
+        self.staging_dir = Path(BUILD_STAGING_DIR)
+        shutil.rmtree(self.staging_dir, ignore_errors=True)   # Left by a build that did not finish
+        self.staging_dir.mkdir(parents=True)
         self.next_doc_id = 0
-        self.documents: Dict[int, Document] = {}
+        # Metadata only, page text goes to the compressed document store
+        self.documents = DocumentTable(staged_path(DOC_URLS_FILE), staged_path(LINK_GRAPH_FILE))
+        self.doc_store = DocumentStoreWriter(staged_path(DOC_STORE_FILE), staged_path(DOC_STORE_INDEX_FILE))
         
         # Components
         self.doc_processor = DocumentProcessor()
@@ -38,65 +59,69 @@ class Indexer:
         self.index_manager = IndexManager()
         
         # Progress tracking
-        self.total_files = sum(1 for _ in Path(data_dir).rglob("*.json"))
+        self.total_files: Optional[int] = None   # Only counted up front when a progress callback needs it
         self.files_processed = 0
         self.progress_callback: Optional[Callable] = None
 
-    def process_document(self, file_path: Path) -> None:
-        """Process a single document and update the index"""
+    def process_document(self, source_name: str, data: Dict) -> None:
+        """Process a single decoded crawl record and update the index"""
         try:
-            # print(f"\nProcessing {file_path}")
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            
             if data['url'].lower().endswith('.txt'):
                 # print(f"\tSkipping .txt file: {data['url']}")
                 return
 
             # Process document content
-            soup, text = self.doc_processor.soupify(data)
-            weighted_text = self.doc_processor.extract_important_text(soup)
-            doc = self.doc_processor.create_document(data, text, self.next_doc_id)
+            with stage('parse_html'):
+                soup, text = self.doc_processor.soupify(data)
+                weighted_text = self.doc_processor.extract_important_text(soup)
+            with stage('simhash'):
+                doc = self.doc_processor.create_document(data, text, self.next_doc_id)
 
             # Extract links for HITS
-            links = self.doc_processor.extract_links(BeautifulSoup(data.get('content', ''), 'html.parser'), data['url'])
-            doc.outgoing_links = links
+            with stage('parse_html'):
+                links = self.doc_processor.extract_links(BeautifulSoup(data.get('content', ''), 'html.parser'), data['url'])
             
             # Check for near-duplicates
-            if self.doc_processor.is_near_duplicate(doc.simhash, self.documents, CONFIG['similarity_threshold']):
-                return
+            with stage('dedup'):
+                if self.documents.is_near_duplicate(doc.simhash, CONFIG['similarity_threshold']):
+                    return
             
             # Process tokens with weighted important text
-            freq_map = self.token_processor.process_tokens(text, weighted_text)
-            unique_terms = self.index_manager.update_index(freq_map, doc.doc_id)
+            with stage('postings'):
+                freq_map = self.token_processor.process_tokens(text, weighted_text)
+                unique_terms = self.index_manager.update_index(freq_map, doc.doc_id)
             
             # print(f"\tAdded {unique_terms} unique terms to index")
             
-            self.documents[doc.doc_id] = doc
+            self.documents.add(doc.doc_id, doc.url, doc.token_count, doc.simhash, links)
+            with stage('doc_store'):
+                self.doc_store.add(doc.doc_id, text, self.token_processor.token_offsets(text))
             self.next_doc_id += 1
             
         except Exception as e:
-            print(f"\tError processing {file_path}: {e}")
+            print(f"\tError processing {source_name}: {e}")
 
     def set_progress_callback(self, callback: Callable) -> None:
         self.progress_callback = callback
 
+    def documents_stream(self) -> Iterable[SourceDocument]:
+        """Documents from the corpus source, read and decoded ahead on a background thread unless disabled"""
+        if CONFIG['read_ahead_docs'] > 0:
+            return ReadAhead(self.source, CONFIG['read_ahead_docs'])
+        return self.source
+
     def build_index(self) -> None:
         """Build the complete index from documents"""
         self.files_processed = 0
-        
-        # Get all json files first
-        all_files = []
-        for folder in self.data_dir.iterdir():
-            if folder.is_dir():
-                all_files.extend(folder.glob("*.json"))
-                
-        # Create progress bar
-        with tqdm(total=len(all_files), desc="Indexing documents") as pbar:
-            for file in all_files:
-                self.process_document(file)
+        if self.progress_callback:
+            self.total_files = self.source.count()
+
+        # Documents are streamed, indexing starts without listing the corpus first
+        with tqdm(total=self.total_files, desc="Indexing documents") as pbar:
+            for source_name, data in self.documents_stream():
+                self.process_document(source_name, data)
                 self.files_processed += 1
-                if self.progress_callback:
+                if self.progress_callback and self.total_files:
                     progress = (self.files_processed / self.total_files) * 100
                     self.progress_callback(progress)
                 pbar.update(1)
@@ -108,35 +133,41 @@ class Indexer:
         # Add progress bars for post-processing
         print("\nPost-processing indexes...")
         
-        with tqdm(desc="Sorting indexes by terms") as pbar:
+        with tqdm(desc="Sorting indexes by terms") as pbar, stage('sort_partials'):
             self.index_manager.sort_partial_indexes_by_terms()
             pbar.update(1)
             
-        with tqdm(desc="Calculating TF-IDF scores") as pbar:
+        with tqdm(desc="Calculating TF-IDF scores") as pbar, stage('tf_idf'):
             self.index_manager.calculate_range_tf_idf(self.documents)
             pbar.update(1)
 
     def save_data(self) -> None:
         """Save documents and index to files"""
-        documents_output = {
-            doc_id: {
-                "url": doc.url,
-                "simhash": doc.simhash,
-                "token_count": doc.token_count,
-                "outgoing_links": doc.outgoing_links
-            } for doc_id, doc in self.documents.items()
-        }
-        
-        with open(DOCS_FILE, 'w') as f:
-            json.dump(documents_output, f)
+        docs_path = staged_path(DOCS_FILE)
+        index_path = staged_path(INDEX_FILE)
+        # Written row by row from the document table, outgoing links are in LINK_GRAPH_FILE
+        with open(docs_path, 'w') as f, stage('save_documents'):
+            f.write("{")
+            for row, (doc_id, url, token_count, simhash) in enumerate(self.documents.rows()):
+                entry = {"url": url, "simhash": simhash, "token_count": token_count}
+                f.write(f'{"," if row else ""}"{doc_id}": {json.dumps(entry)}')
+            f.write("}")
+
+        with open(staged_path(SURFACE_FORMS_FILE), 'w') as f, stage('save_documents'):
+            json.dump(self.token_processor.surface_counts, f)
+        with stage('doc_store'):
+            self.doc_store.close()
 
         # Compute and save HITS + PageRank scores
         print("\nComputing HITS + PageRank scores...")
         hits = HITS()
         pagerank = PageRank()
 
-        hits.compute_scores(documents_output)    
-        pagerank.compute_scores(documents_output)
+        with stage('link_analysis'):
+            link_graph = self.documents.link_graph()
+            hits.compute_scores(link_graph)    
+            pagerank.compute_scores(link_graph)
+            del link_graph
 
         scores = {
             'hits': {
@@ -146,34 +177,81 @@ class Indexer:
             'pagerank': pagerank.scores
         }
             
-        with open(Path(FULL_ANALYTICS_DIR) / 'link_scores.json', 'w') as f:
+        with open(staged_path(LINK_SCORES_FILE), 'w') as f:
             json.dump(scores, f)
 
-        self.index_manager.merge_indexes()
-        self.index_manager.save_index(INDEX_FILE)
+        with stage('merge'):
+            self.index_manager.merge_indexes()
+        with stage('save_index'):
+            self.index_manager.save_index(index_path)
         
         # Print statistics
-        docs_size_kb = Path(DOCS_FILE).stat().st_size / 1024
-        index_size_kb = Path(INDEX_FILE).stat().st_size / 1024
+        docs_size_kb = docs_path.stat().st_size / 1024
+        index_size_kb = index_path.stat().st_size / 1024
+        doc_store_size_kb = staged_path(DOC_STORE_FILE).stat().st_size / 1024
         
         print(f"\n========================================")
         print(f"Documents indexed:  {len(self.documents)}")
         print(f"Unique tokens:      {len(self.index_manager.index)}")
         print(f"Index file size:    {index_size_kb:.2f} KB")
+        print(f"Document store:     {doc_store_size_kb:.2f} KB")
         print(f"========================================\n")
-        print(f"Documents saved to {DOCS_FILE}")
-        print(f"Index saved to {INDEX_FILE}")
+        print(f"Documents saved to {docs_path}")
+        print(f"Index saved to {index_path}")
 
-def main():
-    indexer = Indexer()
+def run_pipeline(indexer: Indexer) -> None:
+    """
+    Build, save and post-process an index, shared by every indexer mode.
+
+    Everything is written to the staging directory, published as a new index
+    version, and then renamed into full_analytics (and shards), so processes
+    serving the previous files keep reading them undisturbed.
+    """
     indexer.build_index()
     indexer.save_data()
+    staged = {role: staged_path(artifact) for role, artifact in VERSION_ARTIFACTS.items()}
+    shard_dir = staged_path(SHARD_DIR)
     generator = IndexGenerator(
-        index_path=INDEX_FILE,
-        output_pickle=INDEX_PEEK_FILE,
-        output_json=INDEX_MAP_FILE
+        index_path=staged_path(INDEX_FILE),
+        output_pickle=staged['index'],
+        output_json=staged['map'],
+        champion_pickle=staged['champions'],
+        champion_json=staged['champion_map'],
+        autocomplete_path=staged['autocomplete'],
+        spelling_path=staged['spelling'],
+        surface_forms_path=staged_path(SURFACE_FORMS_FILE),
+        docs_path=staged['docs'],
+        link_scores_path=staged['link_scores']
     )
-    generator.generate()
+    with stage('index_generator'):
+        generator.generate()
+    with stage('static_store'):
+        StaticStoreBuilder(
+            staged['static'], staged['docs'], staged['link_scores'], staged['map'], staged['champion_map']
+        ).build()
+    if CONFIG['index_profile'] == 'impact':
+        with stage('impact_index'):
+            ImpactIndexGenerator(staged['index'], staged['impact'], staged['impact_map'], staged['impact_meta']).generate()
+    if CONFIG['num_shards'] > 1:
+        with stage('shards'):
+            ShardBuilder(
+                index_pickle=staged['index'], shard_dir=shard_dir,
+                docs_path=staged['docs'], link_scores_path=staged['link_scores']
+            ).build()
+    with stage('publish'):
+        # The staging directory starts out empty, so whatever is in it is this build's output
+        produced = [role for role, path in staged.items() if path.exists()]
+        publish_version(produced, source_dir=BUILD_STAGING_DIR,
+                        shard_dir=shard_dir if CONFIG['num_shards'] > 1 else None)
+        promote_build()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build, save and publish the search index")
+    parser.add_argument("corpus", nargs="?", default=DEV_DIR,
+                        help="DEV-layout directory, zip/tar archive or JSONL file of crawl records")
+    args = parser.parse_args()
+    run_pipeline(Indexer(args.corpus))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,11 +1,14 @@
 import streamlit as st
+import re
 import json
 import time
 
 from pathlib import Path
 from indexer import Indexer
 
-from search import SearchEngine, FileHandler
+from search import SearchEngine, open_file_handler, open_live_engine, preload_modules
+from utils.query_trace import QueryTrace
+from utils.index_versions import read_manifest
 from utils.constants import (
     TEST_DIR,
     ANALYST_DIR,
@@ -14,7 +17,8 @@ from utils.constants import (
     INDEX_MAP_FILE,
     DOCS_FILE,
     INDEX_FILE,
-    DOC_TITLE_FILE
+    DOC_TITLE_FILE,
+    CONFIG
 )
 
 st.set_page_config(
@@ -33,18 +37,32 @@ def load_doc_titles():
 
 @st.cache_resource
 def initialize_search_engine():
-    """Initialize and cache search engine instance"""
+    """Initialize and cache search engine instance, hot-swapping published index versions when there are any"""
+    # nltk and the ranking modules load in the background while the index opens and the page renders
+    preload_modules()
+    if read_manifest() is not None:
+        return open_live_engine()
     return SearchEngine()
 
 
 @st.cache_resource
 def initialize_file_handler():
-    """Initialize and cache file handler instance"""
-    handler = FileHandler(INDEX_PEEK_FILE, INDEX_MAP_FILE)
+    """Initialize and cache file handler instance, None when the engine manages its own index versions"""
+    if read_manifest() is not None:
+        return None
+    handler = open_file_handler()
     handler.__enter__()
     return handler
 
 
+def escape_markdown(text):
+    return re.sub(r'([\\`*_{}\[\]()#+\-.!|$<>~])', r'\\\1', text)
+
+
+def use_suggestion(suggestion):
+    st.session_state.query = suggestion
+
+
 def display_search_results(results, query_time):
     """Display search results with clickable links"""
     st.write(f"Found {len(results)} results ({query_time:.3f} seconds)")
@@ -52,11 +70,53 @@ def display_search_results(results, query_time):
         with st.expander(f"**🔍 Result {rank} (Score: {result.score:.3f})**", expanded=True):
             title = st.session_state.doc_titles.get(result.url, result.url)
             st.markdown(f"##### [{title}]({result.url})")
+            if result.snippet is not None:
+                st.markdown(result.snippet.marked(escape=escape_markdown))
             st.markdown(f"Matched terms: `{', '.join(result.matched_terms)}`")
 
 
+def display_diagnostics(search_engine):
+    """Aggregated query traces of this session's engine: stage latencies, cache rates, hot terms, slow queries"""
+    metrics = search_engine.metrics
+    stats = metrics.stats()
+    if not stats['queries']:
+        st.info("No queries traced yet")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Queries", stats['queries'])
+    col2.metric("Result cache hit rate", f"{stats['result_cache_hit_rate']:.1%}")
+    col3.metric("Postings cache hit rate", f"{stats['postings_cache_hit_rate']:.1%}")
+    col4.metric("Postings read", f"{stats['bytes_read'] / 1024 / 1024:.1f} MB")
+
+    st.markdown("##### Latency by stage (ms)")
+    st.table([
+        {'Stage': stage, 'Count': row['count'], 'Mean': round(row['mean'], 2),
+         'p50': round(row['p50'], 2), 'p95': round(row['p95'], 2), 'p99': round(row['p99'], 2)}
+        for stage, row in stats['latency_ms'].items()
+    ])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("##### Hot terms")
+        st.table([{'Term': term, 'Queries': count} for term, count in metrics.hot_terms(15)])
+    with col2:
+        st.markdown("##### Slowest queries")
+        st.table([
+            {'Query': trace.query, 'Total ms': round(trace.total_ms, 1),
+             'Slowest stage': max(trace.spans, key=trace.spans.get) if trace.spans else "",
+             'KB read': round(trace.bytes_read / 1024, 1)}
+            for trace in metrics.slow_queries(10)
+        ])
+
+    with st.expander("Prometheus metrics"):
+        prometheus_text = metrics.to_prometheus()
+        st.code(prometheus_text, language="text")
+        st.download_button("Download", prometheus_text, file_name="metrics.prom")
+
+
 def main():
-    tab1, tab2 = st.tabs(["Search", "About"])
+    tab1, tab2, tab3 = st.tabs(["Search", "About", "Diagnostics"])
 
     with tab1:
         st.markdown("<h1 style='text-align: center;'>Search Engine</h1>", unsafe_allow_html=True)
@@ -70,7 +130,12 @@ def main():
         # Search interface
         col1, col2 = st.columns([5, 1])
         with col1:
-            query = st.text_input("Enter your search query:")
+            query = st.text_input("Enter your search query:", key="query")
+            suggestions = st.session_state.search_engine.suggest(query, 5) if query else []
+            if suggestions:
+                # Picking a suggestion replaces the query before the input is drawn on the next run
+                for column, suggestion in zip(st.columns(len(suggestions)), suggestions):
+                    column.button(suggestion, key=f"suggest_{suggestion}", on_click=use_suggestion, args=(suggestion,))
 
         with col2:
             max_results = st.number_input("Max results", 5, 20, 10)
@@ -78,14 +143,21 @@ def main():
         if query:
             with st.spinner("Searching..."):
                 start_time = time.time()
+                trace = QueryTrace(query)
                 
                 results = st.session_state.search_engine.search(
                     query, 
                     max_results,
-                    st.session_state.file_handler
+                    st.session_state.file_handler,
+                    trace=trace
                 )
                 
                 query_time = time.time() - start_time
+                if trace.correction is not None:
+                    if CONFIG['spelling_correction'] == 'auto':
+                        st.markdown(f"Showing results for **{trace.correction}**")
+                    else:
+                        st.button(f"Did you mean: {trace.correction}", on_click=use_suggestion, args=(trace.correction,))
                 display_search_results(results, query_time)
         else:
             st.info("Enter a search query to find relevant documents")
@@ -129,7 +201,8 @@ def main():
             |----------|----------------|
             | Storage | Hybrid Pickle/JSON for optimal speed/space tradeoff |
             | Access | Peek-based retrieval to minimize memory usage |
-            | Caching | LRU cache for frequent terms and queries |
+            | Caching | Byte-budgeted segmented LRU postings cache with TinyLFU admission |
+            | Tiering | Champion lists (tier 1) answer common queries before full postings (tier 2) are read |
 
             4. **Query Processing**
 
@@ -210,5 +283,8 @@ def main():
         """
         st.markdown(content)
 
+    with tab3:
+        display_diagnostics(st.session_state.search_engine)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
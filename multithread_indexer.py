@@ -1,57 +1,54 @@
 import sys
 import json
-import queue
-import random
+import argparse
 import threading
 
 from tqdm import tqdm
 from pathlib import Path
-from bs4 import BeautifulSoup
-from typing import Dict, List, Callable, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Optional
 from threading import Lock
 from collections import defaultdict
 
-from indexer import Indexer
-from components.document_processor import DocumentProcessor, Document
+from indexer import Indexer, run_pipeline
+from components.document_processor import DocumentProcessor
 from components.token_processor import TokenProcessor
-from components.index_manager import IndexManager, Posting
-from utils.hits import HITS
-from utils.pagerank import PageRank
-from utils.index_generator import IndexGenerator
-from utils.partials_handler import convert_json_to_pickle
+from components.index_manager import Posting
+from utils.build_profiler import stage, record_flush
+from utils.corpus_source import SourceDocument, ReadAhead
+from utils.doc_table import DocumentTable
+from utils.doc_store import DocumentStoreWriter
 from utils.constants import (
-    TEST_DIR,
-    ANALYST_DIR,
     DEV_DIR,
     PARTIAL_DIR,
-    DOCS_FILE,
-    INDEX_FILE,
-    FULL_ANALYTICS_DIR,
-    CONFIG,
-    INDEX_PEEK_FILE, 
-    INDEX_MAP_FILE
+    CONFIG
 )
 
 
 
 class IndexWorker:
-    def __init__(self, worker_id: int, files: List[Path], shared_resources, master_pbar):
+    def __init__(self, worker_id: int, documents: Iterable[SourceDocument], shared_resources, master_pbar):
         self.worker_id = worker_id
-        self.files = files
+        self.documents = documents   # Shared with the other workers, each document is taken by one
         self.doc_processor = DocumentProcessor()
         self.token_processor = TokenProcessor()
         self.local_index = defaultdict(list)
         self.shared = shared_resources
         self.master_pbar = master_pbar
         self.worker_pbar = tqdm(
-            total=len(files),
             desc=f"Worker {worker_id}",
             position=worker_id + 1,
             leave=True
         )
         self.local_index_size = 0
         self.partial_count = 0
+        self.error: Optional[BaseException] = None   # Why the worker stopped early, see run()
+
+    def run(self) -> None:
+        """Thread target: process_files, keeping any exception for build_index to re-raise"""
+        try:
+            self.process_files()
+        except BaseException as e:
+            self.error = e
 
     def write_partial_index(self):
         """Write current local index to disk"""
@@ -61,14 +58,16 @@ class IndexWorker:
         partial_path = Path(PARTIAL_DIR) / f"partial_w{self.worker_id}_{self.partial_count}.json"
         Path(PARTIAL_DIR).mkdir(exist_ok=True)
         
-        index_output = {
-            token: [(p.doc_id, p.frequency, p.importance, p.tf_idf, p.positions)
-                for p in postings]
-            for token, postings in self.local_index.items()
-        }
-        
-        with open(partial_path, 'w') as f:
-            json.dump(index_output, f)
+        with stage('flush'):
+            index_output = {
+                token: [(p.doc_id, p.frequency, p.importance, p.tf_idf, p.positions)
+                    for p in postings]
+                for token, postings in self.local_index.items()
+            }
+            
+            with open(partial_path, 'w') as f:
+                json.dump(index_output, f)
+        record_flush(partial_path)
             
         self.partial_count += 1
         self.local_index.clear()
@@ -88,42 +87,46 @@ class IndexWorker:
             self.write_partial_index()
         
     def process_files(self):
-        for file_path in self.files:
+        for source_name, data in self.documents:
             try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                
                 if data['url'].lower().endswith('.txt'):
                     continue
 
-                soup, text = self.doc_processor.soupify(data)
-                weighted_text = self.doc_processor.extract_important_text(soup)
+                with stage('parse_html'):
+                    soup, text = self.doc_processor.soupify(data)
+                    weighted_text = self.doc_processor.extract_important_text(soup)
                 
                 with self.shared.doc_id_lock:
                     doc_id = self.shared.next_doc_id
                     self.shared.next_doc_id += 1
                 
-                doc = self.doc_processor.create_document(data, text, doc_id)
-                links = self.doc_processor.extract_links(soup, data['url'])
-                doc.outgoing_links = links
-
-                with self.shared.doc_lock:
-                    if not self.doc_processor.is_near_duplicate(
-                        doc.simhash, self.shared.documents, CONFIG['similarity_threshold']):
-                        freq_map = self.token_processor.process_tokens(text, weighted_text)
-                        
-                        for token, (freq, imp, positions) in freq_map.items():
-                            posting = Posting(doc_id, freq, imp, 0.0, positions)
-                            self.local_index[token].append(posting)
-                            self.update_index_size(token, posting)
+                with stage('simhash'):
+                    doc = self.doc_processor.create_document(data, text, doc_id)
+                with stage('parse_html'):
+                    links = self.doc_processor.extract_links(soup, data['url'])
+
+                # Lock waits show up under 'document' in build profiles
+                with stage('document'), self.shared.doc_lock:
+                    with stage('dedup'):
+                        duplicate = self.shared.documents.is_near_duplicate(doc.simhash, CONFIG['similarity_threshold'])
+                    if not duplicate:
+                        with stage('postings'):
+                            freq_map = self.token_processor.process_tokens(text, weighted_text)
+                            
+                            for token, (freq, imp, positions) in freq_map.items():
+                                posting = Posting(doc_id, freq, imp, 0.0, positions)
+                                self.local_index[token].append(posting)
+                                self.update_index_size(token, posting)
                         
-                        self.shared.documents[doc_id] = doc
+                        self.shared.documents.add(doc_id, doc.url, doc.token_count, doc.simhash, links)
+                        with stage('doc_store'):
+                            self.shared.doc_store.add(doc_id, text, self.token_processor.token_offsets(text))
                 
                 self.master_pbar.update(1)
                 self.worker_pbar.update(1)
                         
             except Exception as e:
-                print(f"Worker {self.worker_id} error processing {file_path}: {e}")
+                print(f"Worker {self.worker_id} error processing {source_name}: {e}")
                 self.master_pbar.update(1)
                 self.worker_pbar.update(1)
         
@@ -136,11 +139,12 @@ class IndexWorker:
 
 
 class SharedResources:
-    def __init__(self):
+    def __init__(self, documents: DocumentTable, doc_store: DocumentStoreWriter):
         self.doc_lock = Lock()
         self.doc_id_lock = Lock()
         self.next_doc_id = 0
-        self.documents = {}
+        self.documents = documents
+        self.doc_store = doc_store
 
 
 
@@ -148,53 +152,34 @@ class MultithreadedIndexer(Indexer):
     def __init__(self, data_dir: str = DEV_DIR, num_workers: int = 4):
         super().__init__(data_dir)
         self.num_workers = num_workers
-        self.shared = SharedResources()
+        self.shared = SharedResources(self.documents, self.doc_store)
         
-    def divide_work(self, all_files: List[Path]) -> List[List[Path]]:
-        """Divide files equally among workers"""
-        files_per_worker = len(all_files) // self.num_workers
-        return [
-            all_files[i:i + files_per_worker] 
-            for i in range(0, len(all_files), files_per_worker)
-        ]
-
     def build_index(self) -> None:
         print(f"\nStarting indexing with {self.num_workers} workers...")
-        
-        # Collect all files
-        all_files = []
-        for folder in self.data_dir.iterdir():
-            if folder.is_dir():
-                all_files.extend(folder.glob("*.json"))
-        random.shuffle(all_files)
-        random.shuffle(all_files)
-        random.shuffle(all_files)
-        random.shuffle(all_files)
-        random.shuffle(all_files)
+
+        # Workers pull from one read-ahead stream, so the load balances itself
+        documents = ReadAhead(self.source, max(CONFIG['read_ahead_docs'], self.num_workers))
 
         # Initialize progress bars
-        total_files = len(all_files)
         master_pbar = tqdm(
-            total=total_files,
             desc="Total Progress",
             position=0,
             leave=True
         )
 
         # Create workers and threads
-        work_divisions = self.divide_work(all_files)
         workers = []
         threads = []
 
         for i in range(self.num_workers):
             worker = IndexWorker(
                 worker_id=i,
-                files=work_divisions[i],
+                documents=documents,
                 shared_resources=self.shared,
                 master_pbar=master_pbar
             )
             workers.append(worker)
-            thread = threading.Thread(target=worker.process_files)
+            thread = threading.Thread(target=worker.run)
             threads.append(thread)
             thread.start()
 
@@ -204,38 +189,39 @@ class MultithreadedIndexer(Indexer):
 
         master_pbar.close()
 
+        # A corpus read error reaches every worker, anything else only the one that hit it;
+        # either way the index is incomplete and must not be post-processed and published
+        errors = list({id(worker.error): worker.error for worker in workers if worker.error is not None}.values())
+        if errors:
+            for error in errors[1:]:
+                print(f"Worker error: {error!r}")
+            raise errors[0]
+
         # Post-processing progress
         print("\nMerging worker indexes...")
-        with tqdm(total=len(workers), desc="Merging indexes") as merge_pbar:
+        with tqdm(total=len(workers), desc="Merging indexes") as merge_pbar, stage('merge_workers'):
             for worker in workers:
                 for token, postings in worker.local_index.items():
                     self.index_manager.index[token].extend(postings)
+                self.token_processor.surface_counts.update(worker.token_processor.surface_counts)
                 merge_pbar.update(1)
         
-        # Copy shared documents
-        self.documents = self.shared.documents
-        
         print("\nPost-processing indexes...")
-        with tqdm(desc="Sorting indexes by terms") as pbar:
+        with tqdm(desc="Sorting indexes by terms") as pbar, stage('sort_partials'):
             self.index_manager.sort_partial_indexes_by_terms()
             pbar.update(1)
             
-        with tqdm(desc="Calculating TF-IDF scores") as pbar:
+        with tqdm(desc="Calculating TF-IDF scores") as pbar, stage('tf_idf'):
             self.index_manager.calculate_range_tf_idf(self.documents)
             pbar.update(1)
 
 
 def main():
-    indexer = MultithreadedIndexer(num_workers=16)
-    indexer.build_index()
-    indexer.save_data()
-    
-    generator = IndexGenerator(
-        index_path=INDEX_FILE,
-        output_pickle=INDEX_PEEK_FILE,
-        output_json=INDEX_MAP_FILE
-    )
-    generator.generate()
+    parser = argparse.ArgumentParser(description="Build, save and publish the search index")
+    parser.add_argument("corpus", nargs="?", default=DEV_DIR,
+                        help="DEV-layout directory, zip/tar archive or JSONL file of crawl records")
+    args = parser.parse_args()
+    run_pipeline(MultithreadedIndexer(args.corpus, num_workers=16))
 
 
 if __name__ == "__main__":
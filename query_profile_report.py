@@ -0,0 +1,58 @@
+import argparse
+
+from pathlib import Path
+from collections import Counter
+
+from utils.query_profiler import load_profiles, aggregate_functions
+from utils.constants import CONFIG
+
+
+def short_name(key: str) -> str:
+    """Trim the directory off pstats-style file:line(function) keys"""
+    path, _, rest = key.rpartition(":")
+    return f"{Path(path).name}:{rest}" if path else key
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hottest functions across profiled slow queries")
+    parser.add_argument("profile_dir", nargs="?", default=CONFIG['query_profile_dir'])
+    parser.add_argument("--top", type=int, default=25, help="Functions to list")
+    parser.add_argument("--sort", choices=("self", "total"), default="self",
+                        help="Rank by time in the function itself or including its callees")
+    parser.add_argument("--min-ms", type=float, default=0.0, help="Only profiles of queries at least this slow")
+    parser.add_argument("--all", action="store_true", help="Include sampled profiles of queries under the threshold")
+    parser.add_argument("--queries", type=int, default=10, help="Slowest queries to list")
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.profile_dir, args.min_ms, slow_only=not args.all)
+    if not profiles:
+        print(f"No matching profiles in {args.profile_dir}")
+        return
+
+    kinds = Counter(profile['kind'] for profile in profiles)
+    profiled_ms = sum(profile['elapsed_ms'] for profile in profiles)
+    print(f"{len(profiles)} profiles ({', '.join(f'{count} {kind}' for kind, count in kinds.items())}), "
+          f"{profiled_ms / 1000:.2f} s of query time")
+
+    functions = aggregate_functions(profiles)
+    sort_key = f"{args.sort}_ms"
+    print(f"\n{'Self ms':>10} {'Self %':>7} {'Total ms':>10} {'Queries':>8}  Function")
+    for key, stats in sorted(functions.items(), key=lambda item: item[1][sort_key], reverse=True)[:args.top]:
+        print(f"{stats['self_ms']:>10.1f} {stats['self_ms'] / profiled_ms:>7.1%} {stats['total_ms']:>10.1f} "
+              f"{stats['queries']:>8}  {short_name(key)}")
+
+    term_counts = Counter(term for profile in profiles for term in dict.fromkeys(profile['terms']))
+    dfs = {term: df for profile in profiles for term, df in profile['dfs'].items()}
+    print("\nMost frequent terms in these queries:")
+    for term, count in term_counts.most_common(10):
+        print(f"  {term:<20} {count:>5} queries   df {dfs.get(term, 0)}")
+
+    print("\nSlowest queries:")
+    for profile in sorted(profiles, key=lambda profile: profile['elapsed_ms'], reverse=True)[:args.queries]:
+        spans = profile['trace']['spans']
+        slowest_stage = max(spans, key=spans.get) if spans else "-"
+        print(f"  {profile['elapsed_ms']:>9.1f} ms  {slowest_stage:<12} {profile['query']!r}  dfs {profile['dfs']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,78 +1,385 @@
-import json
+import os
+import copy
 import time
+import json
+import mmap
+import argparse
 import pickle
-import numpy as np
+import heapq
+import bisect
+import threading
+import multiprocessing
 
 from pathlib import Path
-from functools import lru_cache
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from urllib.parse import urldefrag
-from collections import defaultdict
-from scipy.sparse import csr_matrix
-from typing import Dict, List, Tuple
-from sklearn.metrics.pairwise import cosine_similarity
-
-from utils.hits import HITS
-from utils.pagerank import PageRank
-from utils.tokenizer import tokenize
+from collections import Counter, defaultdict, deque
+from typing import TYPE_CHECKING, Container, Dict, Iterable, List, Optional, Set, Tuple, Union
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from utils.tokenizer import parse_query, get_stemmer
+from utils.intersection import intersect, DocIdView
+from utils.positional import count_phrase_matches, min_covering_window
+from utils.postings_cache import PostingsCache
+from utils.query_cache import QueryResultCache
+from utils.impact_index import decode_segments, impact_values, score_at_a_time
+from utils.deadline import Deadline, DeadlineStats
+from utils.stage_timings import StageTimings
+from utils.query_trace import QueryTrace, QueryMetrics
+from utils.query_profiler import QueryProfiler
+from utils.link_quality import static_quality
+from utils.autocomplete import AutocompleteIndex, Completion
+from utils.spelling import SpellingCorrector
+from utils.doc_store import DocumentStore
+from utils.snippets import Snippet, SnippetGenerator
+from utils.static_store import MappedStaticStore, MappedTermDictionary, record_end
+from utils.index_versions import read_manifest, version_paths, engine_args
 from utils.constants import (
     RANGE_DIR, 
     DOCS_FILE, 
     INDEX_MAP_FILE, 
     INDEX_PEEK_FILE,
-    CONFIG,
-    FULL_ANALYTICS_DIR
+    INDEX_CHAMPION_FILE,
+    INDEX_CHAMPION_MAP_FILE,
+    INDEX_IMPACT_FILE,
+    INDEX_IMPACT_MAP_FILE,
+    INDEX_IMPACT_META_FILE,
+    INDEX_VERSIONS_DIR,
+    INDEX_MANIFEST_FILE,
+    LINK_SCORES_FILE,
+    STATIC_DIR,
+    AUTOCOMPLETE_FILE,
+    SPELLING_FILE,
+    DOC_STORE_FILE,
+    DOC_STORE_INDEX_FILE,
+    CONFIG
 )
 
+# Reference point for the time-to-first-query report. Everything imported above is light (the
+# heavy modules load later, see below), so it leaves out only interpreter start-up and these imports
+_PROCESS_START = time.perf_counter()
+
+# numpy, scipy and sklearn (and nltk, see utils.tokenizer) are imported on first use:
+# together they take seconds to import, longer than the rest of startup
+if TYPE_CHECKING:
+    import numpy as np
+
+
+_SKIPPED = object()   # Postings not fetched because the query deadline expired first
 
-@dataclass
+
+@dataclass(frozen=True)
 class SearchResult:
+    # Frozen: the result cache hands the same instances to every caller of a query
     url: str
     score: float
-    matched_terms: List[str]
+    matched_terms: Tuple[str, ...]
+    approximate: bool = False   # Evaluation stopped early, ranking is best-so-far
+    doc_id: int = -1
+    snippet: Optional[Snippet] = None
 
 
 class FileHandler:
-    """Handles file operations for search"""
-    def __init__(self, index_path: str, seek_index_path: str):
+    """
+    Handles file operations for search.
+
+    Postings are read with position-independent reads (os.pread, or a shared read-only
+    mmap where pread is unavailable), so one handler can serve many threads at once
+    without racing on a shared file offset.
+    """
+    def __init__(self, index_path: str, seek_index_path: str,
+                 champion_path: Optional[str] = None, champion_seek_path: Optional[str] = None,
+                 cache_bytes: Optional[int] = None,
+                 static_store: Optional[Union[MappedStaticStore, MappedTermDictionary]] = None):
         self.index_path = Path(index_path)
+        self.static_store = static_store
+        # Enough to open the same index in another process (the static store cannot be sent over)
+        self.init_args = {
+            'index_path': str(index_path), 'seek_index_path': str(seek_index_path),
+            'champion_path': str(champion_path) if champion_path else None,
+            'champion_seek_path': str(champion_seek_path) if champion_seek_path else None,
+            'cache_bytes': cache_bytes
+        }
         self.seek_index_path = Path(seek_index_path)
+        self.champion_path = Path(champion_path) if champion_path else None
+        self.champion_seek_path = Path(champion_seek_path) if champion_seek_path else None
+        self.champions: Optional["FileHandler"] = None   # Tier-1 champion list reader
         self.file_ptr = None
+        self.file_map = None
+        self.file_size = 0
+        self.index_version = ""
         self.seek_positions: Dict[str, int] = {}
+        self.sorted_offsets: List[int] = []
+        self.pinned: Dict[str, Tuple] = {}   # Decoded postings served ahead of the cache, see with_pinned()
+        self.executor = None
+        self.cache = PostingsCache(
+            cache_bytes if cache_bytes is not None else CONFIG['postings_cache_bytes'],
+            CONFIG['postings_cache_protected_ratio']
+        )
 
     def __enter__(self):
         self.file_ptr = open(self.index_path, "rb")  # Open in binary mode
-        with open(self.seek_index_path, "r") as f:
-            self.seek_positions = json.load(f)
+        self.file_size = os.fstat(self.file_ptr.fileno()).st_size
+        if not hasattr(os, "pread") and self.file_size:
+            self.file_map = mmap.mmap(self.file_ptr.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.static_store is not None:
+            # Term dictionary and record boundaries straight from the shared mapping
+            self.seek_positions = self.static_store.term_map
+            self.sorted_offsets = self.static_store.sorted_seeks
+        else:
+            with open(self.seek_index_path, "r") as f:
+                self.seek_positions = json.load(f)
+            # Records are back to back, so a record ends where the next one starts
+            self.sorted_offsets = sorted(self.seek_positions.values())
+        self.index_version = self._compute_index_version()
+        self.executor = ThreadPoolExecutor(max_workers=CONFIG['postings_fetch_workers'])
+
+        if self.champion_path and self.champion_path.exists() and self.champion_seek_path.exists():
+            self.champions = FileHandler(
+                self.champion_path,
+                self.champion_seek_path,
+                cache_bytes=CONFIG['champion_cache_bytes'],
+                static_store=self.static_store.champions if isinstance(self.static_store, MappedStaticStore) else None
+            ).__enter__()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.champions:
+            self.champions.__exit__(exc_type, exc_val, exc_tb)
+        if self.executor:
+            self.executor.shutdown(wait=True)
+        if self.file_map:
+            self.file_map.close()
         if self.file_ptr:
             self.file_ptr.close()
 
-    @lru_cache(CONFIG['max_cache_size'])
-    def get_postings(self, term: str) -> List:
+    def _compute_index_version(self) -> str:
+        """Identify the index on disk, changes whenever either index file is rewritten"""
+        parts = []
+        for path in (self.index_path, self.seek_index_path):
+            stat = os.stat(path)
+            parts.append(f"{stat.st_ino}-{stat.st_size}-{stat.st_mtime_ns}")
+        return ":".join(parts)
+
+    def get_postings(self, term: str, trace: Optional[QueryTrace] = None) -> List:
         """Get postings list for a term using seek position"""
-        if term not in self.seek_positions:
+        lookup_start = time.perf_counter()
+        seek_val = self.seek_positions.get(term)
+        if seek_val is None:
             return []
-            
-        seek_val = self.seek_positions[term]
-        self.file_ptr.seek(seek_val)
-        return pickle.load(self.file_ptr)
+
+        term_data = self.pinned.get(term)
+        if term_data is None:
+            term_data = self.cache.get(term)
+        if term_data is not None:
+            if trace is not None:
+                trace.record_fetch(term, True, 0, (time.perf_counter() - lookup_start) * 1000, len(term_data[1]))
+            return term_data
+
+        lookup_ms = (time.perf_counter() - lookup_start) * 1000
+        raw = self._read_record(seek_val)
+        term_data = self._decode(raw)
+        self.cache.put(term, term_data, self._decoded_size(term_data))
+        if trace is not None:
+            trace.record_fetch(term, False, len(raw), lookup_ms, len(term_data[1]))
+        return term_data
+
+    def _decode(self, raw: bytes) -> Tuple[str, List]:
+        term_data = pickle.loads(raw)
+        postings = term_data[1]
+        if any(postings[i][0] > postings[i + 1][0] for i in range(len(postings) - 1)):
+            # Indexes built before postings were written in doc_id order
+            term_data = (term_data[0], sorted(postings, key=lambda posting: posting[0]))
+        return term_data
+
+    @staticmethod
+    def _decoded_size(term_data: Tuple[str, List]) -> int:
+        """
+        Approximate memory held by a decoded postings list, about 8x its pickled
+        length: per posting a list, an int and two floats, plus a pointer and an int
+        object per position (small positions share cached ints, so this errs high).
+        """
+        return 200 + sum(272 + 36 * len(posting[4]) for posting in term_data[1])
+
+    def _read_record(self, offset: int) -> bytes:
+        """Read the pickled record starting at offset without touching the shared file position"""
+        end = record_end(self.sorted_offsets, offset, self.file_size)
+        if self.file_map is not None:
+            return self.file_map[offset:end]
+        return os.pread(self.file_ptr.fileno(), end - offset, offset)
+
+    def get_postings_many(self, terms: Iterable[str], trace: Optional[QueryTrace] = None,
+                          deadline: Optional[Deadline] = None) -> Dict[str, List]:
+        """
+        Fetch the postings of several terms, reading cache misses in parallel.
+
+        With a deadline, terms whose fetch has not started when it expires are
+        left out of the result; the first term is always fetched. Their estimated
+        postings counts go into the deadline's work_total, as work it skipped.
+        """
+        unique_terms = list(dict.fromkeys(terms))
+
+        def fetch(term: str):
+            if deadline is not None and term != unique_terms[0] and deadline.expired():
+                return _SKIPPED
+            return self.get_postings(term, trace)
+
+        if len(unique_terms) <= 1 or self.executor is None:
+            fetched = [fetch(term) for term in unique_terms]
+        else:
+            fetched = list(self.executor.map(fetch, unique_terms))
+        postings_by_term = {
+            term: term_data for term, term_data in zip(unique_terms, fetched) if term_data is not _SKIPPED
+        }
+        skipped = [term for term, term_data in zip(unique_terms, fetched) if term_data is _SKIPPED]
+        if skipped:
+            deadline.work_total += self._estimated_postings(skipped, postings_by_term)
+        return postings_by_term
+
+    def _record_size(self, term: str) -> int:
+        offset = self.seek_positions[term]
+        return record_end(self.sorted_offsets, offset, self.file_size) - offset
+
+    def _estimated_postings(self, terms: List[str], fetched: Dict[str, List]) -> int:
+        """
+        Postings count of terms left unread: the term map gives each record's size,
+        and the fetched terms how many postings a byte of record holds.
+        """
+        known = [term for term, term_data in fetched.items() if term_data]
+        known_bytes = sum(self._record_size(term) for term in known)
+        per_byte = sum(len(fetched[term][1]) for term in known) / known_bytes if known_bytes else 0.0
+        return sum(max(1, round(self._record_size(term) * per_byte)) for term in terms if term in self.seek_positions)
+
+    def with_pinned(self, postings: Dict[str, Tuple],
+                    champion_postings: Optional[Dict[str, Tuple]] = None) -> "FileHandler":
+        """
+        A view of this open handler that serves the given decoded postings from
+        memory, whether or not the cache admitted them. It shares the files, cache
+        and fetch threads, and is never entered or exited on its own.
+        """
+        view = copy.copy(self)
+        view.pinned = postings
+        if self.champions is not None:
+            view.champions = self.champions.with_pinned(champion_postings or {})
+        return view
+
+    def cache_stats(self) -> Dict[str, float]:
+        """Hit/miss/byte counters of the postings cache"""
+        return self.cache.stats()
+
+
+class ImpactFileHandler(FileHandler):
+    """
+    Reads the impact-ordered index profile, records are (term, [(impact, doc_ids)]).
+    Impact records carry no positions: given the standard index it is built from,
+    quoted phrases are checked against that index's positional postings.
+    """
+    def __init__(self, index_path: str = INDEX_IMPACT_FILE, seek_index_path: str = INDEX_IMPACT_MAP_FILE,
+                 meta_path: str = INDEX_IMPACT_META_FILE, positions_path: Optional[str] = None,
+                 positions_seek_path: Optional[str] = None):
+        super().__init__(index_path, seek_index_path)
+        self.init_args = {
+            'index_path': str(index_path), 'seek_index_path': str(seek_index_path), 'meta_path': str(meta_path),
+            'positions_path': str(positions_path) if positions_path else None,
+            'positions_seek_path': str(positions_seek_path) if positions_seek_path else None
+        }
+        self.meta_path = Path(meta_path)
+        self.positions_path = Path(positions_path) if positions_path else None
+        self.positions_seek_path = Path(positions_seek_path) if positions_seek_path else None
+        self.positions: Optional[FileHandler] = None   # Standard index reader, for phrases
+        self.impact_values: List[float] = []   # Contribution each impact stands for
+
+    def __enter__(self):
+        super().__enter__()
+        with open(self.meta_path, "r") as f:
+            self.impact_values = impact_values(json.load(f))
+        if self.positions_path and self.positions_path.exists() and self.positions_seek_path.exists():
+            self.positions = FileHandler(self.positions_path, self.positions_seek_path).__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.positions:
+            self.positions.__exit__(exc_type, exc_val, exc_tb)
+        super().__exit__(exc_type, exc_val, exc_tb)
+
+    def _decode(self, raw: bytes) -> Tuple[str, List]:
+        term, record = pickle.loads(raw)
+        return term, decode_segments(record)
+
+    @staticmethod
+    def _decoded_size(term_data: Tuple[str, List]) -> int:
+        """Segments are a tuple and a packed doc_id array each"""
+        return 200 + sum(120 + doc_ids.itemsize * len(doc_ids) for _, doc_ids in term_data[1])
 
 
 class SearchEngine:
-    def __init__(self):
-        with open(DOCS_FILE, 'r') as f:
-            self.documents = json.load(f)
-        self.hits = HITS()
-        self.pagerank = PageRank()
-        self._load_link_scores()
+    def __init__(self, static_store: Optional[MappedStaticStore] = None,
+                 docs_path: Optional[str] = DOCS_FILE, link_scores_path: str = LINK_SCORES_FILE,
+                 autocomplete_path: str = AUTOCOMPLETE_FILE, spelling_path: str = SPELLING_FILE,
+                 doc_store_path: str = DOC_STORE_FILE, doc_store_index_path: str = DOC_STORE_INDEX_FILE,
+                 trace_log: Optional[str] = CONFIG['query_trace_log']):
+        # With a mapped static store, urls and link scores are read from shared memory instead of JSON.
+        # Without docs_path the engine only serves versions opened by reload_index().
+        # Engines whose traces are recorded by another process pass trace_log=None, so each query is logged once
+        self.static_store = static_store
+        # Enough to build an equivalent engine in another process, reading documents from JSON
+        self.init_args = {
+            'docs_path': str(docs_path) if docs_path is not None else DOCS_FILE,
+            'link_scores_path': str(link_scores_path), 'autocomplete_path': str(autocomplete_path),
+            'spelling_path': str(spelling_path), 'doc_store_path': str(doc_store_path),
+            'doc_store_index_path': str(doc_store_index_path)
+        }
+        self.link_scores_path = Path(link_scores_path)
+        self.documents = {}
+        if static_store is None and docs_path is not None:
+            with open(docs_path, 'r') as f:
+                self.documents = json.load(f)
+        self.hits = None
+        self.pagerank = None
+        self.result_cache = QueryResultCache(
+            CONFIG['result_cache_size'],
+            CONFIG['result_cache_ttl']
+        )
+        self.deadline_stats = DeadlineStats()
+        self.stage_timings = StageTimings()
+        self.metrics = QueryMetrics(trace_log=trace_log)
+        self.profiler: Optional[QueryProfiler] = None
+        if CONFIG['query_profiler']:
+            self.profiler = QueryProfiler(
+                CONFIG['query_profiler'],
+                CONFIG['query_profile_dir'],
+                CONFIG['query_profile_threshold_ms'],
+                CONFIG['query_profile_sample_rate'],
+                CONFIG['query_profile_max_files'],
+                CONFIG['query_profile_interval_ms']
+            )
+        self.static_scores: Dict[int, float] = {}
+        self.autocomplete_path = Path(autocomplete_path)
+        self.autocomplete: Optional[AutocompleteIndex] = None   # Loaded on the first completion request
+        self.spelling_path = Path(spelling_path)
+        self.spelling: Optional[SpellingCorrector] = None       # Loaded on the first query with an unknown term
+        self.doc_store_path = Path(doc_store_path)
+        self.doc_store_index_path = Path(doc_store_index_path)
+        self.snippets: Optional[SnippetGenerator] = None         # Loaded with the first results to show
+        self.lazy_load_lock = threading.Lock()
+        if static_store is None and docs_path is not None:
+            self._load_link_scores()
+
+        self.live: Optional[IndexVersion] = None   # Engine-managed index version, see reload_index()
+        self.live_lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.recent_queries = deque(maxlen=CONFIG['reload_warm_queries'])
         
 
     def _load_link_scores(self):
+        from utils.hits import HITS
+        from utils.pagerank import PageRank
+
+        self.hits = HITS()
+        self.pagerank = PageRank()
         try:
-            with open(Path(FULL_ANALYTICS_DIR) / 'link_scores.json', 'r') as f:
+            with open(self.link_scores_path, 'r') as f:
                 scores = json.load(f)
                 self.hits.auth_scores = scores['hits']['authority']
                 self.hits.hub_scores = scores['hits']['hub']
@@ -80,6 +387,101 @@ class SearchEngine:
         except FileNotFoundError:
             print("No pre-computed link scores found")
 
+        # Query-independent part of the score, looked up by doc_id during candidate selection
+        for doc_id, doc in self.documents.items():
+            url = doc["url"]
+            self.static_scores[int(doc_id)] = static_quality(
+                self.hits.auth_scores.get(url, 0.0),
+                self.hits.hub_scores.get(url, 0.0),
+                self.pagerank.scores.get(url, 0.0)
+            )
+
+    def _autocomplete_index(self) -> Optional[AutocompleteIndex]:
+        if self.autocomplete is None:
+            with self.lazy_load_lock:
+                if self.autocomplete is None and self.autocomplete_path.exists():
+                    self.autocomplete = AutocompleteIndex.load(self.autocomplete_path)
+        return self.autocomplete
+
+    def _spelling_corrector(self) -> Optional[SpellingCorrector]:
+        if self.spelling is None:
+            with self.lazy_load_lock:
+                if self.spelling is None and self.spelling_path.exists():
+                    self.spelling = SpellingCorrector.load(self.spelling_path)
+        return self.spelling
+
+    def _snippet_generator(self) -> Optional[SnippetGenerator]:
+        if self.snippets is None:
+            with self.lazy_load_lock:
+                if self.snippets is None and self.doc_store_index_path.exists():
+                    self.snippets = SnippetGenerator(DocumentStore(self.doc_store_path, self.doc_store_index_path))
+        return self.snippets
+
+    def _attach_snippets(self, results: List[SearchResult], postings_by_term: Dict[str, List],
+                         trace: Optional[QueryTrace] = None) -> None:
+        """Give the final results their snippets, from the positions of their matched terms in the fetched postings"""
+        if not CONFIG['snippets'] or not results:
+            return
+        generator = self._snippet_generator()
+        if generator is None:
+            return
+        with trace.span('snippets') if trace is not None else nullcontext():
+            doc_ids = {
+                term: DocIdView(term_data[1]) for term, term_data in postings_by_term.items() if term_data
+            }
+            for rank, result in enumerate(results):
+                positions = {}
+                for term in result.matched_terms:
+                    view = doc_ids.get(term)
+                    if view is None:
+                        continue
+                    idx = bisect.bisect_left(view, result.doc_id)
+                    if idx < len(view) and view[idx] == result.doc_id:
+                        positions[term] = view.postings[idx][4]
+                results[rank] = replace(result, snippet=generator.snippet(result.doc_id, positions))
+
+    def _spell_check(self, query: str, query_terms: List[str], vocabulary: Container[str],
+                     trace: QueryTrace) -> Optional[str]:
+        """
+        Correct the words of a query whose terms are not in the vocabulary (the index
+        terms), noting the corrected query on the trace. Returns it when it should be
+        searched instead (CONFIG['spelling_correction'] == 'auto'), else None.
+        """
+        setting = CONFIG['spelling_correction']
+        if setting == 'off' or all(term in vocabulary for term in query_terms):
+            return None
+        with trace.span('spell'):
+            corrector = self._spelling_corrector()
+            if corrector is not None:
+                trace.correction = corrector.correct(query, vocabulary.__contains__)
+        return trace.correction if setting == 'auto' else None
+
+    def complete(self, prefix: str, k: Optional[int] = None) -> List[Completion]:
+        """Completions of a partly typed word, from the live version when the engine manages one"""
+        version = self.live
+        if version is not None:
+            return version.engine.complete(prefix, k)
+        autocomplete = self._autocomplete_index()
+        return autocomplete.complete(prefix, k) if autocomplete is not None else []
+
+    def suggest(self, query: str, k: Optional[int] = None) -> List[str]:
+        """Whole queries completing the last word of a partly typed query"""
+        version = self.live
+        if version is not None:
+            return version.engine.suggest(query, k)
+        autocomplete = self._autocomplete_index()
+        return autocomplete.suggest(query, k) if autocomplete is not None else []
+
+    def _doc_url(self, doc_id: int) -> str:
+        if self.static_store is not None:
+            return self.static_store.url(doc_id)
+        return self.documents[str(doc_id)]["url"]
+
+    def _static_score(self, doc_id: int) -> float:
+        if self.static_store is not None:
+            return self.static_store.static_score(doc_id)
+        return self.static_scores.get(doc_id, 0.0)
+
 
     def _compute_query_freq_term(self, query_terms: List[str]) -> Dict[str, float]:
         """Compute normalized term frequencies for query terms"""
@@ -98,8 +500,11 @@ class SearchEngine:
 
         return query_vector
 
-    def _compute_vectors(self, query_terms: List[str], doc_scores: Dict[int, Tuple[float, set]]) -> Tuple[np.ndarray, np.ndarray]:
+    def _compute_vectors(self, query_terms: List[str], doc_scores: Dict[int, Tuple[float, set]]) -> Tuple["np.ndarray", "np.ndarray"]:
         """Vectorized query and document vector computation"""
+        import numpy as np
+        from scipy.sparse import csr_matrix
+
         # Get all terms and create mapping
         all_terms = list(set(query_terms) | {term for _, terms in doc_scores.values() for term in terms})
         term_to_idx = {term: idx for idx, term in enumerate(all_terms)}
@@ -129,14 +534,81 @@ class SearchEngine:
         
         return query_vector, doc_vectors
 
-    def search(self, query: str, max_results: int, file_handler: FileHandler) -> List[SearchResult]:
-        """Execute search query and return ranked results"""
-        query_terms = tokenize(query, for_query=True)
-        if not query_terms:
+    @staticmethod
+    def _intersect_terms(terms: List[str], postings_by_term: Dict[str, List]) -> List[Tuple[int, List]]:
+        """Documents containing every term, as (doc_id, [posting of each term]) in doc_id order"""
+        if not terms or any(not postings_by_term.get(term) for term in terms):
             return []
-            
-        print(f"\nProcessing query terms: {query_terms}")
-        
+
+        postings_lists = [postings_by_term[term][1] for term in terms]
+        return [
+            (doc_id, [postings[idx] for postings, idx in zip(postings_lists, indexes)])
+            for doc_id, indexes in intersect([DocIdView(postings) for postings in postings_lists])
+        ]
+
+    @staticmethod
+    def _doc_postings(doc_id: int, terms: List[str], postings_by_term: Dict[str, List]) -> Optional[List]:
+        """Each term's posting for one document, None unless every term has one"""
+        postings = []
+        for term in terms:
+            term_postings = postings_by_term[term][1]
+            idx = bisect.bisect_left(DocIdView(term_postings), doc_id)
+            if idx == len(term_postings) or term_postings[idx][0] != doc_id:
+                return None
+            postings.append(term_postings[idx])
+        return postings
+
+    def _phrase_matches(self, phrase: List[Tuple[str, int]], postings_by_term: Dict[str, List]) -> Set[int]:
+        """Doc ids containing the phrase, checking positions only for docs that contain every phrase term"""
+        offsets = [offset for _, offset in phrase]
+        return {
+            doc_id
+            for doc_id, postings in self._intersect_terms([stem for stem, _ in phrase], postings_by_term)
+            if count_phrase_matches([posting[4] for posting in postings], offsets)
+        }
+
+    @staticmethod
+    def _proximity_score(postings: List) -> float:
+        """How tightly the query terms cluster in a doc, given its posting for every term"""
+        window = min_covering_window([posting[4] for posting in postings])
+        return len(postings) / window if window else 0.0
+
+    def _rank(self, query_terms: List[str], postings_by_term: Dict[str, List], max_results: int,
+              phrases: List[List[Tuple[str, int]]] = (), mode: str = "or",
+              deadline: Optional[Deadline] = None, trace: Optional[QueryTrace] = None) -> List[SearchResult]:
+        """
+        Score and rank documents for tokenized query terms given their fetched postings.
+
+        mode is "or" (any term), "and" (every term) or "auto" (every term, falling
+        back to any term when fewer than max_results documents contain them all).
+        When a deadline is given, postings are scored rarest term first in blocks and
+        scoring stops once it expires; the results are then flagged approximate.
+        With CONFIG['two_stage_ranking'], only the CONFIG['rerank_depth'] best documents
+        by a cheap score (no cosine similarity or proximity) get the full blend, so the
+        ranking approximates scoring every document with it.
+        """
+        stage_start = time.perf_counter()
+
+        # Quoted phrases restrict the candidates to documents containing every phrase
+        phrase_docs: Optional[Set[int]] = None
+        for phrase in phrases:
+            matches = self._phrase_matches(phrase, postings_by_term)
+            phrase_docs = matches if phrase_docs is None else phrase_docs & matches
+            if not phrase_docs:
+                return []
+
+        # Documents containing every distinct query term, rarest term first; OR mode does not need them
+        unique_terms = list(dict.fromkeys(query_terms))
+        conjunctive = (
+            self._intersect_terms(unique_terms, postings_by_term)
+            if len(unique_terms) > 1 and mode != "or" else []
+        )
+        if phrase_docs is not None:
+            conjunctive = [(doc_id, postings) for doc_id, postings in conjunctive if doc_id in phrase_docs]
+        conjunctive_only = len(unique_terms) > 1 and (
+            mode == "and" or (mode == "auto" and len(conjunctive) >= max_results)
+        )
+
         # Track documents and their scores
         doc_scores: Dict[int, Tuple[float, set]] = defaultdict(lambda: (0.0, set()))
         
@@ -144,77 +616,710 @@ class SearchEngine:
         query_vector = self._compute_query_freq_term(query_terms)
         total_query_terms = len(query_terms)
         
-        # Process each query term
-        for term in query_terms:
-            term_data = file_handler.get_postings(term)
-            if not term_data:
-                continue
-            
-            _, postings = term_data  # term_data is a tuple of (term, postings)
-            
-            for doc_id, freq, imp, tf_idf, _ in postings:
-                score, terms = doc_scores[doc_id]
-                # Add term match bonus based on % of query terms matched
-                match_bonus = len(terms | {term}) / total_query_terms
+        if conjunctive_only:
+            # Only the intersection is scored, each term's posting is already at hand
+            for doc_id, postings in conjunctive:
+                posting_by_term = dict(zip(unique_terms, postings))
                 doc_scores[doc_id] = (
-                    score + (tf_idf * query_vector[term]), 
-                    terms | {term}
+                    sum(posting_by_term[term][3] * query_vector[term] for term in query_terms),
+                    set(unique_terms)
                 )
+
+        # Process each query term, rarest first: highest idf, so a deadline cut loses the least score
+        scored_terms = [] if conjunctive_only else sorted(
+            (term for term in query_terms if postings_by_term.get(term)),
+            key=lambda term: len(postings_by_term[term][1])
+        )
+        if deadline is not None:
+            deadline.work_total += sum(len(postings_by_term[term][1]) for term in scored_terms)
+        block_size = CONFIG['deadline_block_size']
+        # The deadline may already have cut the postings fetch short
+        out_of_time = deadline is not None and deadline.truncated
+
+        for term in scored_terms:
+            _, postings = postings_by_term[term]  # term_data is a tuple of (term, postings)
+
+            for block_start in range(0, len(postings), block_size):
+                # Always score the first block so there is something to return
+                if deadline is not None and (doc_scores or block_start) and deadline.expired():
+                    out_of_time = True
+                    break
+                block = postings[block_start:block_start + block_size]
+
+                for doc_id, freq, imp, tf_idf, _ in block:
+                    if phrase_docs is not None and doc_id not in phrase_docs:
+                        continue
+                    score, terms = doc_scores[doc_id]
+                    # Add term match bonus based on % of query terms matched
+                    match_bonus = len(terms | {term}) / total_query_terms
+                    doc_scores[doc_id] = (
+                        score + (tf_idf * query_vector[term]), 
+                        terms | {term}
+                    )
+                if deadline is not None:
+                    deadline.work_done += len(block)
+
+            if out_of_time:
+                break
             
         if not doc_scores:
             return []
+        topk_start = time.perf_counter()
+        self.stage_timings.record('score', (topk_start - stage_start) * 1000)
+        if trace is not None:
+            trace.add('score', (topk_start - stage_start) * 1000)
+
+        # Stage 1: keep the top candidates by a cheap score (term weights, match ratio, static link quality).
+        # It leaves out cosine similarity and proximity, so a document they would lift into the
+        # results can be cut here: two-stage results only approximate single-stage ranking
+        depth = CONFIG['rerank_depth']
+        if CONFIG['two_stage_ranking'] and len(doc_scores) > depth:
+            candidates = dict(heapq.nlargest(
+                depth,
+                doc_scores.items(),
+                key=lambda item: (
+                    0.2 * item[1][0] +
+                    0.6 * len(item[1][1]) / total_query_terms +
+                    self._static_score(item[0])
+                )
+            ))
+        else:
+            candidates = doc_scores
+        self.stage_timings.record('first_stage', (time.perf_counter() - topk_start) * 1000)
+        if trace is not None:
+            trace.add('topk', (time.perf_counter() - topk_start) * 1000)
+
+        # Stage 2: full feature blend, expensive features only for the candidates
+        stage_start = time.perf_counter()
+        conjunctive_postings = dict(conjunctive)
             
         # Compute cosine similarity
-        q_vec, doc_vecs = self._compute_vectors(query_terms, doc_scores)
+        from sklearn.metrics.pairwise import cosine_similarity
+        q_vec, doc_vecs = self._compute_vectors(query_terms, candidates)
         similarities = cosine_similarity(q_vec, doc_vecs)[0]
+        materialize_start = time.perf_counter()
+        if trace is not None:
+            trace.add('rerank', (materialize_start - stage_start) * 1000)
         
         # Combine scores and create results
         results = []
-        for i, (doc_id, (tf_idf_score, matched_terms)) in enumerate(doc_scores.items()):
-            url = self.documents[str(doc_id)]["url"]
+        for i, (doc_id, (tf_idf_score, matched_terms)) in enumerate(candidates.items()):
+            url = self._doc_url(doc_id)
             term_match_boost = len(matched_terms) / total_query_terms
+            doc_postings = conjunctive_postings.get(doc_id)
+            if doc_postings is None and len(unique_terms) > 1 and len(matched_terms) == len(unique_terms):
+                # OR mode skipped the intersection, look the candidate up in each term's postings instead
+                doc_postings = self._doc_postings(doc_id, unique_terms, postings_by_term)
+            proximity = self._proximity_score(doc_postings) if doc_postings else 0.0
             
-            # Get HITS + PageRank scores
-            auth_score = self.hits.auth_scores.get(url, 0.0)
-            hub_score = self.hits.hub_scores.get(url, 0.0)
-            page_rank_score = self.pagerank.scores.get(url, 0.0)
-            
-            # Updated scoring formula
+            # Updated scoring formula, HITS + PageRank come in through the static quality
             combined_score = (
                 0.2 * tf_idf_score + 
                 0.2 * similarities[i] +
                 0.6 * term_match_boost +
-                0.1 * auth_score +
-                0.1 * hub_score +
-                0.2 * page_rank_score
+                self._static_score(doc_id) +
+                CONFIG['proximity_weight'] * proximity
             )
 
             results.append(
                 SearchResult(
                     url=urldefrag(url)[0],
                     score=combined_score,
-                    matched_terms=list(matched_terms)
+                    matched_terms=tuple(matched_terms),
+                    approximate=out_of_time,
+                    doc_id=doc_id
                 )
             )
 
-        # Sort by combined score
+        # Sort by combined score; 'topk' is the candidate selection above, this is part of materializing
         results.sort(key=lambda x: x.score, reverse=True)
-        return results[:max_results]
+        if trace is not None:
+            trace.add('materialize', (time.perf_counter() - materialize_start) * 1000)
+        self.stage_timings.record('second_stage', (time.perf_counter() - stage_start) * 1000)
+        results = results[:max_results]
+        self._attach_snippets(results, postings_by_term, trace)
+        return results
+
+    def _search_champions(self, query_terms: List[str], max_results: int, file_handler: FileHandler,
+                          mode: str, deadline: Optional[Deadline] = None,
+                          trace: Optional[QueryTrace] = None) -> Optional[List[SearchResult]]:
+        """
+        Rank using only the tier-1 champion lists. Terms without one have no more
+        postings than a champion list holds, their full postings stand in for it.
+
+        Returns None when tier 1 cannot be trusted: some term's champion list was cut
+        short and the champions offer too few candidates to fill max_results.
+        """
+        champions = file_handler.champions
+        with trace.span('fetch') if trace is not None else nullcontext():
+            tier1 = champions.get_postings_many(query_terms, trace, deadline)
+            short_terms = [term for term in tier1 if term not in champions.seek_positions]
+            if short_terms:
+                tier1.update(file_handler.get_postings_many(short_terms, trace, deadline))
+        query_terms = [term for term in query_terms if term in tier1]
+        present = [term_data[1] for term_data in tier1.values() if term_data]
+        if not present:
+            return None
+
+        # Only a champion list at the cap can have left postings out (older indexes list every term)
+        exact = not any(
+            term in champions.seek_positions and len(term_data[1]) >= CONFIG['champion_list_size']
+            for term, term_data in tier1.items() if term_data
+        )
+        if not exact:
+            candidates = len({posting[0] for postings in present for posting in postings})
+            if candidates < CONFIG['champion_confidence'] * max_results:
+                return None
+
+        results = self._rank(query_terms, tier1, max_results, (), mode, deadline, trace)
+        out_of_time = deadline is not None and deadline.truncated
+        if not exact and len(results) < max_results and not out_of_time:
+            return None
+        return results
+
+    def search(self, query: str, max_results: int, file_handler: Optional[FileHandler] = None,
+               mode: Optional[str] = None, deadline_ms: Optional[float] = None,
+               trace: Optional[QueryTrace] = None) -> List[SearchResult]:
+        """
+        Execute search query and return ranked results.
+
+        Without a file_handler the query runs on the engine's live index version.
+        deadline_ms (default CONFIG['deadline_ms'], 0 disables) bounds evaluation time;
+        a query that runs out of time returns its best results so far, flagged approximate.
+        Every query is traced into self.metrics; pass a QueryTrace to also get its breakdown.
+        With CONFIG['query_profiler'] set, slow queries also leave a profile, see QueryProfiler.
+        """
+        if file_handler is None:
+            return self._search_live(query, max_results, mode, deadline_ms, trace)
+        if isinstance(file_handler, ImpactFileHandler):
+            return self.search_impact(query, max_results, file_handler, deadline_ms, trace, mode)
+
+        trace = trace or QueryTrace(query)
+        with self.profiler.profile(trace) if self.profiler is not None else nullcontext():
+            results = self._search_traced(query, max_results, file_handler, mode, deadline_ms, trace)
+            trace.finish(results)
+        self.metrics.record(trace)
+        return results
+
+    def _search_traced(self, query: str, max_results: int, file_handler: FileHandler, mode: Optional[str],
+                       deadline_ms: Optional[float], trace: QueryTrace) -> List[SearchResult]:
+        mode = mode or CONFIG['query_mode']
+        with trace.span('tokenize'):
+            query_terms, phrases = parse_query(query)
+        trace.terms = query_terms
+        if not query_terms:
+            return []
+
+        corrected = self._spell_check(query, query_terms, file_handler.seek_positions, trace)
+        if corrected is not None:
+            query_terms, phrases = parse_query(corrected)
+            trace.terms = query_terms
+        return self._evaluate(query_terms, phrases, max_results, file_handler, mode, deadline_ms, trace)
+
+    def search_parsed(self, query_terms: List[str], phrases: List[List[Tuple[str, int]]], max_results: int,
+                      file_handler: FileHandler, mode: str, deadline_ms: Optional[float] = None,
+                      trace: Optional[QueryTrace] = None) -> List[SearchResult]:
+        """
+        search() for a query already tokenized and spell-checked, as parse_query()
+        returns it, for instance by a shard coordinator: it is not corrected again.
+        """
+        trace = trace or QueryTrace(" ".join(query_terms))
+        trace.terms = query_terms
+        with self.profiler.profile(trace) if self.profiler is not None else nullcontext():
+            results = self._evaluate(query_terms, phrases, max_results, file_handler, mode, deadline_ms, trace)
+            trace.finish(results)
+        self.metrics.record(trace)
+        return results
+
+    def _evaluate(self, query_terms: List[str], phrases: List[List[Tuple[str, int]]], max_results: int,
+                  file_handler: FileHandler, mode: str, deadline_ms: Optional[float],
+                  trace: QueryTrace) -> List[SearchResult]:
+        # The budget covers evaluation, postings fetches included. It starts after tokenizing and
+        # spelling correction, which load nltk and the spelling dictionary on a process's first query
+        deadline = Deadline(CONFIG['deadline_ms'] if deadline_ms is None else deadline_ms)
+        with trace.span('result_cache'):
+            cache_key = QueryResultCache.make_key(query_terms, max_results, phrases, mode)
+            cached = self.result_cache.get(cache_key, file_handler.index_version)
+        if cached is not None:
+            trace.cached = True
+            return list(cached)
+
+        results = None
+        if file_handler.champions is not None and not phrases:
+            results = self._search_champions(query_terms, max_results, file_handler, mode, deadline, trace)
+
+        if results is None:
+            # Any tier-1 attempt was abandoned: only the work of the tier that produces the results counts
+            deadline.reset_work()
+            # Fetch every term's postings up front, then score
+            with trace.span('fetch'):
+                postings_by_term = file_handler.get_postings_many(query_terms, trace, deadline)
+            if len(postings_by_term) < len(set(query_terms)):
+                # Out of time mid-fetch: rank on the terms that were fetched
+                query_terms = [term for term in query_terms if term in postings_by_term]
+                phrases = [phrase for phrase in phrases if all(stem in postings_by_term for stem, _ in phrase)]
+            results = self._rank(query_terms, postings_by_term, max_results, phrases, mode, deadline, trace)
+
+        self.deadline_stats.record(deadline)
+        if not deadline.truncated:
+            self.result_cache.put(cache_key, results, file_handler.index_version)
+        return list(results)
+
+    def _search_live(self, query: str, max_results: int, mode: Optional[str],
+                     deadline_ms: Optional[float], trace: Optional[QueryTrace] = None) -> List[SearchResult]:
+        """Run a query pinned to the live version, so a concurrent swap cannot close it mid-query"""
+        with self.live_lock:
+            version = self.live
+            if version is None:
+                raise RuntimeError("No index version loaded: call reload_index() or pass a file_handler")
+            version.acquire()
+        try:
+            self.recent_queries.append(query)
+            return version.engine.search(query, max_results, version.file_handler, mode, deadline_ms, trace)
+        finally:
+            version.release()
+
+    def reload_index(self, version: Optional[str] = None) -> str:
+        """
+        Switch to a published index version without interrupting queries.
+
+        The version (default: the manifest's current one) is opened and its caches
+        warmed with the postings of recent queries before it is swapped in. Queries
+        already running finish on the old version, which closes its files once the
+        last of them is done. Returns the name of the live version.
+        """
+        with self.reload_lock:
+            if version is None:
+                manifest = read_manifest(INDEX_MANIFEST_FILE)
+                if not manifest or not manifest['current']:
+                    raise FileNotFoundError(f"No published index version in {INDEX_MANIFEST_FILE}")
+                version = manifest['current']
+            if self.live is not None and self.live.name == version:
+                return version
+
+            started_at = time.perf_counter()
+            loaded = IndexVersion(version).open(self)
+            loaded.warm(list(self.recent_queries))
+            with self.live_lock:
+                retired, self.live = self.live, loaded
+            if retired is not None:
+                retired.retire()
+            print(f"Index version {version} live after {time.perf_counter() - started_at:.2f}s")
+            return version
+
+    def reload_index_async(self, version: Optional[str] = None) -> threading.Thread:
+        """reload_index() in a background thread, which is returned"""
+        thread = threading.Thread(target=self.reload_index, args=(version,), daemon=True)
+        thread.start()
+        return thread
+
+    def watch_index(self, interval: Optional[float] = None) -> threading.Thread:
+        """Poll the manifest and reload whenever a new version is published"""
+        interval = interval or CONFIG['index_reload_poll_s']
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                manifest = read_manifest(INDEX_MANIFEST_FILE)
+                if manifest and manifest['current'] and (self.live is None or manifest['current'] != self.live.name):
+                    try:
+                        self.reload_index(manifest['current'])
+                    except Exception as e:
+                        print(f"Index reload failed: {e}")
+
+        thread = threading.Thread(target=poll, daemon=True)
+        thread.start()
+        return thread
+
+    def close(self) -> None:
+        """Release the live index version, close the trace log and finish writing query profiles"""
+        with self.live_lock:
+            retired, self.live = self.live, None
+        if retired is not None:
+            retired.retire()
+        self.metrics.close()
+        if self.profiler is not None:
+            self.profiler.close()
+
+    def search_impact(self, query: str, max_results: int, file_handler: ImpactFileHandler,
+                      time_budget_ms: Optional[float] = None, trace: Optional[QueryTrace] = None,
+                      mode: Optional[str] = None) -> List[SearchResult]:
+        """
+        Bounded-latency search over the impact-ordered index profile.
+
+        Scores are the summed tf-idf values of the quantized impacts; results are
+        flagged approximate when the time budget (default CONFIG['impact_time_budget_ms'],
+        0 disables) ran out. mode is as for search(). Quoted phrases are matched on the
+        positional postings of the handler's standard index; without one they raise
+        ValueError, as impact postings alone cannot tell whether terms are adjacent.
+        """
+        mode = mode or CONFIG['query_mode']
+        trace = trace or QueryTrace(query)
+        with trace.span('tokenize'):
+            query_terms, phrases = parse_query(query)
+        trace.terms = query_terms
+        if not query_terms:
+            self.metrics.record(trace.finish([]))
+            return []
+
+        corrected = self._spell_check(query, query_terms, file_handler.seek_positions, trace)
+        if corrected is not None:
+            query_terms, phrases = parse_query(corrected)
+            trace.terms = query_terms
+        if phrases and file_handler.positions is None:
+            raise ValueError("Quoted phrases need the standard index alongside the impact index")
+
+        started_at = time.perf_counter()
+        budget = CONFIG['impact_time_budget_ms'] if time_budget_ms is None else time_budget_ms
+        deadline = started_at + budget / 1000 if budget else None
+
+        query_counts = dict(Counter(query_terms))
+        with trace.span('fetch'):
+            segments_by_term = {
+                term: term_data[1]
+                for term, term_data in file_handler.get_postings_many(query_counts, trace).items()
+                if term_data
+            }
+            phrase_docs: Optional[Set[int]] = None
+            if phrases:
+                phrase_postings = file_handler.positions.get_postings_many(
+                    (stem for phrase in phrases for stem, _ in phrase), trace
+                )
+                for phrase in phrases:
+                    matches = self._phrase_matches(phrase, phrase_postings)
+                    phrase_docs = matches if phrase_docs is None else phrase_docs & matches
+        if phrase_docs is not None and not phrase_docs:
+            self.metrics.record(trace.finish([]))
+            return []
+
+        # AND and AUTO first require every term, AUTO then falls back to any term when too few documents have them all
+        terms = [term for term in query_counts if segments_by_term.get(term)]
+        attempts = [list(query_counts), []] if mode == "auto" and len(query_counts) > 1 else (
+            [list(query_counts)] if mode == "and" else [[]]
+        )
+        for required in attempts:
+            if any(term not in terms for term in required):
+                top_docs, accumulators, masks, approximate = [], {}, {}, False
+                continue
+            with trace.span('score'):
+                accumulators, masks, approximate = score_at_a_time(
+                    segments_by_term, query_counts, max_results, deadline, required,
+                    file_handler.impact_values, phrase_docs
+                )
+            required_mask = sum(1 << terms.index(term) for term in required)
+            with trace.span('topk'):
+                top_docs = heapq.nlargest(
+                    max_results,
+                    (
+                        doc_id for doc_id in accumulators
+                        if masks[doc_id] & required_mask == required_mask
+                        and (phrase_docs is None or doc_id in phrase_docs)
+                    ),
+                    key=accumulators.get
+                )
+            if len(top_docs) >= max_results or approximate:
+                break
+
+        materialize_start = time.perf_counter()
+        results = []
+        for doc_id in top_docs:
+            results.append(
+                SearchResult(
+                    url=urldefrag(self._doc_url(doc_id))[0],
+                    score=accumulators[doc_id],
+                    matched_terms=tuple(term for idx, term in enumerate(terms) if masks[doc_id] >> idx & 1),
+                    approximate=approximate,
+                    doc_id=doc_id
+                )
+            )
+        trace.add('materialize', (time.perf_counter() - materialize_start) * 1000)
+        # Impact postings carry no positions, these results get the opening window of the document
+        self._attach_snippets(results, {}, trace)
+        self.metrics.record(trace.finish(results))
+        return results
+
+    def search_batch(self, queries: List[str], max_results: int, file_handler: Optional[FileHandler] = None,
+                     num_processes: int = 1, mode: Optional[str] = None) -> List[List[SearchResult]]:
+        """
+        Execute many queries at once, returning one ranked list per query.
+
+        Every query goes through search(), so batch results are ranked, cached,
+        spell-checked, deadline-bounded and traced exactly like single queries.
+        The postings of all query terms are first read once, in index file order,
+        and held in memory for the whole batch, so no term is read twice whatever
+        the cache admits. With num_processes > 1 the distinct queries are split
+        across freshly spawned worker processes, grouped so queries sharing terms
+        go to the same worker. Workers open the memory-mapped static store next to
+        the index when there is one, rather than parsing the JSON files, and their
+        traces are recorded here; as with any spawned pool, the calling script must
+        guard its entry point with __name__ == "__main__".
+        """
+        if file_handler is None:
+            with self.live_lock:
+                version = self.live
+                if version is None:
+                    raise RuntimeError("No index version loaded: call reload_index() or pass a file_handler")
+                version.acquire()
+            try:
+                return version.engine.search_batch(queries, max_results, version.file_handler, num_processes, mode)
+            finally:
+                version.release()
+
+        unique_queries = list(dict.fromkeys(queries))
+        if num_processes > 1 and len(unique_queries) > 1:
+            chunks = _chunk_by_terms(unique_queries, num_processes)
+            # Spawned, not forked: this process has postings fetch threads and locks that a fork would copy mid-use
+            with ProcessPoolExecutor(
+                max_workers=len(chunks),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_batch_worker,
+                initargs=(self.init_args, type(file_handler), file_handler.init_args)
+            ) as pool:
+                results_by_query = {}
+                for chunk, (chunk_results, chunk_traces) in zip(chunks, pool.map(
+                        _search_batch_chunk, chunks, [max_results] * len(chunks), [mode] * len(chunks))):
+                    results_by_query.update(zip(chunk, chunk_results))
+                    for trace in chunk_traces:
+                        self.metrics.record(QueryTrace.from_dict(trace))
+        else:
+            ranked, _ = self._search_batch_local(unique_queries, max_results, file_handler, mode)
+            results_by_query = dict(zip(unique_queries, ranked))
+
+        return [list(results_by_query[query]) for query in queries]
+
+    def _search_batch_local(self, queries: List[str], max_results: int, file_handler: FileHandler,
+                            mode: Optional[str]) -> Tuple[List[List[SearchResult]], List[QueryTrace]]:
+        batch_handler = self._prefetch(queries, file_handler)
+        traces = [QueryTrace(query) for query in queries]
+        return [self.search(query, max_results, batch_handler, mode, trace=trace)
+                for query, trace in zip(queries, traces)], traces
+
+    @staticmethod
+    def _prefetch(queries: List[str], file_handler: FileHandler) -> FileHandler:
+        """
+        Read the postings (and champion lists) of every query term once, sequentially
+        through the files, and return a view of the handler serving them to the batch
+        """
+        terms = {term for query in queries for term in parse_query(query)[0]}
+        pinned = []
+        for handler in (file_handler, file_handler.champions):
+            postings = {}
+            if handler is not None:
+                for term in sorted((term for term in terms if term in handler.seek_positions),
+                                   key=handler.seek_positions.get):
+                    postings[term] = handler.get_postings(term)
+            pinned.append(postings)
+        return file_handler.with_pinned(*pinned)
+
+
+def _chunk_by_terms(queries: List[str], num_chunks: int) -> List[List[str]]:
+    """
+    Split queries into at most num_chunks chunks of near-equal size. Each query
+    joins the open chunk already holding most of its terms, longest queries first,
+    so few terms have to be read by more than one worker.
+    """
+    capacity = -(-len(queries) // num_chunks)
+    terms_by_query = {query: set(parse_query(query)[0]) for query in queries}
+    chunks: List[List[str]] = [[] for _ in range(min(num_chunks, len(queries)))]
+    chunk_terms: List[Set[str]] = [set() for _ in chunks]
+    for query in sorted(queries, key=lambda query: len(terms_by_query[query]), reverse=True):
+        idx = max(
+            (idx for idx, chunk in enumerate(chunks) if len(chunk) < capacity),
+            key=lambda idx: (len(terms_by_query[query] & chunk_terms[idx]), -len(chunks[idx]))
+        )
+        chunks[idx].append(query)
+        chunk_terms[idx] |= terms_by_query[query]
+    return [chunk for chunk in chunks if chunk]
+
+
+# Per-process state of spawned search_batch workers
+_batch_engine: Optional[SearchEngine] = None
+_batch_file_handler: Optional[FileHandler] = None
+
+
+def _init_batch_worker(engine_args: Dict, handler_class: type, handler_args: Dict) -> None:
+    global _batch_engine, _batch_file_handler
+    # The static store written next to the index has its documents, link scores and term maps
+    static_dir = Path(handler_args['index_path']).parent / Path(STATIC_DIR).name
+    store = MappedStaticStore(static_dir) if (static_dir / "meta.json").exists() else None
+    _batch_engine = SearchEngine(store, **engine_args, trace_log=None)   # The parent records the traces
+    if store is not None and not issubclass(handler_class, ImpactFileHandler):
+        handler_args = {**handler_args, 'static_store': store}
+    _batch_file_handler = handler_class(**handler_args).__enter__()
+
+
+def _search_batch_chunk(queries: List[str], max_results: int,
+                        mode: Optional[str]) -> Tuple[List[List[SearchResult]], List[Dict]]:
+    results, traces = _batch_engine._search_batch_local(queries, max_results, _batch_file_handler, mode)
+    return results, [trace.to_dict() for trace in traces]
+
+
+class IndexVersion:
+    """
+    One published index version opened for serving.
+
+    Queries pin the version with acquire()/release(). After retire() no new
+    queries reach it, and its files are closed when the last pinned query ends.
+    """
+    def __init__(self, name: str, versions_dir: str = INDEX_VERSIONS_DIR):
+        self.name = name
+        self.paths = version_paths(name, versions_dir)
+        self.engine: Optional[SearchEngine] = None
+        self.file_handler: Optional[FileHandler] = None
+        self.readers = 0
+        self.retired = False
+        self.lock = threading.Lock()
+
+    def open(self, parent: SearchEngine) -> "IndexVersion":
+        """Load the version's documents and index, sharing caches and stats with the parent engine"""
+        self.engine = SearchEngine(**engine_args(self.paths))
+        self.engine.result_cache = parent.result_cache
+        self.engine.deadline_stats = parent.deadline_stats
+        self.engine.stage_timings = parent.stage_timings
+        self.engine.metrics = parent.metrics
+        self.engine.profiler = parent.profiler
+        self.file_handler = open_file_handler(self.paths).__enter__()
+        return self
+
+    def warm(self, queries: List[str]) -> None:
+        """Prefetch the postings of recent queries so the first queries after the swap hit the cache"""
+        terms = {term for query in queries for term in parse_query(query)[0]}
+        if not terms:
+            return
+        self.file_handler.get_postings_many(terms)
+        if self.file_handler.champions is not None:
+            self.file_handler.champions.get_postings_many(terms)
+
+    def acquire(self) -> None:
+        with self.lock:
+            self.readers += 1
+
+    def release(self) -> None:
+        with self.lock:
+            self.readers -= 1
+            close_now = self.retired and self.readers == 0
+        if close_now:
+            self._close()
+
+    def retire(self) -> None:
+        with self.lock:
+            self.retired = True
+            close_now = self.readers == 0
+        if close_now:
+            self._close()
+
+    def _close(self) -> None:
+        self.file_handler.__exit__(None, None, None)
+        if self.engine.snippets is not None:
+            self.engine.snippets.store.close()
+        print(f"Closed index version {self.name}")
+
+
+def open_file_handler(paths: Optional[Dict[str, Path]] = None) -> FileHandler:
+    """File handler for the configured index profile, over full_analytics or a published version's paths"""
+    if paths is None:
+        paths = {
+            'index': INDEX_PEEK_FILE, 'map': INDEX_MAP_FILE,
+            'champions': INDEX_CHAMPION_FILE, 'champion_map': INDEX_CHAMPION_MAP_FILE,
+            'impact': INDEX_IMPACT_FILE, 'impact_map': INDEX_IMPACT_MAP_FILE, 'impact_meta': INDEX_IMPACT_META_FILE
+        }
+    if CONFIG['index_profile'] == 'impact':
+        return ImpactFileHandler(paths['impact'], paths['impact_map'], paths['impact_meta'], paths['index'], paths['map'])
+    return FileHandler(paths['index'], paths['map'], paths['champions'], paths['champion_map'])
+
+
+def open_live_engine(trace_log: Optional[str] = CONFIG['query_trace_log']) -> SearchEngine:
+    """Engine serving the manifest's current index version, following newly published versions"""
+    engine = SearchEngine(docs_path=None, trace_log=trace_log)
+    engine.reload_index()
+    if CONFIG['index_reload_poll_s']:
+        engine.watch_index()
+    return engine
+
+
+_preload_thread: Optional[threading.Thread] = None
+
+
+def preload_modules() -> threading.Thread:
+    """
+    Import nltk, numpy, scipy and sklearn in the background, ideally before the
+    first query needs them. Starts one thread per process, later calls return it.
+    """
+    global _preload_thread
+    if _preload_thread is not None:
+        return _preload_thread
+
+    def load():
+        get_stemmer()   # First: every query needs it, ranking modules only once postings are in
+        import numpy
+        import scipy.sparse
+        import sklearn.metrics.pairwise
+
+    _preload_thread = threading.Thread(target=load, daemon=True)
+    _preload_thread.start()
+    return _preload_thread
+
+
+def fast_start(static_dir: str = STATIC_DIR) -> Tuple[SearchEngine, FileHandler]:
+    """
+    Engine and file handler over the memory-mapped startup snapshot.
+
+    No JSON is parsed: documents, link scores and both term maps come from the
+    static store written at index time, and the heavy modules load on a
+    background thread. Falls back to a regular start when there is no snapshot.
+    """
+    preload_modules()
+    if not (Path(static_dir) / "meta.json").exists():
+        print(f"No startup snapshot in {static_dir}, loading JSON index files")
+        return SearchEngine(), open_file_handler().__enter__()
+
+    store = MappedStaticStore(static_dir)
+    file_handler = FileHandler(
+        INDEX_PEEK_FILE, INDEX_MAP_FILE, INDEX_CHAMPION_FILE, INDEX_CHAMPION_MAP_FILE,
+        static_store=store
+    ).__enter__()
+    return SearchEngine(static_store=store), file_handler
 
 
 def main():
-    search_engine = SearchEngine()
-    
-    with FileHandler(INDEX_PEEK_FILE, INDEX_MAP_FILE) as fh:
+    parser = argparse.ArgumentParser(description="Interactive search")
+    parser.add_argument("--fast-start", action="store_true",
+                        help="Start from the memory-mapped snapshot and report time to first query")
+    args = parser.parse_args()
+
+    # The stemmer and the ranking modules load while the index opens and the first query is typed
+    preload_modules()
+    if args.fast_start:
+        search_engine, fh = fast_start()
+        ready_ms = (time.perf_counter() - _PROCESS_START) * 1000
+        print(f"Ready in {ready_ms:.0f} ms")
+    elif read_manifest(INDEX_MANIFEST_FILE) is not None:
+        search_engine = open_live_engine()
+        fh = None
+    else:
+        search_engine = SearchEngine()
+        fh = open_file_handler().__enter__()
+
+    first_query = True
+    try:
         while True:
             query = input("\nEnter search query (or 'q' to exit): ").strip()
             if query.lower() == 'q':
                 break
                 
             start_time = time.time()
-            results = search_engine.search(query, 10, fh)
+            trace = QueryTrace(query)
+            results = search_engine.search(query, 10, fh, trace=trace)
             query_time = time.time() - start_time
+            if args.fast_start and first_query:
+                # Startup plus the first query, leaving out the time spent typing it
+                print(f"Time to first query: {ready_ms + query_time * 1000:.0f} ms")
+            first_query = False
             
+            if trace.correction is not None:
+                applied = CONFIG['spelling_correction'] == 'auto'
+                print(f"{'Showing results for' if applied else 'Did you mean'}: {trace.correction}")
+
             if not results:
                 print("No results found.")
                 continue
@@ -223,8 +1328,15 @@ def main():
             for i, result in enumerate(results, 1):
                 print(f"\n{i}. {result.url}")
                 print(f"   Score: {result.score:.4f}")
-                print(f"   Matched terms: {result.matched_terms}")
+                print(f"   Matched terms: {', '.join(result.matched_terms)}")
+                if result.snippet is not None:
+                    print(f"   {result.snippet.marked('[', ']')}")
             print(f"\nSearch completed in {query_time:.4f} seconds")
+            print(f"Terms: {trace.terms}, {trace.summary()}")
+    finally:
+        if fh is not None:
+            fh.__exit__(None, None, None)
+        search_engine.close()
 
 
 if __name__ == "__main__":
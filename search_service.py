@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+
+from http import HTTPStatus
+from dataclasses import asdict
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from search import SearchEngine, FileHandler, open_file_handler, open_live_engine, preload_modules
+from utils.index_versions import read_manifest
+from utils.query_trace import QueryTrace, QueryMetrics
+from utils.constants import CONFIG
+
+
+# Per-process search state, created once by the pool initializer
+_engine: Optional[SearchEngine] = None
+_file_handler: Optional[FileHandler] = None
+
+
+def _init_worker() -> None:
+    """Load the search engine and open the index once per worker process"""
+    global _engine, _file_handler
+    preload_modules()
+    # The front end records every trace it gets back, workers keep no trace log of their own
+    if read_manifest() is not None:
+        # Each worker follows the manifest and swaps in new versions on its own
+        _engine = open_live_engine(trace_log=None)
+        return
+    _engine = SearchEngine(trace_log=None)
+    _file_handler = open_file_handler().__enter__()
+
+
+class RequestError(Exception):
+    """A request that cannot be served, answered with its status before the connection is closed"""
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _run_search(query: str, max_results: int, submitted_at: float) -> Dict:
+    """Execute one query inside a worker process"""
+    started_at = time.monotonic()
+    trace = QueryTrace(query)
+    results = _engine.search(query, max_results, _file_handler, trace=trace)
+    finished_at = time.monotonic()
+    return {
+        'results': [
+            {**asdict(result), 'score': float(result.score)}
+            for result in results
+        ],
+        'timing': {
+            'queue_ms': (started_at - submitted_at) * 1000,
+            'search_ms': (finished_at - started_at) * 1000
+        },
+        'trace': trace.to_dict()
+    }
+
+
+def _run_suggest(query: str, max_suggestions: int) -> List[str]:
+    """Complete the query's last word inside a worker process, against the index it serves"""
+    return _engine.suggest(query, max_suggestions)
+
+
+class SearchService:
+    """
+    Minimal asyncio HTTP/1.1 JSON front end for SearchEngine.
+
+    Scoring runs in a process pool so the event loop only parses requests and
+    writes responses. Identical queries that arrive while one is already being
+    computed wait on the same future instead of being submitted again. Workers
+    send back each query's trace, aggregated here and served at /metrics.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 8080, num_workers: Optional[int] = None):
+        self.host = host
+        self.port = port
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.in_flight: Dict[Tuple[str, int], asyncio.Future] = {}
+        self.requests_served = 0
+        self.coalesced = 0
+        self.metrics = QueryMetrics(trace_log=CONFIG['query_trace_log'])
+
+    @staticmethod
+    def _coalesce_key(query: str, max_results: int) -> Tuple[str, int]:
+        return (" ".join(query.lower().split()), max_results)
+
+    async def search(self, query: str, max_results: int) -> Dict:
+        """Run a query on the worker pool, sharing the computation with identical in-flight queries"""
+        received_at = time.monotonic()
+        key = self._coalesce_key(query, max_results)
+
+        future = self.in_flight.get(key)
+        coalesced = future is not None
+        if coalesced:
+            self.coalesced += 1
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.pool, _run_search, query, max_results, received_at)
+            self.in_flight[key] = future
+            future.add_done_callback(self._record_trace)
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+
+        payload = await asyncio.shield(future)
+        self.requests_served += 1
+        if coalesced:
+            # The computation is recorded once, by _record_trace; this request only adds its own latency
+            self.metrics.record(QueryTrace.from_dict({
+                **payload['trace'],
+                'query': query,
+                'timestamp': time.time(),
+                'total_ms': (time.monotonic() - received_at) * 1000,
+                'spans': {},
+                'fetches': {},
+                'coalesced': True
+            }))
+        return {
+            'query': query,
+            'results': payload['results'],
+            'correction': payload['trace']['correction'],
+            'coalesced': coalesced,
+            'timing': {
+                **payload['timing'],
+                'total_ms': (time.monotonic() - received_at) * 1000
+            },
+            'trace': payload['trace']['spans']
+        }
+
+    def _record_trace(self, future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is None:
+            self.metrics.record(QueryTrace.from_dict(future.result()['trace']))
+
+    async def _route(self, target: str) -> Tuple[int, Union[Dict, str]]:
+        parts = urlsplit(target)
+        params = parse_qs(parts.query)
+
+        if parts.path == "/search":
+            query = params.get("q", [""])[0].strip()
+            if not query:
+                return 400, {'error': "missing query parameter 'q'"}
+            try:
+                max_results = int(params.get("k", [CONFIG['service_default_results']])[0])
+            except ValueError:
+                return 400, {'error': "'k' must be an integer"}
+            max_results = max(1, min(max_results, CONFIG['service_max_results']))
+            return 200, await self.search(query, max_results)
+
+        if parts.path == "/complete":
+            query = params.get("q", [""])[0]
+            try:
+                max_suggestions = int(params.get("k", [CONFIG['autocomplete_top_k']])[0])
+            except ValueError:
+                return 400, {'error': "'k' must be an integer"}
+            max_suggestions = max(1, min(max_suggestions, CONFIG['service_max_results']))
+            loop = asyncio.get_running_loop()
+            suggestions = await loop.run_in_executor(self.pool, _run_suggest, query, max_suggestions)
+            return 200, {'query': query, 'suggestions': suggestions}
+
+        if parts.path == "/health":
+            return 200, {
+                'status': 'ok',
+                'workers': self.num_workers,
+                'requests_served': self.requests_served,
+                'coalesced': self.coalesced,
+                'in_flight': len(self.in_flight)
+            }
+
+        if parts.path == "/metrics":
+            # Prometheus text exposition format
+            return 200, self.metrics.to_prometheus()
+
+        return 404, {'error': f"unknown path {parts.path}"}
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[bytes, Dict[str, str]]]:
+        """Request line and headers, None once the client closed the connection; the body is drained"""
+        max_header_bytes = CONFIG['service_max_header_bytes']
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return None
+            header_bytes = len(request_line)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                header_bytes += len(line)
+                if header_bytes > max_header_bytes:
+                    raise RequestError(431, "request headers too large")
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+        except ValueError:
+            # One line longer than the stream reader's limit
+            raise RequestError(431, "request headers too large")
+
+        # Bodies are not used by any route, but must be drained to keep the stream in sync
+        try:
+            body_length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise RequestError(400, "malformed Content-Length header")
+        if body_length < 0:
+            raise RequestError(400, "malformed Content-Length header")
+        if body_length > CONFIG['service_max_body_bytes']:
+            raise RequestError(413, "request body too large")
+        if body_length:
+            await reader.readexactly(body_length)
+        return request_line, headers
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload: Union[Dict, str],
+                       keep_alive: bool) -> None:
+        if isinstance(payload, str):
+            body = payload.encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        else:
+            body = json.dumps(payload).encode("utf-8")
+            content_type = "application/json"
+        writer.write(
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve requests on one keep-alive connection"""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except RequestError as e:
+                    # The stream can no longer be trusted to be at a request boundary
+                    await self._respond(writer, e.status, {'error': str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                request_line, headers = request
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    status, payload = 400, {'error': 'malformed request line'}
+                    version = "HTTP/1.1"
+                else:
+                    if method != "GET":
+                        status, payload = 405, {'error': f"method {method} not allowed"}
+                    else:
+                        try:
+                            status, payload = await self._route(target)
+                        except Exception as e:
+                            status, payload = 500, {'error': str(e)}
+
+                keep_alive = (
+                    version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                ) or headers.get("connection", "").lower() == "keep-alive"
+
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        self.pool = ProcessPoolExecutor(max_workers=self.num_workers, initializer=_init_worker)
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port, backlog=1024,
+                                            limit=CONFIG['service_max_header_bytes'])
+        print(f"Serving search on http://{self.host}:{self.port}/search?q=... with {self.num_workers} workers")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.shutdown(wait=True)
+            self.metrics.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asyncio JSON search service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    service = SearchService(args.host, args.port, args.workers)
+    try:
+        asyncio.run(service.serve())
+    except KeyboardInterrupt:
+        print("\nShutting down search service")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import os
+import time
+import queue
+import itertools
+import threading
+import multiprocessing
+
+from typing import Dict, List, Optional
+
+from search import SearchEngine, FileHandler, SearchResult, preload_modules
+from utils.static_store import MappedStaticStore
+from utils.constants import (
+    INDEX_PEEK_FILE,
+    INDEX_MAP_FILE,
+    INDEX_CHAMPION_FILE,
+    INDEX_CHAMPION_MAP_FILE,
+    STATIC_DIR,
+    CONFIG
+)
+
+_POLL_S = 0.5   # How often the pool checks that its searchers are alive
+
+
+def _searcher_worker(worker_id: int, static_dir: str, requests, responses, current) -> None:
+    """
+    Serve (query_id, query, k, mode) requests from the shared queue until a None arrives.
+    current[worker_id] holds the query being served (-1 when idle), so the pool knows
+    which query to fail if this process dies.
+    """
+    preload = preload_modules()
+    store = MappedStaticStore(static_dir)
+    engine = SearchEngine(static_store=store)
+    with FileHandler(INDEX_PEEK_FILE, INDEX_MAP_FILE, INDEX_CHAMPION_FILE, INDEX_CHAMPION_MAP_FILE,
+                     cache_bytes=CONFIG['pool_worker_cache_bytes'], static_store=store) as fh:
+        # Ready only once nltk and the ranking modules are in, so no query pays for importing them
+        preload.join()
+        responses.put((None, worker_id, "ready"))
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            query_id, query, max_results, mode = request
+            current[worker_id] = query_id
+            try:
+                responses.put((query_id, worker_id, engine.search(query, max_results, fh, mode=mode)))
+            except Exception as e:
+                print(f"Searcher {worker_id} error on {query!r}: {e}")
+                responses.put((query_id, worker_id, []))
+            current[worker_id] = -1
+    store.close()
+
+
+class SearcherPool:
+    """
+    N read-only searcher processes fed from one shared query queue.
+
+    Workers never parse documents.json, link_scores.json or the term map: they
+    read urls, link scores and term offsets from the memory-mapped static store
+    (see utils/static_store.py), and postings with pread, so all of that is
+    shared through the page cache. What each worker owns privately is its
+    interpreter, a small postings cache (CONFIG['pool_worker_cache_bytes']) and
+    its result cache.
+    """
+    def __init__(self, num_workers: Optional[int] = None, static_dir: str = STATIC_DIR):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.static_dir = static_dir
+        self.context = multiprocessing.get_context()
+        self.requests = self.context.Queue()
+        self.responses = self.context.Queue()
+        self.workers = []
+        self.current = self.context.RawArray('q', [-1] * self.num_workers)   # Query each worker is serving
+        self.dead_workers: Dict[int, int] = {}   # worker_id: exit code
+        self.closing = False
+        self.query_ids = itertools.count()
+        self.pending: Dict[int, Dict] = {}
+        self.pending_lock = threading.Lock()
+        self.ready = threading.Semaphore(0)
+        self.dispatcher = None
+
+    def __enter__(self):
+        for worker_id in range(self.num_workers):
+            worker = self.context.Process(
+                target=_searcher_worker,
+                args=(worker_id, self.static_dir, self.requests, self.responses, self.current),
+                daemon=True
+            )
+            worker.start()
+            self.workers.append(worker)
+
+        self.dispatcher = threading.Thread(target=self._dispatch_responses, daemon=True)
+        self.dispatcher.start()
+        try:
+            self._wait_ready()
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def _wait_ready(self) -> None:
+        """Block until every searcher has opened the static store, raising if one dies or they take too long"""
+        timeout = CONFIG['worker_start_timeout_s']
+        expires_at = time.monotonic() + timeout
+        ready = 0
+        while ready < self.num_workers:
+            if self.ready.acquire(timeout=_POLL_S):
+                ready += 1
+                continue
+            for worker_id, worker in enumerate(self.workers):
+                if not worker.is_alive():
+                    raise RuntimeError(f"Searcher {worker_id} exited with code {worker.exitcode} before it was ready")
+            if time.monotonic() >= expires_at:
+                raise TimeoutError(f"Only {ready} of {self.num_workers} searchers ready after {timeout}s")
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.closing = True
+        for _ in self.workers:
+            self.requests.put(None)
+        for worker in self.workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self.responses.put(None)
+        self.dispatcher.join(timeout=5)
+        # A searcher killed mid-write leaves a queue lock held: never block interpreter exit on flushing them
+        self.requests.cancel_join_thread()
+        self.responses.cancel_join_thread()
+
+    def _fail(self, query_id: int, error: Exception) -> None:
+        with self.pending_lock:
+            waiting = self.pending.pop(query_id, None)
+        if waiting is not None:
+            waiting['error'] = error
+            waiting['done'].set()
+
+    def _check_workers(self) -> None:
+        """Fail the query of every searcher that died, and every pending query once none is left"""
+        for worker_id, worker in enumerate(self.workers):
+            if self.closing or worker_id in self.dead_workers or worker.is_alive():
+                continue
+            print(f"Searcher {worker_id} exited with code {worker.exitcode}")
+            with self.pending_lock:
+                self.dead_workers[worker_id] = worker.exitcode
+            self._fail(self.current[worker_id], RuntimeError(f"Searcher {worker_id} exited with code {worker.exitcode}"))
+
+        if self.workers and len(self.dead_workers) == len(self.workers):
+            with self.pending_lock:
+                query_ids = list(self.pending)
+            for query_id in query_ids:
+                self._fail(query_id, RuntimeError("Every searcher process has exited"))
+
+    def _dispatch_responses(self) -> None:
+        """Hand each worker reply to the caller waiting on that query, and watch for searchers dying"""
+        next_check = time.monotonic() + _POLL_S
+        while True:
+            try:
+                message = self.responses.get(timeout=_POLL_S)
+            except queue.Empty:
+                message = ()
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + _POLL_S
+            if message is None or (not message and self.closing):
+                break
+            if not message:
+                continue
+            query_id, _, payload = message
+            if query_id is None:
+                self.ready.release()
+                continue
+            with self.pending_lock:
+                waiting = self.pending.pop(query_id, None)
+            if waiting is not None:
+                waiting['results'] = payload
+                waiting['done'].set()
+
+    def submit(self, query: str, max_results: int, mode: Optional[str] = None) -> Dict:
+        """Queue a query, returns a handle for wait()"""
+        query_id = next(self.query_ids)
+        waiting = {'query_id': query_id, 'results': [], 'done': threading.Event(), 'error': None}
+        with self.pending_lock:
+            if len(self.dead_workers) == len(self.workers):
+                raise RuntimeError("Every searcher process has exited")
+            self.pending[query_id] = waiting
+        self.requests.put((query_id, query, max_results, mode))
+        return waiting
+
+    def wait(self, handle: Dict, timeout: Optional[float] = None) -> List[SearchResult]:
+        """
+        Results of a submitted query. Raises TimeoutError when they take longer than
+        timeout (default CONFIG['pool_query_timeout_s']), RuntimeError when the
+        searcher serving the query died.
+        """
+        timeout = CONFIG['pool_query_timeout_s'] if timeout is None else timeout
+        if not handle['done'].wait(timeout):
+            with self.pending_lock:
+                self.pending.pop(handle['query_id'], None)
+            raise TimeoutError(f"No results for query {handle['query_id']} after {timeout}s")
+        if handle['error'] is not None:
+            raise handle['error']
+        return handle['results']
+
+    def search(self, query: str, max_results: int, mode: Optional[str] = None) -> List[SearchResult]:
+        return self.wait(self.submit(query, max_results, mode))
+
+    def search_many(self, queries: List[str], max_results: int, mode: Optional[str] = None) -> List[List[SearchResult]]:
+        """Spread a list of queries over all workers and collect the results in order"""
+        handles = [self.submit(query, max_results, mode) for query in queries]
+        return [self.wait(handle) for handle in handles]
+
+
+def main():
+    with SearcherPool() as pool:
+        print(f"Started {pool.num_workers} searcher processes")
+        while True:
+            query = input("\nEnter search query (or 'q' to exit): ").strip()
+            if query.lower() == 'q':
+                break
+
+            start_time = time.time()
+            results = pool.search(query, 10)
+            query_time = time.time() - start_time
+
+            if not results:
+                print("No results found.")
+                continue
+
+            print(f"\nFound {len(results)} results:")
+            for i, result in enumerate(results, 1):
+                print(f"\n{i}. {result.url}")
+                print(f"   Score: {result.score:.4f}")
+                print(f"   Matched terms: {', '.join(result.matched_terms)}")
+            print(f"\nSearch completed in {query_time:.4f} seconds")
+
+
+if __name__ == "__main__":
+    main()
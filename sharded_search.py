@@ -0,0 +1,290 @@
+import json
+import time
+import heapq
+import queue
+import itertools
+import threading
+import multiprocessing
+
+from pathlib import Path
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+
+from search import SearchEngine, FileHandler, SearchResult, preload_modules
+from utils.tokenizer import parse_query
+from utils.query_trace import QueryTrace
+from utils.shard_builder import shard_paths
+from utils.index_versions import read_manifest, version_paths, engine_args
+from utils.constants import SHARD_DIR, INDEX_MANIFEST_FILE, CONFIG
+
+_POLL_S = 0.5   # How often the coordinator checks that its shard searchers are alive
+
+
+def _shard_worker(shard_id: int, shard_dir: str, engine_kwargs: Dict, requests, responses) -> None:
+    """
+    Searcher process for one shard: answers (query_id, query_terms, phrases, k, mode) requests,
+    already parsed and spell-checked by the coordinator, with its local top-k and query trace
+    """
+    preload = preload_modules()
+    paths = shard_paths(shard_id, shard_dir)
+    engine = SearchEngine(**engine_kwargs, trace_log=None)   # The coordinator records the merged trace
+    with FileHandler(paths['index'], paths['map'], paths['champions'], paths['champion_map']) as fh:
+        # Ready only once nltk and the ranking modules are in, so no query pays for importing them
+        preload.join()
+        responses.put((None, shard_id, "ready"))
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            query_id, query_terms, phrases, max_results, mode = request
+            trace = QueryTrace(" ".join(query_terms))
+            try:
+                results = engine.search_parsed(query_terms, phrases, max_results, fh, mode, trace=trace)
+            except Exception as e:
+                print(f"Shard {shard_id} error on {query_terms!r}: {e}")
+                results = []
+            responses.put((query_id, shard_id, (results, trace.to_dict())))
+
+
+class ShardCoordinator:
+    """
+    Scatter-gather search over the doc-partitioned shards written by ShardBuilder.
+
+    Each shard is served by its own process (a local stand-in for a search node).
+    A query is sent to every shard, each returns its local top-k, and the
+    coordinator merges them into the global top-k. Shard scores are comparable
+    because the postings carry tf-idf computed from corpus-wide statistics.
+    Everything that needs the whole corpus happens here, once per query: spelling
+    correction against the corpus-wide vocabulary, settling 'auto' mode on AND or
+    OR, and recording the query's trace, merged from the shards' traces.
+
+    Given a published version name ("current" for the manifest's current one),
+    the shards and documents published with that version are served instead of
+    the build outputs in shard_dir and full_analytics.
+    """
+    def __init__(self, shard_dir: str = SHARD_DIR, version: Optional[str] = None):
+        self.engine_kwargs: Dict = {}
+        if version is not None:
+            if version == "current":
+                manifest = read_manifest(INDEX_MANIFEST_FILE)
+                if not manifest or not manifest['current']:
+                    raise FileNotFoundError(f"No published index version in {INDEX_MANIFEST_FILE}")
+                version = manifest['current']
+            paths = version_paths(version)
+            if not paths['shards'].exists():
+                raise FileNotFoundError(f"Index version {version} was published without shards")
+            shard_dir = str(paths['shards'])
+            self.engine_kwargs = engine_args(paths)
+        self.shard_dir = shard_dir
+        self.version = version
+        with open(Path(shard_dir) / "manifest.json") as f:
+            self.manifest = json.load(f)
+        self.num_shards = self.manifest['num_shards']
+        # Spelling correction and query metrics only: documents are served by the shards
+        self.engine = SearchEngine(**{**self.engine_kwargs, 'docs_path': None}, trace_log=CONFIG['query_trace_log'])
+
+        self.context = multiprocessing.get_context()
+        self.responses = self.context.Queue()
+        self.requests = [self.context.Queue() for _ in range(self.num_shards)]
+        self.workers = []
+        self.query_ids = itertools.count()
+        self.pending: Dict[int, Dict] = {}
+        self.pending_lock = threading.Lock()
+        self.ready = threading.Semaphore(0)
+        self.dead_shards: Dict[int, int] = {}   # shard_id: exit code of its searcher
+        self.closing = False
+        self.dispatcher = None
+
+    def __enter__(self):
+        # Queries are tokenized here, nltk and the ranking modules load while the shards start
+        preload = preload_modules()
+        for shard_id in range(self.num_shards):
+            worker = self.context.Process(
+                target=_shard_worker,
+                args=(shard_id, self.shard_dir, self.engine_kwargs, self.requests[shard_id], self.responses),
+                daemon=True
+            )
+            worker.start()
+            self.workers.append(worker)
+
+        self.dispatcher = threading.Thread(target=self._dispatch_responses, daemon=True)
+        self.dispatcher.start()
+        try:
+            self._wait_ready()
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        preload.join()
+        return self
+
+    def _wait_ready(self) -> None:
+        """Block until every shard searcher has opened its index, raising if one dies or they take too long"""
+        timeout = CONFIG['worker_start_timeout_s']
+        expires_at = time.monotonic() + timeout
+        ready = 0
+        while ready < self.num_shards:
+            if self.ready.acquire(timeout=_POLL_S):
+                ready += 1
+                continue
+            for shard_id, worker in enumerate(self.workers):
+                if not worker.is_alive():
+                    raise RuntimeError(f"Shard {shard_id} searcher exited with code {worker.exitcode} before it was ready")
+            if time.monotonic() >= expires_at:
+                raise TimeoutError(f"Only {ready} of {self.num_shards} shard searchers ready after {timeout}s")
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.closing = True
+        for requests in self.requests:
+            requests.put(None)
+        for worker in self.workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self.responses.put(None)
+        self.dispatcher.join(timeout=5)
+        # A searcher killed mid-write leaves a queue lock held: never block interpreter exit on flushing them
+        for requests in self.requests:
+            requests.cancel_join_thread()
+        self.responses.cancel_join_thread()
+        self.engine.close()
+
+    def _check_workers(self) -> None:
+        """Fail every pending query once a shard searcher has died: its part of the results will never come"""
+        for shard_id, worker in enumerate(self.workers):
+            if self.closing or shard_id in self.dead_shards or worker.is_alive():
+                continue
+            print(f"Shard {shard_id} searcher exited with code {worker.exitcode}")
+            with self.pending_lock:
+                self.dead_shards[shard_id] = worker.exitcode
+                for waiting in self.pending.values():
+                    waiting['error'] = RuntimeError(f"Shard {shard_id} searcher exited with code {worker.exitcode}")
+                    waiting['done'].set()
+
+    def _dispatch_responses(self) -> None:
+        """Route shard replies to the query waiting for them, and watch for shard searchers dying"""
+        next_check = time.monotonic() + _POLL_S
+        while True:
+            try:
+                message = self.responses.get(timeout=_POLL_S)
+            except queue.Empty:
+                message = ()
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + _POLL_S
+            if message is None or (not message and self.closing):
+                break
+            if not message:
+                continue
+            query_id, shard_id, payload = message
+            if query_id is None:
+                self.ready.release()
+                continue
+            with self.pending_lock:
+                waiting = self.pending.get(query_id)
+                if waiting is None:
+                    continue            # Query already timed out
+                waiting['results'].append(payload)
+                if len(waiting['results']) == self.num_shards:
+                    waiting['done'].set()
+
+    def search(self, query: str, max_results: int, mode: Optional[str] = None,
+               timeout: Optional[float] = None) -> List[SearchResult]:
+        """
+        Fan the query out to every shard and merge the per-shard top-k lists.
+
+        In 'auto' mode every shard is first asked for documents with all the terms,
+        and asked again for documents with any term when fewer than max_results
+        have them all across the shards. Shards that miss the timeout are left out
+        and the results flagged approximate; raises RuntimeError once a shard
+        searcher has died.
+        """
+        mode = mode or CONFIG['query_mode']
+        trace = QueryTrace(query)
+        with trace.span('tokenize'):
+            query_terms, phrases = parse_query(query)
+        trace.terms = query_terms
+        if not query_terms:
+            self.engine.metrics.record(trace.finish([]))
+            return []
+
+        corrected = self.engine._spell_check(query, query_terms, self.manifest['global_df'], trace)
+        if corrected is not None:
+            query_terms, phrases = parse_query(corrected)
+            trace.terms = query_terms
+
+        expires_at = time.monotonic() + (CONFIG['shard_timeout_s'] if timeout is None else timeout)
+        if mode == "auto":
+            modes = ["and", "or"] if len(set(query_terms)) > 1 else ["or"]
+        else:
+            modes = [mode]
+        for attempt in modes:
+            shard_results, shard_traces, completed = self._scatter(query_terms, phrases, max_results, attempt, expires_at)
+            trace.merge([QueryTrace.from_dict(shard_trace) for shard_trace in shard_traces])
+            if not completed or sum(len(results) for results in shard_results) >= max_results:
+                break
+
+        merged = heapq.nlargest(
+            max_results,
+            itertools.chain.from_iterable(shard_results),
+            key=lambda result: result.score
+        )
+        if not completed:
+            # Some shard missed the deadline, so documents it owns may be missing
+            merged = [replace(result, approximate=True) for result in merged]
+        self.engine.metrics.record(trace.finish(merged))
+        return merged
+
+    def _scatter(self, query_terms: List[str], phrases: List, max_results: int, mode: str,
+                 expires_at: float) -> Tuple[List[List[SearchResult]], List[Dict], bool]:
+        """Send a parsed query to every shard, returning the results and traces of those answering in time"""
+        query_id = next(self.query_ids)
+        waiting = {'results': [], 'done': threading.Event(), 'error': None}
+        with self.pending_lock:
+            if self.dead_shards:
+                shard_id, exit_code = next(iter(self.dead_shards.items()))
+                raise RuntimeError(f"Shard {shard_id} searcher exited with code {exit_code}")
+            self.pending[query_id] = waiting
+
+        for requests in self.requests:
+            requests.put((query_id, query_terms, phrases, max_results, mode))
+
+        completed = waiting['done'].wait(max(0.0, expires_at - time.monotonic()))
+        with self.pending_lock:
+            del self.pending[query_id]
+            replies = list(waiting['results'])
+        if waiting['error'] is not None:
+            raise waiting['error']
+        return [results for results, _ in replies], [shard_trace for _, shard_trace in replies], completed
+
+
+def main():
+    # Serve the current published version when it carries shards, else the last build
+    manifest = read_manifest(INDEX_MANIFEST_FILE)
+    version = manifest['current'] if manifest and manifest['current'] else None
+    if version is not None and not version_paths(version)['shards'].exists():
+        version = None
+    with ShardCoordinator(version=version) as coordinator:
+        print(f"Connected to {coordinator.num_shards} shard searchers")
+        while True:
+            query = input("\nEnter search query (or 'q' to exit): ").strip()
+            if query.lower() == 'q':
+                break
+
+            start_time = time.time()
+            results = coordinator.search(query, 10)
+            query_time = time.time() - start_time
+
+            if not results:
+                print("No results found.")
+                continue
+
+            print(f"\nFound {len(results)} results:")
+            for i, result in enumerate(results, 1):
+                print(f"\n{i}. {result.url}")
+                print(f"   Score: {result.score:.4f}")
+                print(f"   Matched terms: {', '.join(result.matched_terms)}")
+            print(f"\nSearch completed in {query_time:.4f} seconds")
+
+
+if __name__ == "__main__":
+    main()
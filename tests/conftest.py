@@ -0,0 +1,55 @@
+import os
+import sys
+import contextlib
+
+from pathlib import Path
+
+import pytest
+
+# The modules are imported as top-level packages (utils, components), as the scripts do
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.constants import CONFIG
+
+# What the built_index fixture builds beyond the defaults: every index profile and shards
+BUILD_CONFIG = {'index_profile': 'impact', 'num_shards': 3}
+
+
+@contextlib.contextmanager
+def config(**overrides):
+    """CONFIG with some values replaced, restored afterwards"""
+    saved = {key: CONFIG[key] for key in overrides}
+    CONFIG.update(overrides)
+    try:
+        yield
+    finally:
+        CONFIG.update(saved)
+
+
+@pytest.fixture(scope="session")
+def built_index(tmp_path_factory):
+    """
+    Directory holding a synthetic corpus and everything indexer.py builds from it.
+    Paths in utils.constants are relative, so tests chdir into it (see in_index).
+    Shared by the whole session: tests must not modify it, copy it first.
+    """
+    from benchmarks.corpus_generator import CorpusGenerator
+    from indexer import Indexer, run_pipeline
+
+    root = tmp_path_factory.mktemp("built_index")
+    CorpusGenerator(num_docs=300, vocab_size=3000, words_per_doc=150, seed=121).generate(root / "DEV")
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        with config(**BUILD_CONFIG), open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            run_pipeline(Indexer("DEV"))
+    finally:
+        os.chdir(cwd)
+    return root
+
+
+@pytest.fixture
+def in_index(built_index, monkeypatch):
+    """Run the test from the built index directory (queries use the default, standard profile)"""
+    monkeypatch.chdir(built_index)
+    return built_index
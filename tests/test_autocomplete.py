@@ -0,0 +1,67 @@
+import random
+
+from utils.autocomplete import AutocompleteIndex
+from utils.constants import STOP_WORDS
+from utils.tokenizer import get_stemmer
+
+ROOTS = ["comput", "compil", "connect", "graduat", "grade", "research", "search", "science", "scien", "c", "co"]
+SUFFIXES = ["", "e", "er", "ers", "es", "ing", "ed", "ation", "ist", "s"]
+
+
+def corpus(rng):
+    """Surface word counts sharing many prefixes and stems, and the dfs of the stems kept as index terms"""
+    surface_counts = {root + suffix: rng.randint(1, 50) for root in ROOTS for suffix in SUFFIXES
+                      if rng.random() < 0.7}
+    surface_counts.update({"the": 500, "to": 400, "can": 300})
+    stemmer = get_stemmer()
+    stems = sorted({stemmer.stem(surface) for surface in surface_counts})
+    # Ties between stems are common, and some stems are not index terms
+    dfs = {stem: rng.randint(1, 8) for stem in stems if rng.random() < 0.9}
+    return surface_counts, dfs
+
+
+def reference_complete(surface_counts, dfs, prefix, k):
+    """Every matching word ranked from scratch: stem df, then word count, then alphabetically, one per stem"""
+    stemmer = get_stemmer()
+    candidates = sorted(
+        (-dfs[stemmer.stem(surface)], -count, surface)
+        for surface, count in surface_counts.items()
+        if surface.startswith(prefix) and surface not in STOP_WORDS and stemmer.stem(surface) in dfs
+    )
+    completions = []
+    seen = set()
+    for _, _, surface in candidates:
+        stem = stemmer.stem(surface)
+        if stem not in seen:
+            seen.add(stem)
+            completions.append((surface, stem, dfs[stem]))
+    return completions[:k]
+
+
+def test_completions_match_reference_ranking(tmp_path):
+    rng = random.Random(56)
+    for _ in range(5):
+        surface_counts, dfs = corpus(rng)
+        index = AutocompleteIndex.build(surface_counts, dfs, cached_prefix_len=2, top_k=4)
+        index.save(tmp_path / "autocomplete.pkl")
+        loaded = AutocompleteIndex.load(tmp_path / "autocomplete.pkl")
+        prefixes = {surface[:length] for surface in surface_counts for length in range(1, len(surface) + 1)}
+        for prefix in sorted(prefixes | {"x", "comz", "Co"}):
+            # Cached short prefixes, longer ones ranked per call, and more than the cached top_k
+            for k in (1, 4, 7):
+                expected = reference_complete(surface_counts, dfs, prefix.lower(), k)
+                for ac in (index, loaded):
+                    assert [(c.text, c.stem, c.df) for c in ac.complete(prefix, k)] == expected, (prefix, k)
+
+
+def test_suggest_completes_the_last_word():
+    surface_counts = {"computer": 9, "computers": 3, "computing": 5, "science": 4, "the": 50}
+    dfs = {"comput": 7, "scienc": 3}
+    index = AutocompleteIndex.build(surface_counts, dfs, cached_prefix_len=2, top_k=3)
+    assert [c.text for c in index.complete("comp")] == ["computer"]
+    assert index.suggest("data comp") == ["data computer"]
+    assert index.suggest("Data Sc") == ["Data science"]
+    assert index.suggest("data comp ") == []
+    assert index.suggest("th") == []
+    assert index.suggest("") == []
+    assert len(index) == 4
@@ -0,0 +1,61 @@
+import json
+import shutil
+import hashlib
+
+from benchmarks.corpus_generator import CorpusGenerator
+from benchmarks.query_latency import latency_summary, run_query_sets, QUERY_SETS
+from conftest import config
+from utils.constants import CONFIG
+
+
+def corpus_files(root):
+    return {str(path.relative_to(root)): path.read_bytes() for path in sorted(root.rglob("*.json"))}
+
+
+def test_generator_is_deterministic_and_writes_the_dev_layout(tmp_path):
+    shape = dict(num_docs=60, vocab_size=500, words_per_doc=80, duplicate_rate=0.3)
+    CorpusGenerator(seed=7, **shape).generate(tmp_path / "a")
+    CorpusGenerator(seed=7, **shape).generate(tmp_path / "b")
+    CorpusGenerator(seed=8, **shape).generate(tmp_path / "c")
+    files = corpus_files(tmp_path / "a")
+    assert files == corpus_files(tmp_path / "b")
+    assert files != corpus_files(tmp_path / "c")
+
+    assert len(files) == 60
+    contents = []
+    for name, raw in files.items():
+        record = json.loads(raw)
+        domain, file_name = name.split("/")
+        assert domain == record['url'].split("/")[2].replace(".", "_")
+        assert file_name == hashlib.sha256(record['url'].encode()).hexdigest() + ".json"
+        assert record['encoding'] == "utf-8" and "<title>" in record['content']
+        contents.append(record['content'])
+    # Near-copies are an earlier page with one paragraph appended
+    near_copies = [content for content in contents
+                   if any(other != content and content.startswith(other[:-len("</body></html>")])
+                          for other in contents)]
+    assert near_copies
+
+
+def test_latency_summary_percentiles():
+    summary = latency_summary([float(ms) for ms in range(1, 101)])
+    assert summary['queries'] == 100 and summary['max_ms'] == 100
+    assert summary['p50_ms'] == 50.5 and abs(summary['p99_ms'] - 99.01) < 1e-9
+    assert abs(summary['qps'] - 100 / 5.05) < 1e-9
+    single = latency_summary([4.0])
+    assert single['p50_ms'] == single['p99_ms'] == 4.0
+
+
+def test_query_sets_replay_against_the_built_index(built_index, tmp_path, monkeypatch):
+    work_dir = tmp_path / "work"
+    shutil.copytree(built_index, work_dir)
+    CorpusGenerator(num_docs=1, vocab_size=3000, seed=121).write_vocabulary(work_dir / "vocabulary.json")
+    monkeypatch.chdir(work_dir)
+    # run_query_sets turns the result cache off for good, as the benchmark's own process exits after it
+    with config(result_cache_size=CONFIG['result_cache_size']):
+        report = run_query_sets(queries_per_set=15, warmup=3, seed=5, use_result_cache=False)
+    assert list(report['sets']) == [name for name, _, _ in QUERY_SETS]
+    for summary in report['sets'].values():
+        assert summary['queries'] == 15
+        assert summary['p50_ms'] <= summary['p95_ms'] <= summary['p99_ms'] <= summary['max_ms']
+    assert report['postings_cache'] and report['peak_rss_mb'] > 0
@@ -0,0 +1,67 @@
+import time
+import socket
+import subprocess
+import sys
+
+from utils.build_coordinator import BuildCoordinator, PENDING, LEASED, FAILED
+
+# A worker on another host, only its lease running out can take its unit back
+REMOTE = "elsewhere:1"
+
+
+def coordinator(tmp_path, lease_s, max_attempts=3):
+    coordinator = BuildCoordinator(tmp_path / "coordinator.db", lease_s=lease_s, max_attempts=max_attempts)
+    coordinator.create({'status': 'indexing'})
+    coordinator.add_units('index', [{'docs': 5}, {'docs': 3}])
+    return coordinator
+
+
+def test_expired_lease_is_handed_out_again(tmp_path):
+    build = coordinator(tmp_path, lease_s=0.2)
+    first = build.lease(REMOTE, 'index')
+    second = build.lease(REMOTE, 'index')
+    assert (first['unit_id'], second['unit_id']) == (1, 2)
+    assert build.lease("other:2", 'index') is None
+
+    time.sleep(0.3)
+    assert build.progress('index')[PENDING] == 2
+    retried = build.lease("other:2", 'index')
+    assert retried['unit_id'] == first['unit_id']
+    assert (retried['doc_id_start'], retried['doc_id_end']) == (0, 5)
+    assert build.units('index')[0]['attempts'] == 2
+
+    # The first worker lost its lease, its renewal and result are refused
+    assert not build.renew(first['unit_id'], REMOTE)
+    assert not build.complete(first['unit_id'], REMOTE, {'run': 'stale'})
+    assert build.complete(retried['unit_id'], "other:2", {'run': 'fresh'})
+    assert build.units('index')[0]['result'] == {'run': 'fresh'}
+
+
+def test_renewed_lease_is_kept(tmp_path):
+    build = coordinator(tmp_path, lease_s=0.2)
+    unit = build.lease(REMOTE, 'index')
+    for _ in range(3):
+        time.sleep(0.1)
+        assert build.renew(unit['unit_id'], REMOTE)
+    assert build.progress('index')[LEASED] == 1
+    assert build.lease("other:2", 'index')['unit_id'] != unit['unit_id']
+
+
+def test_unit_fails_after_max_attempts(tmp_path):
+    build = coordinator(tmp_path, lease_s=0.1, max_attempts=2)
+    for _ in range(2):
+        assert build.lease(REMOTE, 'index')['unit_id'] == 1
+        build.lease(REMOTE, 'index')
+        time.sleep(0.15)
+    counts = build.progress('index')
+    assert counts[FAILED] == 2
+    assert build.lease(REMOTE, 'index') is None
+    assert build.units('index')[0]['error'] == f"lease lost by {REMOTE}"
+
+
+def test_dead_local_worker_is_reclaimed_before_expiry(tmp_path):
+    build = coordinator(tmp_path, lease_s=60)
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    unit = build.lease(f"{socket.gethostname()}:{process.pid}", 'index')
+    assert build.lease("other:2", 'index')['unit_id'] == unit['unit_id']
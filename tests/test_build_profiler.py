@@ -0,0 +1,67 @@
+import time
+import threading
+
+from utils import build_profiler
+from utils.build_profiler import BuildProfiler
+
+
+def test_nested_stages_are_charged_once():
+    profiler = BuildProfiler()
+    with profiler.stage('parse'):
+        time.sleep(0.02)
+        with profiler.stage('stem'):
+            time.sleep(0.05)
+            with profiler.stage('stem'):
+                time.sleep(0.01)
+    with profiler.stage('stem'):
+        time.sleep(0.01)
+
+    stages = profiler.report()['stages']
+    assert list(stages) == ['stem', 'parse']   # Slowest first
+    assert stages['stem']['calls'] == 3 and stages['parse']['calls'] == 1
+    assert stages['stem']['wall_s'] >= 0.07
+    # The nested stems' 60 ms are not charged to parse as well
+    assert 0.02 <= stages['parse']['wall_s'] < 0.06
+    assert all(stage['cpu_s'] < stage['wall_s'] for stage in stages.values())
+
+
+def test_threads_add_up_and_flushes_are_counted(tmp_path):
+    profiler = BuildProfiler()
+
+    def work():
+        for _ in range(5):
+            with profiler.stage('outer'), profiler.stage('inner'):
+                time.sleep(0.002)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for i, size in enumerate((10, 25)):
+        partial = tmp_path / f"partial_{i}.json"
+        partial.write_bytes(b"x" * size)
+        profiler.record_flush(partial)
+
+    report = profiler.report()
+    assert report['stages']['inner']['calls'] == report['stages']['outer']['calls'] == 20
+    assert report['stages']['inner']['wall_s'] >= 20 * 0.002
+    assert report['stages']['outer']['wall_s'] < report['stages']['inner']['wall_s']
+    assert report['flushes']['count'] == 2 and report['flushes']['bytes'] == 35
+
+
+def test_module_stage_is_a_no_op_unless_activated():
+    profiler = BuildProfiler()
+    with build_profiler.stage('read'):
+        pass
+    build_profiler.activate(profiler)
+    try:
+        with build_profiler.stage('read'):
+            pass
+        build_profiler.record_flush(__file__)
+    finally:
+        build_profiler.activate(None)
+    build_profiler.record_flush(__file__)
+    report = profiler.report()
+    assert report['stages']['read']['calls'] == 1
+    assert report['flushes']['count'] == 1
@@ -0,0 +1,69 @@
+import json
+import pickle
+
+from search import SearchEngine, FileHandler
+from utils.index_generator import IndexGenerator
+from utils.constants import (
+    CONFIG, DOCS_FILE, LINK_SCORES_FILE, INDEX_PEEK_FILE, INDEX_MAP_FILE, INDEX_CHAMPION_FILE, INDEX_CHAMPION_MAP_FILE
+)
+
+
+def document_frequencies(index_pickle):
+    dfs = {}
+    with open(index_pickle, "rb") as f:
+        while True:
+            try:
+                term, postings = pickle.load(f)
+            except EOFError:
+                return dfs
+            dfs[term] = len(postings)
+
+
+def test_only_long_postings_get_champion_lists(in_index):
+    dfs = document_frequencies(INDEX_PEEK_FILE)
+    with open(INDEX_CHAMPION_MAP_FILE) as f:
+        champion_terms = set(json.load(f))
+    long_terms = {term for term, df in dfs.items() if df > CONFIG['champion_list_size']}
+    assert long_terms and champion_terms == long_terms
+    assert document_frequencies(INDEX_CHAMPION_FILE) == {term: CONFIG['champion_list_size'] for term in long_terms}
+
+
+def test_short_terms_fall_back_to_the_full_index(in_index):
+    dfs = document_frequencies(INDEX_PEEK_FILE)
+    short_terms = sorted(term for term, df in dfs.items() if 10 <= df <= CONFIG['champion_list_size'])[:20]
+    queries = [" ".join(short_terms[i:i + 2]) for i in range(0, len(short_terms), 2)]
+    engine = SearchEngine()
+    # Tier 1 must answer these queries, exactly, rather than hand them to tier 2
+    tier1_answers = []
+    search_champions = engine._search_champions
+
+    def recording_search_champions(*args):
+        results = search_champions(*args)
+        tier1_answers.append(results is not None)
+        return results
+
+    engine._search_champions = recording_search_champions
+    with FileHandler(INDEX_PEEK_FILE, INDEX_MAP_FILE, INDEX_CHAMPION_FILE, INDEX_CHAMPION_MAP_FILE) as tiered, \
+            FileHandler(INDEX_PEEK_FILE, INDEX_MAP_FILE) as full:
+        assert tiered.champions is not None
+        for query in queries:
+            expected = engine.search(query, 10, full, deadline_ms=0)
+            engine.result_cache.clear()
+            assert expected
+            assert engine.search(query, 10, tiered, deadline_ms=0) == expected
+            engine.result_cache.clear()
+    engine.close()
+    assert len(tier1_answers) == len(queries) and all(tier1_answers)
+
+
+def test_static_quality_is_read_from_the_given_paths(built_index, tmp_path, monkeypatch):
+    # Nothing under the working directory: the paths passed in are the only way to the link scores
+    monkeypatch.chdir(tmp_path)
+    generator = IndexGenerator(
+        built_index / INDEX_PEEK_FILE, tmp_path / "peek.pkl", tmp_path / "map.json",
+        docs_path=built_index / DOCS_FILE, link_scores_path=built_index / LINK_SCORES_FILE
+    )
+    with open(built_index / DOCS_FILE) as f:
+        doc_ids = {int(doc_id) for doc_id in json.load(f)}
+    quality = generator._load_static_quality()
+    assert set(quality) == doc_ids and any(quality.values())
@@ -0,0 +1,95 @@
+import gzip
+import json
+import random
+import tarfile
+import threading
+import zipfile
+
+import pytest
+
+from utils.corpus_source import DirectorySource, JsonlSource, ZipSource, TarSource, ReadAhead, open_corpus
+
+
+def records(rng, count):
+    return [
+        {'url': f"https://example.com/{i}", 'content': f"<p>página {rng.random()}</p>", 'encoding': "utf-8"}
+        for i in range(count)
+    ]
+
+
+def urls(documents):
+    return sorted(data['url'] for _, data in documents)
+
+
+@pytest.fixture
+def corpora(tmp_path):
+    """The same records as a DEV directory, zip, tar.gz, JSONL and gzipped JSONL, plus a zip mixing both layouts"""
+    expected = records(random.Random(55), 40)
+    broken = b'{"url": "https://example.com/broken", '
+
+    dev = tmp_path / "DEV"
+    for i, record in enumerate(expected):
+        domain = dev / f"domain{i % 3}"
+        domain.mkdir(parents=True, exist_ok=True)
+        (domain / f"{i:04x}.json").write_text(json.dumps(record))
+    (dev / "domain0" / "broken.json").write_bytes(broken)
+    (dev / "notes.txt").write_text("not a record")
+
+    lines = b"".join(json.dumps(record).encode() + b"\n" for record in expected[:20])
+    lines += b"\n" + broken + b"\n" + b"".join(json.dumps(record).encode() + b"\n" for record in expected[20:])
+    tail = b"".join(json.dumps(record).encode() + b"\n" for record in expected[10:])
+    paths = {'dev': dev, 'jsonl': tmp_path / "corpus.jsonl", 'gz': tmp_path / "corpus.jsonl.gz",
+             'zip': tmp_path / "corpus.zip", 'mixed_zip': tmp_path / "mixed.zip", 'tar': tmp_path / "corpus.tar.gz"}
+    paths['jsonl'].write_bytes(lines)
+    with gzip.open(paths['gz'], "wb") as f:
+        f.write(lines)
+
+    files = sorted(path for path in dev.rglob("*") if path.is_file())
+    with zipfile.ZipFile(paths['zip'], "w") as archive:
+        for path in files:
+            archive.write(path, path.relative_to(tmp_path))
+    with zipfile.ZipFile(paths['mixed_zip'], "w") as archive:
+        for i, record in enumerate(expected[:10]):
+            archive.writestr(f"pages/{i}.json", json.dumps(record))
+        archive.writestr("rest.jsonl", tail)
+    with tarfile.open(paths['tar'], "w:gz") as archive:
+        archive.add(dev, "DEV")
+    return expected, paths
+
+
+def test_every_source_yields_the_same_records(corpora):
+    expected, paths = corpora
+    kinds = {'dev': DirectorySource, 'jsonl': JsonlSource, 'gz': JsonlSource, 'zip': ZipSource,
+             'mixed_zip': ZipSource, 'tar': TarSource}
+    for kind, path in paths.items():
+        source = open_corpus(str(path))
+        assert type(source) is kinds[kind]
+        assert urls(source) == urls(("", record) for record in expected), kind
+    # Names carry the line number, counting the blank and the broken line
+    assert [name for name, _ in JsonlSource(paths['jsonl'])][20:22] == [f"{paths['jsonl']}:23", f"{paths['jsonl']}:24"]
+    with pytest.raises(ValueError):
+        open_corpus(str(paths['dev'] / "notes.txt"))
+
+
+def test_partitions_cover_the_corpus_in_order(corpora):
+    expected, paths = corpora
+    for kind in ("dev", "jsonl", "gz", "zip", "mixed_zip", "tar"):
+        source = open_corpus(str(paths[kind]))
+        units = source.partition(7)
+        documents = [document for unit in units for document in source.read_unit(unit)]
+        assert documents == list(source), kind
+        assert all(unit['docs'] >= sum(1 for _ in source.read_unit(unit)) for unit in units)
+        assert json.loads(json.dumps(units)) == units
+    assert len(JsonlSource(paths['jsonl']).partition(7)) == 6     # 42 lines, a blank and a broken one included
+
+
+def test_read_ahead_hands_each_document_to_one_consumer(corpora):
+    expected, paths = corpora
+    read_ahead = ReadAhead(open_corpus(str(paths['tar'])), depth=4)
+    consumed = [[] for _ in range(4)]
+    threads = [threading.Thread(target=lambda out: out.extend(read_ahead), args=(out,)) for out in consumed]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert urls(document for out in consumed for document in out) == urls(("", record) for record in expected)
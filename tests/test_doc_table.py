@@ -0,0 +1,56 @@
+import random
+
+from utils.doc_table import DocumentTable
+from utils.simhash import SimHash
+
+
+def random_fingerprint(rng, bits=128):
+    return "".join(rng.choice("01") for _ in range(bits))
+
+
+def flip(rng, fingerprint, count):
+    """The fingerprint with count distinct bits flipped"""
+    bits = list(fingerprint)
+    for i in rng.sample(range(len(bits)), count):
+        bits[i] = "1" if bits[i] == "0" else "0"
+    return "".join(bits)
+
+
+def test_near_duplicates_match_simhash_similarity(tmp_path):
+    rng = random.Random(46)
+    simhash = SimHash()
+    table = DocumentTable(tmp_path / "urls.txt", tmp_path / "links.jsonl")
+    accepted = []
+    for doc_id in range(200):
+        base = rng.choice(accepted) if accepted and rng.random() < 0.6 else random_fingerprint(rng)
+        fingerprint = flip(rng, base, rng.randint(0, 40))
+        threshold = rng.choice([0.8, 0.9, 1.0])
+        expected = any(
+            1 - simhash.hamming_distance(fingerprint, other) / simhash.b >= threshold for other in accepted
+        )
+        assert table.is_near_duplicate(fingerprint, threshold) == expected
+        if not expected:
+            table.add(doc_id, f"https://example.com/{doc_id}", doc_id % 7, fingerprint, [])
+            accepted.append(fingerprint)
+
+
+def test_rows_and_link_graph_round_trip(tmp_path):
+    rng = random.Random(47)
+    table = DocumentTable(tmp_path / "urls.txt", tmp_path / "links.jsonl")
+    # Out of order, as the multithreaded indexer adds them, and with gaps left by duplicates
+    doc_ids = rng.sample(range(100), 40)
+    rows = []
+    for doc_id in doc_ids:
+        url = f"https://example.com/ü/{doc_id}"
+        links = [f"https://example.com/{rng.randint(0, 99)}" for _ in range(rng.randint(0, 3))]
+        fingerprint = random_fingerprint(rng)
+        table.add(doc_id, url, doc_id * 3, fingerprint, links)
+        rows.append((doc_id, url, doc_id * 3, fingerprint, links))
+
+    assert len(table) == len(rows)
+    assert table.url(5) == rows[5][1]
+    assert list(table.rows()) == [row[:4] for row in rows]
+    assert all(table.token_count(doc_id) == doc_id * 3 for doc_id in doc_ids)
+    assert table.link_graph() == {
+        doc_id: {'url': url, 'outgoing_links': links} for doc_id, url, _, _, links in rows
+    }
@@ -0,0 +1,172 @@
+import heapq
+import pickle
+import random
+from array import array
+
+import pytest
+
+import search
+from conftest import config
+from search import SearchEngine, FileHandler, ImpactFileHandler, open_file_handler
+from utils.constants import (
+    INDEX_PEEK_FILE, INDEX_MAP_FILE, INDEX_IMPACT_FILE, INDEX_IMPACT_MAP_FILE, INDEX_IMPACT_META_FILE
+)
+from utils.impact_index import ImpactIndexGenerator, impact_values, score_at_a_time
+from utils.tokenizer import tokenize, parse_query
+
+QUERIES = ["computer science", "research lab", "software engineering student", "data", "graduate admission program",
+           "comput scienc depart", "student"]
+
+
+def random_segments(rng, num_docs):
+    """A term's impact segments: skewed impacts in descending order, each with sorted doc_ids"""
+    docs = rng.sample(range(num_docs), rng.randint(1, num_docs))
+    segments = {}
+    for doc_id in docs:
+        segments.setdefault(min(255, int(rng.paretovariate(0.8))), []).append(doc_id)
+    return [(impact, array('I', sorted(doc_ids))) for impact, doc_ids in sorted(segments.items(), reverse=True)]
+
+
+def exhaustive(segments_by_term, query_counts):
+    scores, masks = {}, {}
+    terms = [term for term in query_counts if segments_by_term.get(term)]
+    for term_idx, term in enumerate(terms):
+        for impact, doc_ids in segments_by_term[term]:
+            for doc_id in doc_ids:
+                scores[doc_id] = scores.get(doc_id, 0) + impact * query_counts[term]
+                masks[doc_id] = masks.get(doc_id, 0) | 1 << term_idx
+    return scores, masks
+
+
+def ranked(scores, masks, required_mask, k, candidates=None):
+    rankable = [
+        doc_id for doc_id in scores
+        if masks[doc_id] & required_mask == required_mask and (candidates is None or doc_id in candidates)
+    ]
+    return sorted((-scores[doc_id], doc_id) for doc_id in rankable)[:k]
+
+
+def test_score_at_a_time_matches_exhaustive_top_k():
+    rng = random.Random(11)
+    for _ in range(1500):
+        num_terms = rng.randint(1, 4)
+        query_counts = {f"t{idx}": rng.randint(1, 2) for idx in range(num_terms)}
+        segments_by_term = {term: random_segments(rng, rng.randint(5, 80)) for term in query_counts}
+        required = rng.sample(sorted(query_counts), rng.randint(0, min(2, num_terms)))
+        k = rng.randint(1, 10)
+        candidates = set(rng.sample(range(80), rng.randint(1, 80))) if rng.random() < 0.3 else None
+
+        accumulators, masks, approximate = score_at_a_time(
+            segments_by_term, query_counts, k, None, required, None, candidates
+        )
+        expected_scores, expected_masks = exhaustive(segments_by_term, query_counts)
+        terms = list(query_counts)
+        required_mask = sum(1 << terms.index(term) for term in required)
+
+        assert not approximate
+        expected = ranked(expected_scores, expected_masks, required_mask, k, candidates)
+        got = ranked(accumulators, masks, required_mask, k, candidates)
+        # Same scores in the same order; tied documents may come in either order
+        assert [score for score, _ in got] == [score for score, _ in expected]
+        for score, doc_id in got:
+            assert -score == expected_scores[doc_id]
+            assert masks[doc_id] == expected_masks[doc_id]
+
+
+def test_score_at_a_time_stops_early_on_skewed_impacts():
+    # One document far ahead of the rest: the top-1 is settled after the first segment
+    segments_by_term = {
+        "a": [(255, array('I', [7]))] + [(impact, array('I', range(100 + impact * 50, 150 + impact * 50))) for impact in (3, 2, 1)],
+        "b": [(200, array('I', [7]))] + [(1, array('I', range(1000, 1200)))],
+    }
+    accumulators, masks, approximate = score_at_a_time(segments_by_term, {"a": 1, "b": 1}, 1)
+    assert not approximate
+    assert accumulators[7] == 455 and masks[7] == 0b11
+    assert len(accumulators) < 350
+
+
+def test_quantized_values_stay_close_to_contributions(tmp_path):
+    rng = random.Random(34)
+    # Skewed like tf-idf: most contributions a small fraction of the largest
+    contributions = [rng.lognormvariate(0, 1.5) for _ in range(5000)]
+    generator = ImpactIndexGenerator(bits=8)
+    low, high = min(contributions), max(contributions)
+    values = impact_values({'bits': 8, 'low': low, 'high': high})
+    impacts = [generator.quantize(contribution, low, high) for contribution in contributions]
+    assert min(impacts) == 1 and max(impacts) == 255
+    # No level hoards the postings, and each value is within half a level of its contribution
+    assert max(impacts.count(impact) for impact in set(impacts)) < len(contributions) / 20
+    ratio = (high / low) ** (0.5 / 255)
+    for contribution, impact in zip(contributions, impacts):
+        assert contribution / ratio <= values[impact] * 1.000001 and values[impact] <= contribution * ratio * 1.000001
+
+
+def test_impact_ranking_overlaps_exact_tf_idf_ranking(in_index):
+    exact_postings = {}
+    with open(INDEX_PEEK_FILE, "rb") as index_file:
+        while True:
+            try:
+                term, postings = pickle.load(index_file)
+            except EOFError:
+                break
+            exact_postings[term] = {posting[0]: posting[3] for posting in postings}
+
+    engine = SearchEngine()
+    overlaps = []
+    with ImpactFileHandler(INDEX_IMPACT_FILE, INDEX_IMPACT_MAP_FILE, INDEX_IMPACT_META_FILE) as fh:
+        for query in QUERIES:
+            terms = tokenize(query)
+            exact = {}
+            for term in terms:
+                for doc_id, contribution in exact_postings.get(term, {}).items():
+                    exact[doc_id] = exact.get(doc_id, 0.0) + contribution
+            expected = heapq.nlargest(10, exact, key=exact.get)
+            results = engine.search_impact(query, 10, fh, time_budget_ms=0)
+            assert not any(result.approximate for result in results)
+            overlaps.append(len({result.doc_id for result in results} & set(expected)) / len(expected))
+            for result in results:
+                assert abs(result.score - exact[result.doc_id]) <= 0.05 * exact[result.doc_id]
+    engine.close()
+    assert sum(overlaps) / len(overlaps) >= 0.9
+
+
+def test_search_honors_mode_deadline_and_phrases_on_impact_index(in_index, monkeypatch):
+    engine = SearchEngine()
+    with config(index_profile='impact'), open_file_handler() as fh, FileHandler(INDEX_PEEK_FILE, INDEX_MAP_FILE) as standard:
+        assert isinstance(fh, ImpactFileHandler)
+        for query in QUERIES:
+            terms = set(tokenize(query))
+            any_term = engine.search(query, 10, fh, mode="or", deadline_ms=0)
+            every_term = engine.search(query, 10, fh, mode="and", deadline_ms=0)
+            assert all(set(result.matched_terms) == terms for result in every_term)
+            auto = engine.search(query, 10, fh, mode="auto", deadline_ms=0)
+            assert ranking(auto) == ranking(every_term if len(every_term) == 10 else any_term)
+
+        # The deadline_ms passed to search() is the impact time budget
+        budgets = []
+        score = search.score_at_a_time
+
+        def recording_score_at_a_time(*args):
+            budgets.append(args[3])
+            return score(*args)
+
+        monkeypatch.setattr(search, "score_at_a_time", recording_score_at_a_time)
+        engine.search("computer science", 10, fh, deadline_ms=0)
+        engine.search("computer science", 10, fh, deadline_ms=25)
+        monkeypatch.setattr(search, "score_at_a_time", score)
+        assert budgets[0] is None and budgets[1] is not None
+
+        query = '"computer science" research'
+        query_terms, phrases = parse_query(query)
+        phrase_docs = engine._phrase_matches(phrases[0], standard.get_postings_many(query_terms))
+        results = engine.search(query, 10, fh, deadline_ms=0)
+        assert results and {result.doc_id for result in results} <= phrase_docs
+
+    with ImpactFileHandler(INDEX_IMPACT_FILE, INDEX_IMPACT_MAP_FILE, INDEX_IMPACT_META_FILE) as without_positions:
+        with pytest.raises(ValueError):
+            engine.search(query, 10, without_positions)
+    engine.close()
+
+
+def ranking(results):
+    return [(result.doc_id, round(result.score, 9)) for result in results]
@@ -0,0 +1,96 @@
+import os
+import shutil
+import threading
+import contextlib
+
+from benchmarks.corpus_generator import CorpusGenerator
+from conftest import config
+from indexer import Indexer, run_pipeline
+from search import SearchEngine, open_file_handler
+from utils.index_versions import read_manifest, version_paths
+from utils.constants import INDEX_MANIFEST_FILE
+
+QUERIES = ["computer science", "research lab", "software engineering student", "data", "graduate admission program"]
+
+
+def ranking(results):
+    return [(result.doc_id, result.url, round(result.score, 9), result.snippet) for result in results]
+
+
+def search_all(engine, file_handler=None):
+    engine.result_cache.clear()
+    return {query: ranking(engine.search(query, 10, file_handler, deadline_ms=0)) for query in QUERIES}
+
+
+def test_rebuild_and_hot_swap_during_search(built_index, tmp_path, monkeypatch):
+    root = tmp_path / "index"
+    shutil.copytree(built_index, root, symlinks=True)
+    monkeypatch.chdir(root)
+    CorpusGenerator(num_docs=120, vocab_size=2000, words_per_doc=120, seed=39).generate(root / "DEV2")
+    old_version = read_manifest(INDEX_MANIFEST_FILE)['current']
+
+    # Without postings caches every query reads the index files again
+    with config(postings_cache_bytes=0, champion_cache_bytes=0):
+        live = SearchEngine(docs_path=None)
+        live.reload_index()
+        direct = SearchEngine()
+        fh = open_file_handler().__enter__()
+    with fh:
+        before = search_all(direct, fh)
+        assert search_all(live) == before
+
+        # Rebuilt in the standard profile, unsharded: the impact files and shards of the last build stay behind
+        rebuilt = threading.Event()
+        errors = []
+
+        def rebuild():
+            try:
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    run_pipeline(Indexer("DEV2"))
+            except Exception as e:
+                errors.append(e)
+            rebuilt.set()
+
+        threading.Thread(target=rebuild).start()
+        # Handlers opened before the rebuild keep serving the old files while it writes the new ones
+        while not rebuilt.is_set():
+            assert search_all(direct, fh) == before
+            assert search_all(live) == before
+        assert not errors
+        assert search_all(direct, fh) == before
+
+    manifest = read_manifest(INDEX_MANIFEST_FILE)
+    new_version = manifest['current']
+    assert new_version != old_version
+    assert sorted(manifest['versions'][-1]['files']) == sorted([
+        'autocomplete.pkl', 'doc_store.bin', 'doc_store_index.pkl', 'documents.json', 'index_champions.pkl',
+        'index_map_champions.json', 'index_map_position.json', 'index_peek.pkl', 'link_scores.json',
+        'spelling.pkl', 'static'
+    ])
+    assert not version_paths(new_version)['impact'].exists() and not version_paths(new_version)['shards'].exists()
+
+    with open_file_handler() as fh:
+        after = search_all(SearchEngine(), fh)
+    assert after != before
+
+    # Queries running while the live engine swaps versions see one version or the other, never an error
+    swapped = threading.Event()
+    results = []
+
+    def query_until_swapped():
+        while not swapped.is_set():
+            results.append(search_all(live))
+
+    queriers = [threading.Thread(target=query_until_swapped) for _ in range(3)]
+    for querier in queriers:
+        querier.start()
+    assert live.reload_index() == new_version
+    swapped.set()
+    for querier in queriers:
+        querier.join()
+    assert results and all(
+        ranked in (before[query], after[query]) for result in results for query, ranked in result.items()
+    )
+    assert search_all(live) == after
+    live.close()
+    direct.close()
@@ -0,0 +1,45 @@
+import random
+
+from utils.intersection import gallop, intersect, DocIdView, SkipPointers
+
+
+def test_gallop_finds_first_not_smaller():
+    values = [1, 3, 3, 7, 9, 20]
+    for lo in range(len(values) + 1):
+        for target in range(0, 22):
+            expected = next((i for i in range(lo, len(values)) if values[i] >= target), len(values))
+            assert gallop(values, target, lo) == max(expected, lo)
+
+
+def test_skip_pointers_advance_like_a_scan():
+    rng = random.Random(3)
+    doc_ids = sorted(rng.sample(range(100000), 5000))
+    skips = SkipPointers(doc_ids)
+    lo = 0
+    for target in sorted(rng.sample(range(100000), 300)):
+        expected = next((i for i in range(lo, len(doc_ids)) if doc_ids[i] >= target), len(doc_ids))
+        lo = skips.advance(target, lo)
+        assert lo == expected
+
+
+def test_intersect_matches_set_intersection():
+    rng = random.Random(5)
+    for _ in range(300):
+        lists = [sorted(rng.sample(range(3000), rng.randint(1, 2500))) for _ in range(rng.randint(1, 4))]
+        # A low threshold sends the long lists through skip pointers too
+        matches = intersect(lists, skip_threshold=rng.choice([8, 1024]))
+        expected = sorted(set.intersection(*map(set, lists)))
+        assert [doc_id for doc_id, _ in matches] == expected
+        for doc_id, indexes in matches:
+            assert all(doc_ids[idx] == doc_id for doc_ids, idx in zip(lists, indexes))
+
+
+def test_intersect_empty_list():
+    assert intersect([[1, 2], []]) == []
+
+
+def test_doc_id_view_over_postings():
+    postings = [[2, 1, 0.0, 0.5, [0]], [9, 2, 0.0, 0.1, [3, 4]]]
+    view = DocIdView(postings)
+    assert len(view) == 2 and view[1] == 9
+    assert intersect([view, [1, 9]]) == [(9, [1, 1])]
@@ -0,0 +1,74 @@
+import random
+
+from utils.positional import count_phrase_matches, min_covering_window
+from utils.tokenizer import tokenize, tokenize_phrase, parse_query
+
+
+def phrase_matches_reference(position_lists, offsets):
+    sets = [set(positions) for positions in position_lists]
+    starts = {position - offsets[0] for position in position_lists[0]}
+    return sum(all(start + offset in positions for positions, offset in zip(sets, offsets)) for start in starts)
+
+
+def window_reference(position_lists):
+    return min(
+        max(combo) - min(combo) + 1
+        for combo in _product(position_lists)
+    )
+
+
+def _product(position_lists):
+    if not position_lists:
+        yield ()
+        return
+    for position in position_lists[0]:
+        for rest in _product(position_lists[1:]):
+            yield (position,) + rest
+
+
+def random_positions(rng, length):
+    return sorted(rng.sample(range(length), rng.randint(1, min(12, length))))
+
+
+def test_phrase_matches_against_reference():
+    rng = random.Random(7)
+    for _ in range(2000):
+        terms = rng.randint(2, 4)
+        position_lists = [random_positions(rng, 40) for _ in range(terms)]
+        offsets = sorted(rng.sample(range(terms + 2), terms))
+        offsets = [offset - offsets[0] for offset in offsets]
+        assert count_phrase_matches(position_lists, offsets) == phrase_matches_reference(position_lists, offsets)
+
+
+def test_phrase_matches_simple():
+    assert count_phrase_matches([[0, 5, 9], [1, 6, 20]], [0, 1]) == 2
+    assert count_phrase_matches([[0], []], [0, 1]) == 0
+
+
+def test_min_covering_window_against_reference():
+    rng = random.Random(11)
+    for _ in range(1000):
+        # Each token position holds one term, so the lists never share a position
+        terms = rng.randint(1, 3)
+        positions = rng.sample(range(30), terms * 4)
+        position_lists = [sorted(positions[i::terms]) for i in range(terms)]
+        assert min_covering_window(position_lists) == window_reference(position_lists)
+
+
+def test_phrase_offsets_line_up_with_document_positions():
+    # Stop words count towards positions in documents, so "of" between the terms is a gap of one
+    text = "The department of computer science offers courses in machine learning"
+    tokens = tokenize(text)
+    phrase = tokenize_phrase("computer science")
+    assert [stem for stem, _ in phrase] == ["comput", "scienc"]
+    start = tokens.index("comput")
+    assert all(tokens[start + offset] == stem for stem, offset in phrase)
+
+    gapped = tokenize_phrase("department of computer")
+    assert [offset for _, offset in gapped] == [0, 2]
+
+
+def test_parse_query_keeps_phrases_and_terms():
+    terms, phrases = parse_query('"machine learning" course')
+    assert phrases == [[("machin", 0), ("learn", 1)]]
+    assert set(terms) == {"machin", "learn", "cours"}
@@ -0,0 +1,71 @@
+from utils.postings_cache import PostingsCache
+
+
+def requested(cache, key, times):
+    for _ in range(times):
+        cache.get(key)
+
+
+def test_second_hit_promotes_to_protected():
+    cache = PostingsCache(100)
+    cache.put("a", "A", 10)
+    assert "a" in cache.probation
+    assert cache.get("a") == "A"
+    assert "a" in cache.protected and "a" not in cache.probation
+    assert cache.used_protected == 10
+
+
+def test_admits_under_budget_without_evicting():
+    cache = PostingsCache(100)
+    assert cache.put("a", "A", 40)
+    assert cache.put("b", "B", 60)
+    assert cache.used_bytes == 100
+    assert cache.evictions == 0
+
+
+def test_rejects_candidate_colder_than_victim():
+    cache = PostingsCache(100)
+    requested(cache, "hot", 5)
+    cache.put("hot", "H", 80)
+    assert not cache.put("cold", "C", 50)
+    assert "hot" in cache and "cold" not in cache
+    assert cache.rejections == 1
+
+
+def test_admits_candidate_hotter_than_victim():
+    cache = PostingsCache(100)
+    cache.put("cold", "C", 80)
+    requested(cache, "hot", 5)
+    assert cache.put("hot", "H", 50)
+    assert "hot" in cache and "cold" not in cache
+    assert cache.used_bytes == 50
+
+
+def test_rejection_evicts_nothing():
+    # The first victim is colder than the candidate but the second is not: neither may go
+    cache = PostingsCache(100, protected_ratio=0.5)
+    cache.put("cold", "C", 50)
+    requested(cache, "warm", 10)
+    cache.put("warm", "W", 50)
+    requested(cache, "candidate", 3)
+    assert not cache.put("candidate", "X", 80)
+    assert "cold" in cache and "warm" in cache
+    assert cache.evictions == 0
+    assert cache.used_bytes == 100
+
+
+def test_entry_larger_than_budget_is_rejected():
+    cache = PostingsCache(100)
+    requested(cache, "huge", 50)
+    assert not cache.put("huge", "H", 101)
+    assert len(cache) == 0
+
+
+def test_budget_holds_after_many_puts():
+    cache = PostingsCache(1000)
+    for round_ in range(3):
+        for key in range(200):
+            cache.get(key)
+            cache.put(key, key, 37)
+            assert cache.used_bytes <= cache.max_bytes
+    assert cache.used_bytes == sum(size for _, size in cache.probation.values()) + cache.used_protected
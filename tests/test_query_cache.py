@@ -0,0 +1,39 @@
+import dataclasses
+
+import pytest
+
+from search import SearchResult
+from utils.query_cache import QueryResultCache
+
+
+def test_key_ignores_term_order():
+    assert QueryResultCache.make_key(["machin", "learn"], 10) == QueryResultCache.make_key(["learn", "machin"], 10)
+    assert QueryResultCache.make_key(["learn"], 10) != QueryResultCache.make_key(["learn"], 20)
+    assert QueryResultCache.make_key(["learn"], 10, mode="or") != QueryResultCache.make_key(["learn"], 10, mode="and")
+
+
+def test_new_index_version_drops_entries():
+    cache = QueryResultCache(10)
+    cache.put("key", ["result"], "v1")
+    assert cache.get("key", "v1") == ["result"]
+    assert cache.get("key", "v2") is None
+    assert cache.invalidations == 1
+
+
+def test_evicts_least_recently_used():
+    cache = QueryResultCache(2)
+    cache.put("a", 1, "v")
+    cache.put("b", 2, "v")
+    cache.get("a", "v")
+    cache.put("c", 3, "v")
+    assert cache.get("b", "v") is None
+    assert cache.get("a", "v") == 1
+
+
+def test_cached_results_cannot_be_mutated():
+    cache = QueryResultCache(10)
+    result = SearchResult("http://a", 1.0, ("learn",))
+    cache.put("key", [result], "v")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        cache.get("key", "v")[0].score = 0.0
+    assert cache.get("key", "v")[0].score == 1.0
@@ -0,0 +1,54 @@
+import json
+import time
+
+import search
+from conftest import config
+from search import SearchEngine, open_file_handler
+from utils.query_profiler import QueryProfiler, load_profiles
+from utils.query_trace import QueryTrace
+
+
+def test_slow_query_writes_a_profile(in_index, tmp_path, monkeypatch):
+    profile_dir = tmp_path / "profiles"
+    with config(query_profiler="sampling", query_profile_dir=str(profile_dir), query_profile_threshold_ms=50,
+                query_profile_sample_rate=0.0):
+        engine = SearchEngine()
+    with open_file_handler() as fh:
+        engine.search("research lab", 10, fh, deadline_ms=0)
+
+        parse_query = search.parse_query
+
+        def slow_parse_query(query):
+            time.sleep(0.1)
+            return parse_query(query)
+
+        monkeypatch.setattr(search, "parse_query", slow_parse_query)
+        engine.search("computer science", 10, fh, deadline_ms=0)
+    engine.close()
+
+    profiles = load_profiles(profile_dir)
+    assert [profile['query'] for profile in profiles] == ["computer science"]
+    profile = profiles[0]
+    assert profile['slow'] and profile['elapsed_ms'] >= 100
+    assert set(profile['dfs']) == {"comput", "scienc"} and all(profile['dfs'].values())
+    slow_frames = [key for key in profile['functions'] if key.endswith("(slow_parse_query)")]
+    assert slow_frames and profile['functions'][slow_frames[0]]['total_ms'] >= 50
+
+
+def test_rotation_keeps_max_files(tmp_path):
+    old = [tmp_path / f"{timestamp}_1_300ms.json" for timestamp in (1000, 2000)]
+    for path in old:
+        path.write_text(json.dumps({'elapsed_ms': 300, 'slow': True}))
+
+    profiler = QueryProfiler(out_dir=str(tmp_path), threshold_ms=0, max_files=3)
+    for i in range(5):
+        trace = QueryTrace(f"query {i}")
+        with profiler.profile(trace):
+            time.sleep(0.005)
+    profiler.close()
+
+    files = sorted(tmp_path.glob("*.json"))
+    assert profiler.written == 5 and profiler.dropped == 0
+    assert len(files) == 3 and not any(path.exists() for path in old)
+    assert list(profiler.files) == files
+    assert [json.loads(path.read_text())['query'] for path in files] == ["query 2", "query 3", "query 4"]
@@ -0,0 +1,65 @@
+import json
+import random
+
+from search import SearchEngine, open_file_handler
+from utils.query_trace import Histogram, QueryMetrics, QueryTrace, LATENCY_BUCKETS_MS
+
+QUERIES = ["computer science", "research lab", "computer science", "zzzzqqq", "data"]
+
+
+def test_quantiles_stay_inside_their_bucket():
+    rng = random.Random(57)
+    values = sorted(rng.lognormvariate(2, 1.5) for _ in range(2000))
+    histogram = Histogram()
+    for value in values:
+        histogram.observe(value)
+    assert histogram.count == len(values) and abs(histogram.sum - sum(values)) < 1e-6
+    bounds = (0.0, *LATENCY_BUCKETS_MS, float("inf"))
+    for q in (0.1, 0.5, 0.9, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        upper = next(bound for bound in bounds if bound >= exact)
+        lower = bounds[bounds.index(upper) - 1]
+        assert lower <= histogram.quantile(q) <= min(upper, LATENCY_BUCKETS_MS[-1])
+
+
+def test_each_query_is_traced_once(in_index, tmp_path):
+    trace_log = tmp_path / "traces.jsonl"
+    engine = SearchEngine(trace_log=str(trace_log))
+    with open_file_handler() as fh:
+        for query in QUERIES:
+            engine.search(query, 10, fh, deadline_ms=0)
+    engine.close()
+
+    with open(trace_log) as f:
+        logged = [QueryTrace.from_dict(json.loads(line)) for line in f]
+    assert [trace.query for trace in logged] == QUERIES
+    assert [trace.cached for trace in logged] == [False, False, True, False, False]
+    assert logged[0].fetches and not logged[2].fetches
+
+    stats = engine.metrics.stats()
+    assert stats['queries'] == len(QUERIES)
+    assert stats['result_cache_hit_rate'] == 1 / len(QUERIES)
+    assert stats['empty'] == sum(trace.result_count == 0 for trace in logged)
+    assert stats['bytes_read'] == sum(trace.bytes_read for trace in logged)
+    assert engine.metrics.last_trace().query == QUERIES[-1]
+    assert engine.metrics.slow_queries(1)[0].total_ms == max(trace.total_ms for trace in logged)
+
+    exposition = engine.metrics.to_prometheus()
+    samples = dict(line.rsplit(" ", 1) for line in exposition.splitlines() if not line.startswith("#"))
+    assert float(samples["search_queries_total"]) == len(QUERIES)
+    assert float(samples["search_result_cache_hits_total"]) == 1
+    buckets = [int(value) for name, value in samples.items() if name.startswith("search_query_duration_seconds_bucket")]
+    assert buckets == sorted(buckets) and buckets[-1] == len(QUERIES)
+    assert int(samples["search_query_duration_seconds_count"]) == len(QUERIES)
+    assert int(samples['search_stage_duration_seconds_count{stage="tokenize"}']) == len(QUERIES)
+
+
+def test_closed_trace_log_reopens_on_the_next_trace(tmp_path):
+    trace_log = tmp_path / "traces.jsonl"
+    metrics = QueryMetrics(trace_log=str(trace_log))
+    metrics.record(QueryTrace("first").finish([]))
+    metrics.close()
+    metrics.record(QueryTrace("second").finish([]))
+    metrics.close()
+    with open(trace_log) as f:
+        assert [json.loads(line)['query'] for line in f] == ["first", "second"]
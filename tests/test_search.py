@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import pickle
+import random
+import threading
+
+from collections import Counter
+
+import search
+from conftest import config
+from search import SearchEngine, FileHandler, open_file_handler, fast_start, _chunk_by_terms
+from utils.constants import INDEX_PEEK_FILE, INDEX_MAP_FILE, INDEX_CHAMPION_FILE, INDEX_CHAMPION_MAP_FILE
+from utils.tokenizer import tokenize
+
+QUERIES = ["computer science", "research lab", "software engineering student", "data", "graduate admission program"]
+
+
+def ranking(results):
+    return [(result.doc_id, round(result.score, 9)) for result in results]
+
+
+def test_tokenizing_is_not_charged_to_the_deadline(in_index, monkeypatch):
+    engine = SearchEngine()
+    with open_file_handler() as fh:
+        exact = {query: engine.search(query, 10, fh, deadline_ms=0) for query in QUERIES}
+        engine.result_cache.clear()
+
+        # A first query importing nltk, or loading the spelling dictionary, takes longer than the budget
+        parse_query = search.parse_query
+
+        def slow_parse_query(query):
+            time.sleep(0.1)
+            return parse_query(query)
+
+        monkeypatch.setattr(search, "parse_query", slow_parse_query)
+        for query in QUERIES:
+            results = engine.search(query, 10, fh, deadline_ms=50)
+            assert not any(result.approximate for result in results)
+            assert ranking(results) == ranking(exact[query])
+    engine.close()
+
+
+def test_fast_start_matches_a_json_start(in_index):
+    engine = SearchEngine()
+    mapped_engine, mapped_fh = fast_start()
+    with open_file_handler() as fh:
+        for query in QUERIES:
+            expected = engine.search(query, 10, fh, deadline_ms=0)
+            results = mapped_engine.search(query, 10, mapped_fh, deadline_ms=0)
+            assert expected
+            assert ranking(results) == ranking(expected)
+            assert [result.url for result in results] == [result.url for result in expected]
+    mapped_fh.__exit__(None, None, None)
+    mapped_engine.close()
+    engine.close()
+
+
+def test_concurrent_reads_match_sequential_unpickling(in_index, monkeypatch):
+    with open(INDEX_MAP_FILE) as f:
+        seek_positions = json.load(f)
+    expected = {}
+    with open(INDEX_PEEK_FILE, "rb") as f:
+        for term, offset in seek_positions.items():
+            f.seek(offset)
+            expected[term] = pickle.load(f)
+
+    def read_concurrently(fh):
+        mismatches = []
+
+        def reader(seed):
+            terms = random.Random(seed).sample(sorted(expected), len(expected))
+            mismatches.extend(term for term in terms if fh.get_postings(term) != expected[term])
+
+        threads = [threading.Thread(target=reader, args=(seed,)) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return mismatches
+
+    # Nothing cached, so every lookup reads its record while the other threads read theirs
+    with FileHandler(INDEX_PEEK_FILE, INDEX_MAP_FILE, cache_bytes=0) as fh:
+        assert fh.file_map is None
+        assert read_concurrently(fh) == []
+    # Platforms without pread read through a shared mmap instead
+    monkeypatch.delattr(os, "pread")
+    with FileHandler(INDEX_PEEK_FILE, INDEX_MAP_FILE, cache_bytes=0) as fh:
+        assert fh.file_map is not None
+        assert read_concurrently(fh) == []
+
+
+def test_two_stage_ranking_keeps_the_single_stage_top_k(in_index):
+    def run(**overrides):
+        with config(**overrides):
+            engine = SearchEngine()
+            with open_file_handler() as fh:
+                results = {query: engine.search(query, 10, fh, deadline_ms=0) for query in QUERIES}
+        engine.close()
+        return engine, results
+
+    _, single = run(two_stage_ranking=False)
+    # Every match is a candidate: the same ranking exactly
+    _, everything = run(rerank_depth=10 ** 6)
+    assert {query: ranking(results) for query, results in everything.items()} == \
+        {query: ranking(results) for query, results in single.items()}
+
+    # The cheap first stage finds nearly all of the full blend's top 10 among 20 candidates
+    engine, shallow = run(rerank_depth=20)
+    overlap = [len({r.doc_id for r in shallow[query]} & {r.doc_id for r in single[query]}) / len(single[query])
+               for query in QUERIES]
+    assert sum(overlap) / len(overlap) >= 0.9
+    stats = engine.stage_timings.stats()
+    assert stats['score']['count'] == stats['first_stage']['count'] == len(QUERIES)
+
+    # Fewer candidates than results asked for: only the candidates come back
+    _, cut = run(rerank_depth=5)
+    assert all(len(cut[query]) == min(5, len(single[query])) for query in QUERIES)
+
+
+def test_terms_skipped_at_fetch_time_count_as_skipped_work(in_index, monkeypatch):
+    query = "computer science research student"
+    with FileHandler(INDEX_PEEK_FILE, INDEX_MAP_FILE) as fh:
+        dfs = {term: len(fh.get_postings(term)[1]) for term in tokenize(query)}
+
+    # One fetch at a time, each slower than the whole budget: only the first term is read
+    get_postings = FileHandler.get_postings
+
+    def slow_get_postings(self, term, trace=None):
+        time.sleep(0.03)
+        return get_postings(self, term, trace)
+
+    monkeypatch.setattr(FileHandler, "get_postings", slow_get_postings)
+    engine = SearchEngine()
+    with config(postings_fetch_workers=1), FileHandler(INDEX_PEEK_FILE, INDEX_MAP_FILE) as fh:
+        results = engine.search(query, 10, fh, deadline_ms=10)
+    engine.close()
+
+    assert results and all(result.approximate for result in results)
+    assert {term for result in results for term in result.matched_terms} == {"comput"}
+    stats = engine.deadline_stats.stats()
+    assert stats['truncated'] == 1
+    skipped = 1 - dfs["comput"] / sum(dfs.values())
+    assert abs(stats['max_skipped_fraction'] - skipped) < 0.1
+
+
+BATCH = QUERIES + ["computer lab", "science student", "research program", "data science", "computer science"]
+
+
+def test_batch_matches_single_queries_and_reads_each_term_once(in_index, monkeypatch):
+    engine = SearchEngine()
+    with open_file_handler() as fh:
+        expected = [engine.search(query, 10, fh, deadline_ms=0) for query in BATCH]
+    engine.close()
+
+    reads = Counter()
+    read_record = FileHandler._read_record
+
+    def counting_read_record(self, offset):
+        reads[(str(self.index_path), offset)] += 1
+        return read_record(self, offset)
+
+    monkeypatch.setattr(FileHandler, "_read_record", counting_read_record)
+    # Caches that admit nothing: the batch must still read every term once
+    engine = SearchEngine()
+    with config(deadline_ms=0, champion_cache_bytes=0), \
+            FileHandler(INDEX_PEEK_FILE, INDEX_MAP_FILE, INDEX_CHAMPION_FILE, INDEX_CHAMPION_MAP_FILE,
+                        cache_bytes=0) as fh:
+        batch = engine.search_batch(BATCH, 10, fh)
+    engine.close()
+    assert [ranking(results) for results in batch] == [ranking(results) for results in expected]
+    assert reads and set(reads.values()) == {1}
+
+
+def test_batch_across_processes_matches_single_queries(in_index):
+    engine = SearchEngine()
+    with config(deadline_ms=0), open_file_handler() as fh:
+        expected = [engine.search(query, 10, fh) for query in BATCH]
+        engine.result_cache.clear()
+        batch = engine.search_batch(BATCH, 10, fh, num_processes=2)
+    engine.close()
+    assert [ranking(results) for results in batch] == [ranking(results) for results in expected]
+    assert [[result.url for result in results] for results in batch] == [[result.url for result in results] for results in expected]
+
+
+def test_chunks_keep_queries_sharing_terms_together():
+    queries = ["computer science", "computer lab", "science computer", "garden flower", "flower pot", "garden pot"]
+    chunks = _chunk_by_terms(queries, 2)
+    assert sorted(map(sorted, chunks)) == [
+        ["computer lab", "computer science", "science computer"], ["flower pot", "garden flower", "garden pot"]
+    ]
+    unique = list(dict.fromkeys(BATCH))
+    chunks = _chunk_by_terms(unique, 4)
+    assert sorted(query for chunk in chunks for query in chunk) == sorted(unique)
+    assert max(map(len, chunks)) <= -(-len(unique) // 4)
@@ -0,0 +1,48 @@
+import asyncio
+
+from search_service import SearchService
+from utils.constants import CONFIG
+
+
+async def exchange(request: bytes) -> bytes:
+    """Send raw bytes to a service on a free port and read until it closes the connection"""
+    service = SearchService(port=0)
+    server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0,
+                                        limit=CONFIG['service_max_header_bytes'])
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(request)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout=5)
+        writer.close()
+    return response
+
+
+def test_health_ok():
+    response = asyncio.run(exchange(b"GET /health HTTP/1.1\r\nConnection: close\r\n\r\n"))
+    assert response.startswith(b"HTTP/1.1 200 OK\r\n")
+
+
+def test_unknown_path_uses_status_phrase():
+    response = asyncio.run(exchange(b"GET /nope HTTP/1.1\r\nConnection: close\r\n\r\n"))
+    assert response.startswith(b"HTTP/1.1 404 Not Found\r\n")
+
+
+def test_malformed_content_length_is_rejected():
+    response = asyncio.run(exchange(b"GET /health HTTP/1.1\r\nContent-Length: abc\r\n\r\n"))
+    assert response.startswith(b"HTTP/1.1 400 Bad Request\r\n")
+    assert b"Connection: close" in response
+
+
+def test_oversized_body_is_not_read():
+    length = CONFIG['service_max_body_bytes'] + 1
+    response = asyncio.run(exchange(f"GET /health HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode()))
+    assert response.startswith(b"HTTP/1.1 413 Content Too Large\r\n") or \
+        response.startswith(b"HTTP/1.1 413 Request Entity Too Large\r\n")
+
+
+def test_oversized_headers_are_rejected():
+    header = b"X-Filler: " + b"a" * CONFIG['service_max_header_bytes'] + b"\r\n"
+    response = asyncio.run(exchange(b"GET /health HTTP/1.1\r\n" + header + b"\r\n"))
+    assert response.startswith(b"HTTP/1.1 431 Request Header Fields Too Large\r\n")
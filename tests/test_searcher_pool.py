@@ -0,0 +1,41 @@
+import os
+import time
+import signal
+
+import pytest
+
+from conftest import config
+from search import SearchEngine, open_file_handler
+from searcher_pool import SearcherPool
+
+QUERIES = ["computer science", "research lab", "software engineering student", "data", "graduate admission program"]
+
+
+def ranking(results):
+    return [(result.doc_id, round(result.score, 9)) for result in results]
+
+
+def test_pool_matches_one_engine_and_fails_once_searchers_die(in_index):
+    engine = SearchEngine()
+    with open_file_handler() as fh:
+        expected = [engine.search(query, 10, fh, deadline_ms=0) for query in QUERIES]
+    engine.close()
+
+    # Forked searchers inherit the config, so they never cut a query short either
+    with config(deadline_ms=0), SearcherPool(num_workers=2) as pool:
+        assert [ranking(results) for results in pool.search_many(QUERIES, 10)] == list(map(ranking, expected))
+
+        # One searcher left still serves every query
+        os.kill(pool.workers[0].pid, signal.SIGKILL)
+        pool.workers[0].join()
+        assert ranking(pool.search(QUERIES[0], 10)) == ranking(expected[0])
+
+        # None left: queries fail at once instead of waiting out their timeout
+        os.kill(pool.workers[1].pid, signal.SIGKILL)
+        pool.workers[1].join()
+        deadline = time.monotonic() + 5
+        while len(pool.dead_workers) < 2 and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert pool.dead_workers == {0: -signal.SIGKILL, 1: -signal.SIGKILL}
+        with pytest.raises(RuntimeError):
+            pool.search(QUERIES[1], 10)
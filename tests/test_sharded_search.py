@@ -0,0 +1,53 @@
+import json
+
+from conftest import config
+from search import SearchEngine, FileHandler
+from sharded_search import ShardCoordinator
+from utils.constants import CONFIG, INDEX_PEEK_FILE, INDEX_MAP_FILE, INDEX_CHAMPION_FILE, INDEX_CHAMPION_MAP_FILE
+
+QUERIES = ["computer science", "research lab", "software engineering student", "data", "graduate admission program",
+           "computr scince", "student research data"]
+
+# Exact evaluation on both sides: tier 1 only answers when its lists are complete, and no deadline
+EXACT = {'deadline_ms': 0, 'champion_confidence': 10 ** 9, 'spelling_correction': 'auto'}
+
+
+def ranking(results):
+    return sorted((-round(result.score, 9), result.doc_id) for result in results)
+
+
+def test_sharded_top_k_matches_unsharded(in_index):
+    with config(**EXACT):
+        engine = SearchEngine()
+        with FileHandler(INDEX_PEEK_FILE, INDEX_MAP_FILE, INDEX_CHAMPION_FILE, INDEX_CHAMPION_MAP_FILE) as fh:
+            expected = {
+                (query, mode): engine.search(query, 10, fh, mode)
+                for query in QUERIES for mode in ("or", "and", "auto")
+            }
+        engine.close()
+
+        with ShardCoordinator() as coordinator:
+            assert coordinator.num_shards == 3
+            for (query, mode), results in expected.items():
+                sharded = coordinator.search(query, 10, mode)
+                assert ranking(sharded) == ranking(results), (query, mode)
+                assert not any(result.approximate for result in sharded)
+    assert any(len(expected[query, "and"]) < 10 for query in QUERIES)
+
+
+def test_coordinator_records_one_merged_trace_per_query(in_index, tmp_path):
+    trace_log = tmp_path / "traces.jsonl"
+    with config(query_trace_log=str(trace_log), spelling_correction='auto'):
+        with ShardCoordinator() as coordinator:
+            for query in QUERIES:
+                coordinator.search(query, 10)
+            metrics = coordinator.engine.metrics
+            assert metrics.queries == len(QUERIES)
+    traces = [json.loads(line) for line in trace_log.read_text().splitlines()]
+    assert [trace['query'] for trace in traces] == QUERIES
+    corrected = traces[QUERIES.index("computr scince")]
+    assert corrected['correction'] == "computer science" and corrected['terms'] == ["comput", "scienc"]
+    # The merged trace adds up what every shard fetched
+    first = traces[0]
+    assert first['fetches']['comput']['postings'] > CONFIG['champion_list_size']
+    assert first['spans']['score'] > 0 and first['spans']['tokenize'] > 0
@@ -0,0 +1,93 @@
+import random
+
+from utils.doc_store import DocumentStoreWriter, DocumentStore
+from utils.snippets import SnippetGenerator
+from utils.tokenizer import TOKEN_PATTERN, tokenize, token_offsets, get_stemmer
+
+WORDS = ["search", "engine", "İstanbul", "naïve", "café", "Straße", "ΣΟΦΙΑ", "İİ", "ab", "x", "the", "running"]
+
+
+def random_text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)) + rng.choice(["", ".", " İ"])
+
+
+def build_store(tmp_path, texts, block_bytes=200):
+    writer = DocumentStoreWriter(tmp_path / "store", tmp_path / "store_index.pkl", block_bytes=block_bytes)
+    for doc_id, text in texts.items():
+        writer.add(doc_id, text, token_offsets(text, tokenize(text)))
+    writer.close()
+    return DocumentStore(tmp_path / "store", tmp_path / "store_index.pkl", cache_blocks=2)
+
+
+def test_store_round_trip(tmp_path):
+    rng = random.Random(50)
+    # Out of order, with gaps, spread over many blocks
+    doc_ids = rng.sample(range(300), 120)
+    texts = {doc_id: random_text(rng, rng.randint(0, 30)) for doc_id in doc_ids}
+    store = build_store(tmp_path, texts)
+    assert len(store) == len(texts)
+    for doc_id in rng.sample(range(320), 320):
+        if doc_id not in texts:
+            assert doc_id not in store and store.get(doc_id) is None
+            continue
+        text, offsets = store.get(doc_id)
+        assert text == texts[doc_id]
+        assert list(offsets) == token_offsets(text, tokenize(text))
+    store.close()
+
+
+def test_offsets_point_at_each_token():
+    rng = random.Random(51)
+    stemmer = get_stemmer()
+    for _ in range(300):
+        text = random_text(rng, rng.randint(1, 20))
+        stems = tokenize(text)
+        offsets = token_offsets(text, stems)
+        assert len(offsets) == len(stems)
+        for stem, offset in zip(stems, offsets):
+            word = TOKEN_PATTERN.match(text[offset:].lower()).group()
+            assert stemmer.stem(word) == stem, (text, offset)
+
+
+def test_snippet_after_characters_that_lowercase_longer(tmp_path):
+    # 'İ' lowercases to two characters, which used to shift every later offset
+    text = "İİ software ab"
+    store = build_store(tmp_path, {0: text})
+    stems = tokenize(text)
+    assert stems == ["softwar", "ab"]
+    snippet = SnippetGenerator(store, window_tokens=5).snippet(0, {"ab": [1]})
+    assert snippet.text == "software ab"
+    assert [snippet.text[start:stop] for start, stop in snippet.highlights] == ["ab"]
+    assert snippet.marked() == "software **ab**"
+
+
+def test_snippet_highlights_match_terms(tmp_path):
+    rng = random.Random(52)
+    texts = {doc_id: random_text(rng, rng.randint(1, 40)) for doc_id in range(60)}
+    store = build_store(tmp_path, texts, block_bytes=1000)
+    generator = SnippetGenerator(store, window_tokens=8)
+    for doc_id, text in texts.items():
+        stems = tokenize(text)
+        if not stems:
+            assert generator.snippet(doc_id, {}) is None
+            continue
+        query = set(rng.sample(stems, min(2, len(stems))))
+        positions = {term: [pos for pos, stem in enumerate(stems) if stem == term] for term in query}
+        snippet = generator.snippet(doc_id, positions)
+        body = snippet.text
+        if body.startswith("... "):
+            body = body[4:]
+        if body.endswith(" ..."):
+            body = body[:-4]
+        assert body in text
+        for start, stop in snippet.highlights:
+            assert tokenize(snippet.text[start:stop])[0] in query
+
+
+def test_snippet_of_token_the_pattern_only_matches_lowercased(tmp_path):
+    # The Kelvin sign lowercases to 'k', so the stored offset starts on a character the pattern rejects
+    text = "\u212aelvin scale"
+    store = build_store(tmp_path, {0: text})
+    snippet = SnippetGenerator(store, window_tokens=5).snippet(0, {"kelvin": [0], "scale": [1]})
+    assert snippet.text == text
+    assert [snippet.text[start:stop] for start, stop in snippet.highlights] == ["\u212a", "scale"]
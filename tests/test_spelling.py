@@ -0,0 +1,60 @@
+import random
+
+from utils.spelling import edit_distance
+
+
+def reference_osa(a, b):
+    """Optimal string alignment distance from the full table, no banding or trimming"""
+    table = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(len(a) + 1):
+        table[i][0] = i
+    for j in range(len(b) + 1):
+        table[0][j] = j
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            table[i][j] = min(
+                table[i - 1][j] + 1,
+                table[i][j - 1] + 1,
+                table[i - 1][j - 1] + (a[i - 1] != b[j - 1])
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                table[i][j] = min(table[i][j], table[i - 2][j - 2] + 1)
+    return table[-1][-1]
+
+
+def test_known_distances():
+    assert edit_distance("search", "search", 2) == 0
+    assert edit_distance("serach", "search", 2) == 1     # One adjacent swap
+    assert edit_distance("ca", "abc", 3) == 3            # OSA never edits a swapped pair again
+    assert edit_distance("kitten", "sitting", 3) == 3
+    assert edit_distance("kitten", "sitting", 2) == 3    # Capped at max_distance + 1
+    assert edit_distance("", "abc", 2) == 3
+    assert edit_distance("naïve", "naive", 1) == 1
+
+
+def test_matches_reference_osa():
+    rng = random.Random(49)
+    for _ in range(3000):
+        # A small alphabet makes shared affixes, repeats and swaps common
+        a = "".join(rng.choice("abcé") for _ in range(rng.randint(0, 9)))
+        if rng.random() < 0.5:
+            # Mostly near-misses of a, the cases the corrector actually scores
+            b = list(a)
+            for _ in range(rng.randint(1, 3)):
+                i = rng.randint(0, len(b))
+                edit = rng.choice("idsw")
+                if edit == "i":
+                    b.insert(i, rng.choice("abcé"))
+                elif b and edit == "d":
+                    del b[min(i, len(b) - 1)]
+                elif b and edit == "s":
+                    b[min(i, len(b) - 1)] = rng.choice("abcé")
+                elif len(b) > 1:
+                    i = min(i, len(b) - 2)
+                    b[i], b[i + 1] = b[i + 1], b[i]
+            b = "".join(b)
+        else:
+            b = "".join(rng.choice("abcé") for _ in range(rng.randint(0, 9)))
+        expected = reference_osa(a, b)
+        for max_distance in range(4):
+            assert edit_distance(a, b, max_distance) == min(expected, max_distance + 1), (a, b, max_distance)
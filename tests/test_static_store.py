@@ -0,0 +1,91 @@
+import json
+import random
+
+from utils.link_quality import static_quality
+from utils.static_store import StaticStoreBuilder, MappedStaticStore, record_end
+
+TERMS = ["search", "engin", "café", "straße", "σοφια", "z", "a", "ab", "aé", "á"]
+
+
+def write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f)
+    return path
+
+
+def build(tmp_path, rng, with_champions=True, with_link_scores=True):
+    # Out of order, with gaps left by duplicates, and non-ASCII urls
+    doc_ids = rng.sample(range(200), 80)
+    documents = {str(doc_id): {'url': f"https://example.com/ü/{doc_id}", 'token_count': 1} for doc_id in doc_ids}
+    scored = rng.sample(doc_ids, 50)
+    link_scores = {
+        'hits': {
+            'authority': {documents[str(doc_id)]['url']: rng.random() for doc_id in scored},
+            'hub': {documents[str(doc_id)]['url']: rng.random() for doc_id in scored}
+        },
+        'pagerank': {documents[str(doc_id)]['url']: rng.random() / 100 for doc_id in scored}
+    }
+    seeks = sorted(rng.sample(range(100000), len(TERMS)))
+    term_map = dict(zip(rng.sample(TERMS, len(TERMS)), seeks))
+    champion_map = {term: seek // 2 for term, seek in list(term_map.items())[:4]}
+
+    paths = {
+        'static_dir': tmp_path / "static",
+        'docs_path': write_json(tmp_path / "documents.json", documents),
+        'link_scores_path': tmp_path / "link_scores.json",
+        'index_map_path': write_json(tmp_path / "index_map.json", term_map),
+        'champion_map_path': tmp_path / "index_map_champions.json"
+    }
+    if with_link_scores:
+        write_json(paths['link_scores_path'], link_scores)
+    if with_champions:
+        write_json(paths['champion_map_path'], champion_map)
+    StaticStoreBuilder(**paths).build()
+    return documents, link_scores, term_map, champion_map, MappedStaticStore(paths['static_dir'])
+
+
+def test_store_round_trip(tmp_path):
+    rng = random.Random(53)
+    documents, link_scores, term_map, champion_map, store = build(tmp_path, rng)
+
+    assert store.doc_slots == max(map(int, documents)) + 1
+    for doc_id in range(store.doc_slots + 5):
+        doc = documents.get(str(doc_id))
+        if doc is None:
+            assert store.static_score(doc_id) == 0.0
+            if doc_id < store.doc_slots:
+                assert store.url(doc_id) == ""
+            continue
+        url = doc['url']
+        assert store.url(doc_id) == url
+        scores = (
+            link_scores['hits']['authority'].get(url, 0.0),
+            link_scores['hits']['hub'].get(url, 0.0),
+            link_scores['pagerank'].get(url, 0.0)
+        )
+        assert store.link_scores(doc_id) == scores
+        assert store.static_score(doc_id) == static_quality(*scores)
+
+    # The term dictionary behaves as the JSON map it came from, iterated in bytewise order
+    assert dict(store.term_map) == term_map
+    assert list(store.term_map) == sorted(term_map, key=lambda term: term.encode("utf-8"))
+    assert "missing" not in store.term_map and 3 not in store.term_map
+    assert store.term_map.get("café") == term_map["café"]
+    assert dict(store.champions.term_map) == champion_map
+    assert list(store.champions.sorted_seeks) == sorted(champion_map.values())
+
+    seeks = sorted(term_map.values())
+    for i, seek in enumerate(seeks):
+        assert record_end(store.sorted_seeks, seek, 10 ** 6) == (seeks[i + 1] if i + 1 < len(seeks) else 10 ** 6)
+    store.close()
+
+
+def test_store_without_champions_or_link_scores(tmp_path):
+    documents, _, term_map, _, store = build(tmp_path, random.Random(54), with_champions=False,
+                                             with_link_scores=False)
+    assert store.champions is None
+    assert dict(store.term_map) == term_map
+    for doc_id, doc in documents.items():
+        assert store.url(int(doc_id)) == doc['url']
+        assert store.link_scores(int(doc_id)) == (0.0, 0.0, 0.0)
+    store.close()
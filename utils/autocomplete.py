@@ -0,0 +1,134 @@
+import bisect
+import pickle
+
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from utils.tokenizer import TOKEN_PATTERN, get_stemmer
+from utils.constants import STOP_WORDS, CONFIG
+
+
+@dataclass
+class Completion:
+    text: str    # Surface form as it appears in documents
+    stem: str    # Index term it searches for
+    df: int      # Documents containing the stem
+
+
+class AutocompleteIndex:
+    """
+    Prefix completion over the unstemmed words of the corpus.
+
+    Surface forms are kept in one sorted list, so the words starting with a prefix
+    are a contiguous slice found with two binary searches. Each word points at its
+    stem, and words are ranked by the stem's document frequency, then by how often
+    the word itself occurs. Completions leading to the same stem are collapsed to
+    the most common word ("comput" gives "computer", not also "computers").
+    Short prefixes match too many words to rank per keystroke, so their top
+    completions are computed when the index is built.
+    """
+    def __init__(self, surfaces: List[str], stems: List[str], stem_ids: array, dfs: array,
+                 ranks: array, top: Dict[str, List[int]], top_k: int):
+        self.surfaces = surfaces    # Sorted
+        self.stems = stems
+        self.stem_ids = stem_ids    # Per surface, into stems
+        self.dfs = dfs              # Per stem
+        self.ranks = ranks          # Per surface, position in the global ranking (0 is best)
+        self.top = top              # Precomputed rows for short prefixes, best first
+        self.top_k = top_k
+
+    @classmethod
+    def build(cls, surface_counts: Dict[str, int], dfs: Dict[str, int],
+              cached_prefix_len: int = CONFIG['autocomplete_cached_prefix_len'],
+              top_k: int = CONFIG['autocomplete_top_k']) -> "AutocompleteIndex":
+        """Index the surface forms whose stem is an index term, stop words left out since queries drop them"""
+        stemmer = get_stemmer()
+        counts = {}
+        stem_of = {}
+        for surface, count in surface_counts.items():
+            if surface in STOP_WORDS:
+                continue
+            stem = stemmer.stem(surface)
+            if stem in dfs:
+                counts[surface] = count
+                stem_of[surface] = stem
+
+        surfaces = sorted(counts)
+        stems = sorted(set(stem_of.values()))
+        stem_index = {stem: idx for idx, stem in enumerate(stems)}
+        stem_ids = array('I', (stem_index[stem_of[surface]] for surface in surfaces))
+        stem_dfs = array('I', (dfs[stem] for stem in stems))
+
+        order = sorted(range(len(surfaces)), key=lambda row: (-stem_dfs[stem_ids[row]], -counts[surfaces[row]], row))
+        ranks = array('I', [0]) * len(surfaces)
+        for rank, row in enumerate(order):
+            ranks[row] = rank
+
+        # One pass in ranking order fills every short prefix's list with its best distinct stems
+        top: Dict[str, List[int]] = {}
+        seen_stems: Dict[str, set] = {}
+        for row in order:
+            surface = surfaces[row]
+            for length in range(1, min(cached_prefix_len, len(surface)) + 1):
+                prefix = surface[:length]
+                rows = top.setdefault(prefix, [])
+                seen = seen_stems.setdefault(prefix, set())
+                if len(rows) < top_k and stem_ids[row] not in seen:
+                    rows.append(row)
+                    seen.add(stem_ids[row])
+        return cls(surfaces, stems, stem_ids, stem_dfs, ranks, top, top_k)
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            pickle.dump({
+                'surfaces': self.surfaces,
+                'stems': self.stems,
+                'stem_ids': self.stem_ids,
+                'dfs': self.dfs,
+                'ranks': self.ranks,
+                'top': self.top,
+                'top_k': self.top_k
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> "AutocompleteIndex":
+        with open(path, "rb") as f:
+            return cls(**pickle.load(f))
+
+    def __len__(self) -> int:
+        return len(self.surfaces)
+
+    def _completion(self, row: int) -> Completion:
+        stem_id = self.stem_ids[row]
+        return Completion(self.surfaces[row], self.stems[stem_id], self.dfs[stem_id])
+
+    def complete(self, prefix: str, k: Optional[int] = None) -> List[Completion]:
+        """Best k completions of a word prefix, one per stem"""
+        k = k or self.top_k
+        prefix = prefix.lower()
+        if not prefix:
+            return []
+        rows = self.top.get(prefix)
+        if rows is not None and k <= self.top_k:
+            return [self._completion(row) for row in rows[:k]]
+
+        lo = bisect.bisect_left(self.surfaces, prefix)
+        hi = bisect.bisect_left(self.surfaces, prefix + "\uffff", lo)
+        completions = []
+        seen = set()
+        for row in sorted(range(lo, hi), key=self.ranks.__getitem__):
+            if self.stem_ids[row] not in seen:
+                seen.add(self.stem_ids[row])
+                completions.append(self._completion(row))
+                if len(completions) == k:
+                    break
+        return completions
+
+    def suggest(self, query: str, k: Optional[int] = None) -> List[str]:
+        """Whole-query suggestions completing the word being typed, nothing once the query ends in a space"""
+        words = list(TOKEN_PATTERN.finditer(query))
+        if not words or words[-1].end() != len(query):
+            return []
+        head = query[:words[-1].start()]
+        return [head + completion.text for completion in self.complete(words[-1].group(), k)]
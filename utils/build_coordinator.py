@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from utils.constants import CONFIG, COORDINATOR_DB
+
+# Unit states, a unit goes pending -> leased -> done, or back to pending when its lease is lost
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    unit_id       INTEGER PRIMARY KEY,
+    phase         TEXT NOT NULL,
+    spec          TEXT NOT NULL,
+    state         TEXT NOT NULL DEFAULT 'pending',
+    worker        TEXT,
+    lease_expires REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    doc_id_start  INTEGER,
+    doc_id_end    INTEGER,
+    result        TEXT,
+    error         TEXT
+);
+CREATE INDEX IF NOT EXISTS units_by_phase ON units (phase, state);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def worker_name() -> str:
+    """host:pid, so a coordinator on the same host can tell when a worker has died"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _is_dead(worker: Optional[str]) -> bool:
+    if not worker:
+        return False
+    host, _, pid = worker.rpartition(":")
+    if host != socket.gethostname():
+        return False   # Other hosts are only detected by their lease running out
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (PermissionError, ValueError):
+        return False
+    return False
+
+
+class BuildCoordinator:
+    """
+    Work queue of a distributed index build, kept in a SQLite file.
+
+    The corpus is split into units, each handed to one worker at a time under a
+    lease the worker keeps renewing while it runs. Leases of workers that stop
+    renewing (or whose process is gone, for workers on this host) are taken back
+    and the unit is offered again, up to max_attempts times before it is marked
+    failed. Index units carry a block of doc_ids fixed at planning time, so a
+    unit gets the same ids whichever worker runs it, and however often.
+
+    Every method opens its own connection, so one coordinator can be shared by
+    threads and any number of processes can open the same file.
+    """
+    def __init__(self, db_path: str = COORDINATOR_DB, lease_s: float = CONFIG['distributed_lease_s'],
+                 max_attempts: int = CONFIG['distributed_max_attempts']):
+        self.db_path = Path(db_path)
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+
+    @contextmanager
+    def _transaction(self, immediate: bool = False):
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        try:
+            conn.row_factory = sqlite3.Row
+            # Writers take the lock up front, so two workers never lease the same unit
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def exists(self) -> bool:
+        return self.db_path.exists()
+
+    def create(self, meta: Dict[str, str]) -> None:
+        """Start a new build, discarding any previous queue"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        for path in (self.db_path, Path(f"{self.db_path}-wal"), Path(f"{self.db_path}-shm")):
+            path.unlink(missing_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+        self.set_meta(**meta)
+
+    def set_meta(self, **values: str) -> None:
+        with self._transaction(immediate=True) as conn:
+            conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                             [(key, str(value)) for key, value in values.items()])
+
+    def meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else default
+
+    def add_units(self, phase: str, specs: List[Dict]) -> None:
+        """Queue work units; index units get consecutive doc_id blocks sized by their 'docs'"""
+        with self._transaction(immediate=True) as conn:
+            next_doc_id = conn.execute(
+                "SELECT COALESCE(MAX(doc_id_end), 0) FROM units WHERE phase = ?", (phase,)
+            ).fetchone()[0]
+            for spec in specs:
+                doc_id_start = doc_id_end = None
+                if 'docs' in spec:
+                    doc_id_start, doc_id_end = next_doc_id, next_doc_id + spec['docs']
+                    next_doc_id = doc_id_end
+                conn.execute(
+                    "INSERT INTO units (phase, spec, doc_id_start, doc_id_end) VALUES (?, ?, ?, ?)",
+                    (phase, json.dumps(spec), doc_id_start, doc_id_end)
+                )
+
+    def _reclaim(self, conn: sqlite3.Connection) -> None:
+        """Take back leases that ran out or whose worker died"""
+        now = time.time()
+        for row in conn.execute("SELECT unit_id, worker, lease_expires, attempts FROM units WHERE state = ?",
+                                (LEASED,)).fetchall():
+            if row['lease_expires'] >= now and not _is_dead(row['worker']):
+                continue
+            state = FAILED if row['attempts'] >= self.max_attempts else PENDING
+            conn.execute(
+                "UPDATE units SET state = ?, worker = NULL, lease_expires = NULL, "
+                "error = COALESCE(error, ?) WHERE unit_id = ?",
+                (state, f"lease lost by {row['worker']}", row['unit_id'])
+            )
+
+    def lease(self, worker: str, phase: Optional[str] = None) -> Optional[Dict]:
+        """Lease the next pending unit (of one phase, or any), None when nothing is available right now"""
+        with self._transaction(immediate=True) as conn:
+            self._reclaim(conn)
+            query = "SELECT * FROM units WHERE state = ?"
+            params = [PENDING]
+            if phase is not None:
+                query += " AND phase = ?"
+                params.append(phase)
+            row = conn.execute(query + " ORDER BY unit_id LIMIT 1", params).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE units SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE unit_id = ?",
+                (LEASED, worker, time.time() + self.lease_s, row['unit_id'])
+            )
+        unit = dict(row)
+        unit['spec'] = json.loads(unit['spec'])
+        return unit
+
+    def renew(self, unit_id: int, worker: str) -> bool:
+        """Extend a lease, False once it was taken back"""
+        with self._transaction(immediate=True) as conn:
+            cursor = conn.execute(
+                "UPDATE units SET lease_expires = ? WHERE unit_id = ? AND state = ? AND worker = ?",
+                (time.time() + self.lease_s, unit_id, LEASED, worker)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, unit_id: int, worker: str, result: Dict) -> bool:
+        """Record a finished unit, ignored (False) if the lease was lost to another worker meanwhile"""
+        with self._transaction(immediate=True) as conn:
+            cursor = conn.execute(
+                "UPDATE units SET state = ?, result = ?, worker = NULL, lease_expires = NULL, error = NULL "
+                "WHERE unit_id = ? AND state = ? AND worker = ?",
+                (DONE, json.dumps(result), unit_id, LEASED, worker)
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, unit_id: int, worker: str, error: str) -> None:
+        """Give a unit back after an error, it is retried until max_attempts"""
+        with self._transaction(immediate=True) as conn:
+            conn.execute(
+                "UPDATE units SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "worker = NULL, lease_expires = NULL, error = ? "
+                "WHERE unit_id = ? AND state = ? AND worker = ?",
+                (self.max_attempts, FAILED, PENDING, error, unit_id, LEASED, worker)
+            )
+
+    def progress(self, phase: str) -> Dict[str, int]:
+        """Unit count per state for a phase, after taking back lost leases"""
+        with self._transaction(immediate=True) as conn:
+            self._reclaim(conn)
+            rows = conn.execute("SELECT state, COUNT(*) AS units FROM units WHERE phase = ? GROUP BY state",
+                                (phase,)).fetchall()
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update({row['state']: row['units'] for row in rows})
+        return counts
+
+    def units(self, phase: str) -> List[Dict]:
+        """Every unit of a phase in unit order, with parsed spec and result"""
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT * FROM units WHERE phase = ? ORDER BY unit_id", (phase,)).fetchall()
+        units = []
+        for row in rows:
+            unit = dict(row)
+            unit['spec'] = json.loads(unit['spec'])
+            unit['result'] = json.loads(unit['result']) if unit['result'] else None
+            units.append(unit)
+        return units
@@ -0,0 +1,93 @@
+import time
+import threading
+
+from pathlib import Path
+from contextlib import contextmanager, nullcontext
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+
+class BuildProfiler:
+    """
+    Wall and CPU time per indexing stage, shared by all indexer threads.
+
+    Stages nest: time spent in an inner stage (say stemming inside simhash) is
+    charged to the inner stage only, so the per-stage totals add up to the
+    instrumented time instead of double counting. CPU time is per thread, so
+    with the multithreaded indexer both columns are summed over workers.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.wall_s: Dict[str, float] = defaultdict(float)
+        self.cpu_s: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.flushes: List[Dict] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        # [wall time of children, cpu time of children]
+        frame = [0.0, 0.0]
+        stack.append(frame)
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.thread_time() - cpu_start
+            stack.pop()
+            if stack:
+                stack[-1][0] += wall
+                stack[-1][1] += cpu
+            with self.lock:
+                self.wall_s[name] += wall - frame[0]
+                self.cpu_s[name] += cpu - frame[1]
+                self.calls[name] += 1
+
+    def record_flush(self, path: Path) -> None:
+        """Note a partial index written to disk"""
+        with self.lock:
+            self.flushes.append({'path': str(path), 'bytes': Path(path).stat().st_size})
+
+    def report(self) -> Dict:
+        with self.lock:
+            return {
+                'stages': {
+                    name: {
+                        'wall_s': self.wall_s[name],
+                        'cpu_s': self.cpu_s[name],
+                        'calls': self.calls[name]
+                    }
+                    for name in sorted(self.wall_s, key=self.wall_s.get, reverse=True)
+                },
+                'flushes': {
+                    'count': len(self.flushes),
+                    'bytes': sum(flush['bytes'] for flush in self.flushes),
+                    'files': list(self.flushes)
+                }
+            }
+
+
+# Profiler the instrumented indexing code reports to, None outside of build benchmarks
+_active: Optional[BuildProfiler] = None
+
+
+def activate(profiler: Optional[BuildProfiler]) -> None:
+    global _active
+    _active = profiler
+
+
+def stage(name: str):
+    """Time a block against the active profiler, a no-op when none is active"""
+    if _active is None:
+        return nullcontext()
+    return _active.stage(name)
+
+
+def record_flush(path: Path) -> None:
+    if _active is not None:
+        _active.record_flush(path)
@@ -26,21 +26,94 @@ DEV_DIR = "./DEV"
 # THRESHOLDS
 CONFIG = {
     'similarity_threshold': 0.85,
+    'read_ahead_docs': 256,                   # Documents read and decoded ahead of the indexer, 0 reads inline
+    'distributed_unit_docs': 1000,            # Documents per work unit of a distributed build
+    'distributed_workers': 4,                 # Local worker processes started by distributed_indexer.py run
+    'distributed_lease_s': 60,                # Seconds a worker holds a unit without renewing its lease
+    'distributed_max_attempts': 3,            # Leases of a unit before it is marked failed
     'max_index_size': 32 * 1024 * 1024, # 32MB Offload
     'max_cache_size': 1000,
+    'postings_cache_bytes': 64 * 1024 * 1024, # 64MB of decoded postings (estimated)
+    'postings_cache_protected_ratio': 0.8,
+    'postings_fetch_workers': 8,
+    'result_cache_size': 1000,
+    'result_cache_ttl': None,                 # Seconds, None keeps entries until evicted
+    'proximity_weight': 0.2,
+    'query_mode': 'or',                       # 'or', 'and', or 'auto' (AND, falling back to OR)
+    'champion_list_size': 64,                 # Tier-1 postings kept per term
+    'champion_quality_weight': 0.5,           # Weight of static link quality when picking champions
+    'champion_confidence': 2,                 # Tier-1 must offer this many candidates per requested result
+    'champion_cache_bytes': 8 * 1024 * 1024,   # Byte budget of the tier-1 (champion list) postings cache
+    'index_profile': 'standard',              # 'standard', or 'impact' to also build the quantized impact index
+    'impact_bits': 8,                         # 8 or 16 bit impacts
+    'impact_time_budget_ms': 50,
+    'deadline_ms': 250,                       # Per-query evaluation budget, 0 disables
+    'deadline_block_size': 4096,              # Postings scored between deadline checks
+    'two_stage_ranking': True,
+    'rerank_depth': 1000,                     # Candidates passed from the cheap first stage (no cosine or proximity) to full re-ranking
+    'num_shards': 1,                          # Doc-partitioned shards built after indexing, 1 disables
+    'shard_timeout_s': 5,                     # Seconds to wait for every shard before returning partial results
+    'pool_worker_cache_bytes': 4 * 1024 * 1024, # Per-process postings cache in the mmap searcher pool
+    'pool_query_timeout_s': 30,               # Seconds SearcherPool.wait() gives a query before raising TimeoutError
+    'worker_start_timeout_s': 120,            # Seconds for pool and shard searcher processes to load their index
+    'index_versions_kept': 2,                 # Published index versions kept on disk, including the current one
+    'reload_warm_queries': 200,               # Recent queries whose postings are prefetched before a swap
+    'index_reload_poll_s': 10,                # How often a live engine checks the manifest, 0 disables
+    'query_trace_log': None,                  # JSON lines file every query trace is appended to, None disables
+    'query_profiler': None,                   # 'sampling' or 'cprofile' to profile queries, None disables
+    'query_profile_dir': 'query_profiles',
+    'query_profile_threshold_ms': 250,        # Queries at least this slow always have their profile written
+    'query_profile_sample_rate': 0.0,         # Share of faster queries whose profile is written too
+    'query_profile_max_files': 500,           # Oldest profiles are deleted beyond this
+    'query_profile_interval_ms': 2,           # Stack sampling period
+    'autocomplete_top_k': 10,                 # Completions kept per precomputed prefix
+    'autocomplete_cached_prefix_len': 3,      # Prefixes up to this long have their completions precomputed
+    'spelling_correction': 'suggest',         # Unknown query words: 'off', 'suggest' a corrected query, or 'auto' search it
+    'spelling_max_edit_distance': 2,
+    'spelling_prefix_length': 7,              # Characters of each word the delete dictionary is built over
+    'spelling_min_count': 2,                  # Words seen fewer times are not offered as corrections
+    'doc_store_block_bytes': 16 * 1024,       # Page text per compressed block of the document store
+    'doc_store_compression_level': 6,
+    'doc_store_cache_blocks': 256,            # Decompressed blocks kept by a search process
+    'snippets': True,                         # Attach query-biased snippets to the final results
+    'snippet_tokens': 30,                     # Indexed tokens per snippet window
+    'service_default_results': 10,
+    'service_max_results': 100,
+    'service_max_header_bytes': 16 * 1024,    # Request line plus headers, larger requests get a 431
+    'service_max_body_bytes': 64 * 1024,      # Request bodies are drained unread, larger ones get a 413
     'simhash_cache_size': 1000000
 }
 
 
 # FILE PATHS
 PARTIAL_DIR = "partial_indexes"
+SHARD_DIR = "shards"
+DISTRIBUTED_DIR = "distributed_build"
+COORDINATOR_DB = f"{DISTRIBUTED_DIR}/coordinator.db"
+INDEX_VERSIONS_DIR = "index_versions"
+INDEX_MANIFEST_FILE = f"{INDEX_VERSIONS_DIR}/manifest.json"
 RANGE_DIR = "range_indexes"
 FULL_ANALYTICS_DIR = "full_analytics"
+BUILD_STAGING_DIR = "build_staging"   # A build's full_analytics files and shards until it is published
+STATIC_DIR = f"{FULL_ANALYTICS_DIR}/static"
 DOCS_FILE = f"{FULL_ANALYTICS_DIR}/documents.json" 
 INDEX_FILE = f"{FULL_ANALYTICS_DIR}/index.json"
 INDEX_PEEK_FILE = f"{FULL_ANALYTICS_DIR}/index_peek.pkl"
 INDEX_MAP_FILE = f"{FULL_ANALYTICS_DIR}/index_map_position.json"
+INDEX_CHAMPION_FILE = f"{FULL_ANALYTICS_DIR}/index_champions.pkl"
+INDEX_CHAMPION_MAP_FILE = f"{FULL_ANALYTICS_DIR}/index_map_champions.json"
+INDEX_IMPACT_FILE = f"{FULL_ANALYTICS_DIR}/index_impact.pkl"
+INDEX_IMPACT_MAP_FILE = f"{FULL_ANALYTICS_DIR}/index_map_impact.json"
+INDEX_IMPACT_META_FILE = f"{FULL_ANALYTICS_DIR}/index_impact_meta.json"
+LINK_SCORES_FILE = f"{FULL_ANALYTICS_DIR}/link_scores.json"
+LINK_GRAPH_FILE = f"{FULL_ANALYTICS_DIR}/link_graph.jsonl"   # [doc_id, outgoing links] per line
+DOC_URLS_FILE = f"{FULL_ANALYTICS_DIR}/doc_urls.txt"        # URL spill file of the build's document table
 DOC_TITLE_FILE = f"{FULL_ANALYTICS_DIR}/doc_titles.json"
+SURFACE_FORMS_FILE = f"{FULL_ANALYTICS_DIR}/surface_forms.json"   # Unstemmed word -> occurrences
+AUTOCOMPLETE_FILE = f"{FULL_ANALYTICS_DIR}/autocomplete.pkl"
+SPELLING_FILE = f"{FULL_ANALYTICS_DIR}/spelling.pkl"
+DOC_STORE_FILE = f"{FULL_ANALYTICS_DIR}/doc_store.bin"         # zlib blocks of page text and token offsets
+DOC_STORE_INDEX_FILE = f"{FULL_ANALYTICS_DIR}/doc_store_index.pkl"
 
 # TAGS
 TAG_WEIGHTS = {
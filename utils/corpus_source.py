@@ -0,0 +1,275 @@
+import os
+import gzip
+import json
+import queue
+import tarfile
+import zipfile
+import threading
+
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.build_profiler import stage
+
+# A document as the indexers consume it: (where it came from, decoded crawl record)
+SourceDocument = Tuple[str, Dict]
+
+
+def _decode(name: str, raw: bytes) -> Optional[Dict]:
+    try:
+        return json.loads(raw)
+    except ValueError as e:
+        print(f"\tError decoding {name}: {e}")
+        return None
+
+
+def _iter_jsonl(name: str, lines, first_line: int = 1) -> Iterator[SourceDocument]:
+    """One crawl record per non-blank line"""
+    for line_number, line in enumerate(lines, first_line):
+        if not line.strip():
+            continue
+        with stage('read'):
+            data = _decode(f"{name}:{line_number}", line)
+        if data is not None:
+            yield f"{name}:{line_number}", data
+
+
+class CorpusSource:
+    """A stream of crawl records, read lazily so indexing starts before the corpus is listed"""
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def __iter__(self) -> Iterator[SourceDocument]:
+        raise NotImplementedError
+
+    def count(self) -> Optional[int]:
+        """Number of documents where it can be known without reading them, else None"""
+        return None
+
+    def partition(self, docs_per_unit: int) -> List[Dict]:
+        """
+        Split the corpus into independently readable work units, in corpus order.
+
+        Each unit is a JSON-serializable spec with 'docs', an upper bound on the
+        documents it yields. Sources that cannot be split become one unit, counted
+        with a full pass.
+        """
+        return [{'docs': sum(1 for _ in self)}]
+
+    def read_unit(self, unit: Dict) -> Iterator[SourceDocument]:
+        """Documents of one unit returned by partition()"""
+        return iter(self)
+
+
+class DirectorySource(CorpusSource):
+    """The DEV layout: <domain>/<hash>.json, one record per file"""
+    def _files(self) -> Iterator[str]:
+        with os.scandir(self.path) as folders:
+            for folder in folders:
+                if not folder.is_dir():
+                    continue
+                with os.scandir(folder.path) as entries:
+                    for entry in entries:
+                        if entry.name.endswith(".json") and entry.is_file():
+                            yield entry.path
+
+    def __iter__(self) -> Iterator[SourceDocument]:
+        return self._read_files(self._files())
+
+    def _read_files(self, files: Iterable[str]) -> Iterator[SourceDocument]:
+        for file_path in files:
+            with stage('read'):
+                try:
+                    with open(file_path, "rb") as f:
+                        data = _decode(file_path, f.read())
+                except OSError as e:
+                    print(f"\tError reading {file_path}: {e}")
+                    data = None
+            if data is not None:
+                yield file_path, data
+
+    def count(self) -> Optional[int]:
+        return sum(1 for _ in self._files())
+
+    def partition(self, docs_per_unit: int) -> List[Dict]:
+        files = list(self._files())
+        return [
+            {'files': files[start:start + docs_per_unit], 'docs': len(files[start:start + docs_per_unit])}
+            for start in range(0, len(files), docs_per_unit)
+        ]
+
+    def read_unit(self, unit: Dict) -> Iterator[SourceDocument]:
+        return self._read_files(unit['files'])
+
+
+class JsonlSource(CorpusSource):
+    """One record per line, optionally gzip compressed (.jsonl.gz)"""
+    def __iter__(self) -> Iterator[SourceDocument]:
+        opener = gzip.open if self.path.suffix == ".gz" else open
+        with opener(self.path, "rb") as f:
+            yield from _iter_jsonl(str(self.path), f)
+
+    def partition(self, docs_per_unit: int) -> List[Dict]:
+        if self.path.suffix == ".gz":
+            return super().partition(docs_per_unit)
+        # Byte ranges on line boundaries, found with one pass over the file
+        units = []
+        start = offset = lines = 0
+        first_line = 1
+        with open(self.path, "rb") as f:
+            for line in f:
+                offset += len(line)
+                lines += 1
+                if lines == docs_per_unit:
+                    units.append({'start': start, 'end': offset, 'first_line': first_line, 'docs': lines})
+                    start, first_line, lines = offset, first_line + lines, 0
+        if lines:
+            units.append({'start': start, 'end': offset, 'first_line': first_line, 'docs': lines})
+        return units
+
+    def read_unit(self, unit: Dict) -> Iterator[SourceDocument]:
+        if 'start' not in unit:
+            yield from self
+            return
+        with open(self.path, "rb") as f:
+            f.seek(unit['start'])
+            lines = iter(lambda: f.readline() if f.tell() < unit['end'] else b"", b"")
+            yield from _iter_jsonl(str(self.path), lines, unit['first_line'])
+
+
+class ZipSource(CorpusSource):
+    """Zip archive of .json record files (any folder layout) and/or .jsonl files"""
+    def __iter__(self) -> Iterator[SourceDocument]:
+        with zipfile.ZipFile(self.path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                name = f"{self.path}:{info.filename}"
+                if info.filename.endswith(".json"):
+                    with stage('read'):
+                        data = _decode(name, archive.read(info))
+                    if data is not None:
+                        yield name, data
+                elif info.filename.endswith(".jsonl"):
+                    with archive.open(info) as member:
+                        yield from _iter_jsonl(name, member)
+
+    def count(self) -> Optional[int]:
+        with zipfile.ZipFile(self.path) as archive:
+            names = archive.namelist()
+        if any(name.endswith(".jsonl") for name in names):
+            return None
+        return sum(1 for name in names if name.endswith(".json"))
+
+    def partition(self, docs_per_unit: int) -> List[Dict]:
+        with zipfile.ZipFile(self.path) as archive:
+            names = archive.namelist()
+        if any(name.endswith(".jsonl") for name in names):
+            return super().partition(docs_per_unit)
+        members = [name for name in names if name.endswith(".json")]
+        return [
+            {'members': members[start:start + docs_per_unit], 'docs': len(members[start:start + docs_per_unit])}
+            for start in range(0, len(members), docs_per_unit)
+        ]
+
+    def read_unit(self, unit: Dict) -> Iterator[SourceDocument]:
+        if 'members' not in unit:
+            yield from self
+            return
+        with zipfile.ZipFile(self.path) as archive:
+            for member in unit['members']:
+                name = f"{self.path}:{member}"
+                with stage('read'):
+                    data = _decode(name, archive.read(member))
+                if data is not None:
+                    yield name, data
+
+
+class TarSource(CorpusSource):
+    """Tar archive (plain, gz, bz2 or xz) read as a stream, so members are never seeked back to"""
+    def __iter__(self) -> Iterator[SourceDocument]:
+        with tarfile.open(self.path, "r|*") as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                name = f"{self.path}:{member.name}"
+                if member.name.endswith(".json"):
+                    with stage('read'):
+                        data = _decode(name, archive.extractfile(member).read())
+                    if data is not None:
+                        yield name, data
+                elif member.name.endswith(".jsonl"):
+                    yield from _iter_jsonl(name, archive.extractfile(member))
+
+
+def open_corpus(path: str) -> CorpusSource:
+    """Pick the source for a corpus path: a DEV-layout directory, a zip or tar archive, or a JSONL file"""
+    path = Path(path)
+    name = path.name.lower()
+    if path.is_dir():
+        return DirectorySource(path)
+    if name.endswith(".zip"):
+        return ZipSource(path)
+    if name.endswith((".jsonl", ".jsonl.gz")):
+        return JsonlSource(path)
+    if name.endswith((".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")):
+        return TarSource(path)
+    raise ValueError(f"Unsupported corpus {path}: expected a directory, .zip, .tar[.gz|.bz2|.xz] or .jsonl[.gz]")
+
+
+_END = object()
+
+
+class ReadAhead:
+    """
+    Reads and decodes documents on a background thread, up to depth ahead of the consumers.
+
+    File reads and decompression release the GIL, so they overlap with HTML parsing
+    in the indexer. Any number of threads may iterate the same ReadAhead; each
+    document goes to exactly one of them.
+    """
+    def __init__(self, source: CorpusSource, depth: int = 256):
+        self.source = source
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max(1, depth))
+        self.error: Optional[BaseException] = None
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self._produce, name="corpus-read-ahead", daemon=True)
+        self.thread.start()
+
+    def _produce(self) -> None:
+        try:
+            for document in self.source:
+                while not self.closed.is_set():
+                    try:
+                        self.queue.put(document, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if self.closed.is_set():
+                    return
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.queue.put(_END)
+
+    def __iter__(self) -> Iterator[SourceDocument]:
+        while True:
+            with stage('read_wait'):
+                document = self.queue.get()
+            if document is _END:
+                # Leave the marker for the other consumers
+                self.queue.put(_END)
+                if self.error is not None:
+                    raise self.error
+                return
+            yield document
+
+    def close(self) -> None:
+        """Stop reading early, for consumers that give up before the end of the corpus"""
+        self.closed.set()
+        # Drain so the reader thread can always queue its end marker
+        while self.thread.is_alive():
+            try:
+                self.queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
@@ -0,0 +1,73 @@
+import time
+import threading
+
+from collections import deque
+from typing import Dict, List, Optional
+
+
+class Deadline:
+    """Wall-clock budget for one query, plus a record of how much work it let through"""
+    def __init__(self, budget_ms: Optional[float]):
+        self.started_at = time.perf_counter()
+        self.budget_ms = budget_ms
+        self.expires_at = self.started_at + budget_ms / 1000 if budget_ms else None
+        self.truncated = False
+        self.work_done = 0
+        self.work_total = 0
+
+    def expired(self) -> bool:
+        if self.expires_at is not None and time.perf_counter() >= self.expires_at:
+            self.truncated = True
+            return True
+        return False
+
+    def reset_work(self) -> None:
+        """Forget the work counted so far, when its results are abandoned for another evaluation"""
+        self.work_done = 0
+        self.work_total = 0
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started_at) * 1000
+
+    @property
+    def work_fraction(self) -> float:
+        return self.work_done / self.work_total if self.work_total else 1.0
+
+
+class DeadlineStats:
+    """Aggregates how often, and by how much, query deadlines truncated evaluation"""
+    def __init__(self, max_samples: int = 10000):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.truncated = 0
+        # Most recent samples only, so percentiles follow the current traffic
+        self.latencies_ms = deque(maxlen=max_samples)
+        self.skipped_fractions = deque(maxlen=max_samples)   # Share of postings left unscored, truncated queries only
+
+    def record(self, deadline: Deadline) -> None:
+        with self.lock:
+            self.queries += 1
+            self.latencies_ms.append(deadline.elapsed_ms())
+            if deadline.truncated:
+                self.truncated += 1
+                self.skipped_fractions.append(1.0 - deadline.work_fraction)
+
+    @staticmethod
+    def _percentile(values: List[float], pct: float) -> float:
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(pct / 100 * len(values)))]
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            latencies = sorted(self.latencies_ms)
+            skipped = sorted(self.skipped_fractions)
+            return {
+                'queries': self.queries,
+                'truncated': self.truncated,
+                'truncation_rate': self.truncated / self.queries if self.queries else 0.0,
+                'p50_ms': self._percentile(latencies, 50),
+                'p99_ms': self._percentile(latencies, 99),
+                'median_skipped_fraction': self._percentile(skipped, 50),
+                'max_skipped_fraction': skipped[-1] if skipped else 0.0
+            }
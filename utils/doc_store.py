@@ -0,0 +1,133 @@
+import os
+import zlib
+import pickle
+import threading
+
+from array import array
+from pathlib import Path
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from utils.constants import DOC_STORE_FILE, DOC_STORE_INDEX_FILE, CONFIG
+
+_MISSING = 0xFFFFFFFF   # Block number of doc_ids that are not in the store
+
+
+class DocumentStoreWriter:
+    """
+    Writes page text to a compressed, block-addressable document store.
+
+    Documents are appended to the current block until it holds block_bytes of
+    text, then the block is pickled, zlib-compressed and written out. Each document
+    keeps the character offset of every indexed token, so a token position from a
+    posting maps straight to its place in the text. The index file, written on
+    close(), holds each block's byte offset and each doc_id's block and slot;
+    doc_ids may arrive in any order and with gaps.
+    """
+    def __init__(self, path: str = DOC_STORE_FILE, index_path: str = DOC_STORE_INDEX_FILE,
+                 block_bytes: int = CONFIG['doc_store_block_bytes'],
+                 level: int = CONFIG['doc_store_compression_level']):
+        self.path = Path(path)
+        self.index_path = Path(index_path)
+        self.block_bytes = block_bytes
+        self.level = level
+        self.file = open(self.path, "wb")
+        self.block: List[Tuple[str, bytes]] = []
+        self.block_size = 0
+        self.block_offsets = array('Q', [0])   # Block b spans block_offsets[b]:block_offsets[b + 1]
+        self.doc_blocks = array('I')
+        self.doc_slots = array('I')
+        self.documents = 0
+
+    def add(self, doc_id: int, text: str, offsets: Sequence[int]) -> None:
+        """Store a document's text and the character offset of each of its token positions"""
+        if doc_id >= len(self.doc_blocks):
+            missing = doc_id + 1 - len(self.doc_blocks)
+            self.doc_blocks.extend(array('I', [_MISSING]) * missing)
+            self.doc_slots.extend(array('I', [0]) * missing)
+        self.doc_blocks[doc_id] = len(self.block_offsets) - 1
+        self.doc_slots[doc_id] = len(self.block)
+        offsets = array('I', offsets)
+        self.block.append((text, offsets.tobytes()))
+        self.block_size += len(text) + offsets.itemsize * len(offsets)
+        self.documents += 1
+        if self.block_size >= self.block_bytes:
+            self._flush_block()
+
+    def _flush_block(self) -> None:
+        if not self.block:
+            return
+        data = zlib.compress(pickle.dumps(self.block, protocol=pickle.HIGHEST_PROTOCOL), self.level)
+        self.file.write(data)
+        self.block_offsets.append(self.block_offsets[-1] + len(data))
+        self.block = []
+        self.block_size = 0
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+        self._flush_block()
+        self.file.close()
+        with open(self.index_path, "wb") as f:
+            pickle.dump({
+                'block_offsets': self.block_offsets,
+                'doc_blocks': self.doc_blocks,
+                'doc_slots': self.doc_slots,
+                'documents': self.documents
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class DocumentStore:
+    """
+    Reads documents back from a store written by DocumentStoreWriter.
+
+    A lookup reads and decompresses one block with a positioned read, so it is
+    safe from several threads at once. The last cache_blocks decoded blocks are
+    kept, which serves neighbouring doc_ids and repeated queries from memory.
+    """
+    def __init__(self, path: str = DOC_STORE_FILE, index_path: str = DOC_STORE_INDEX_FILE,
+                 cache_blocks: int = CONFIG['doc_store_cache_blocks']):
+        with open(index_path, "rb") as f:
+            index = pickle.load(f)
+        self.block_offsets: array = index['block_offsets']
+        self.doc_blocks: array = index['doc_blocks']
+        self.doc_slots: array = index['doc_slots']
+        self.documents: int = index['documents']
+        self.fd = os.open(path, os.O_RDONLY)
+        self.cache_blocks = cache_blocks
+        self.cache: "OrderedDict[int, List[Tuple[str, bytes]]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.documents
+
+    def __contains__(self, doc_id: int) -> bool:
+        return 0 <= doc_id < len(self.doc_blocks) and self.doc_blocks[doc_id] != _MISSING
+
+    def _block(self, block: int) -> List[Tuple[str, bytes]]:
+        with self.lock:
+            records = self.cache.get(block)
+            if records is not None:
+                self.cache.move_to_end(block)
+                return records
+        start, end = self.block_offsets[block], self.block_offsets[block + 1]
+        records = pickle.loads(zlib.decompress(os.pread(self.fd, end - start, start)))
+        with self.lock:
+            self.cache[block] = records
+            while len(self.cache) > self.cache_blocks:
+                self.cache.popitem(last=False)
+        return records
+
+    def get(self, doc_id: int) -> Optional[Tuple[str, array]]:
+        """A document's text and the character offset of each token position, None if not stored"""
+        if doc_id not in self:
+            return None
+        text, raw_offsets = self._block(self.doc_blocks[doc_id])[self.doc_slots[doc_id]]
+        offsets = array('I')
+        offsets.frombytes(raw_offsets)
+        return text, offsets
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
@@ -0,0 +1,106 @@
+import json
+
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from utils.constants import DOC_URLS_FILE, LINK_GRAPH_FILE
+
+_LOW_64 = (1 << 64) - 1
+
+
+class DocumentTable:
+    """
+    Compact metadata of the documents accepted during a build.
+
+    Rows are kept in flat arrays (doc_id, url offset, token count and the SimHash
+    fingerprint as two 64-bit words, about 30 bytes per document) instead of a
+    Document object holding the page text. URLs are appended to a spill file and
+    outgoing links streamed to the link-graph file as documents are added, so
+    build memory does not grow with the size of the corpus text.
+    """
+    def __init__(self, urls_path: str = DOC_URLS_FILE, link_graph_path: str = LINK_GRAPH_FILE,
+                 fingerprint_bits: int = 128):
+        self.urls_path = Path(urls_path)
+        self.link_graph_path = Path(link_graph_path)
+        self.urls_path.parent.mkdir(parents=True, exist_ok=True)
+        self.urls_file = open(self.urls_path, "wb")
+        self.link_graph_file = open(self.link_graph_path, "w")
+        self.fingerprint_bits = fingerprint_bits
+
+        # One entry per accepted document, in the order they were added
+        self.doc_ids = array('Q')
+        self.url_offsets = array('Q')
+        self.fingerprint_high = array('Q')
+        self.fingerprint_low = array('Q')
+        # Indexed by doc_id, 0 for ids that were never accepted (duplicates, failed pages)
+        self.token_counts = array('I')
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, doc_id: int, url: str, token_count: int, simhash: str, outgoing_links: List[str]) -> None:
+        fingerprint = int(simhash, 2)
+        self.doc_ids.append(doc_id)
+        self.url_offsets.append(self.urls_file.tell())
+        self.urls_file.write(url.encode("utf-8") + b"\n")
+        self.fingerprint_high.append(fingerprint >> 64)
+        self.fingerprint_low.append(fingerprint & _LOW_64)
+        if doc_id >= len(self.token_counts):
+            # The multithreaded indexer hands out ids before deduplication, so they can arrive out of order
+            self.token_counts.extend([0] * (doc_id + 1 - len(self.token_counts)))
+        self.token_counts[doc_id] = token_count
+        self.link_graph_file.write(json.dumps([doc_id, outgoing_links]) + "\n")
+
+    def token_count(self, doc_id: int) -> int:
+        return self.token_counts[doc_id]
+
+    def url(self, row: int) -> str:
+        """URL of the row-th accepted document, read from the spill file at its offset"""
+        if not self.urls_file.closed:
+            self.urls_file.flush()
+        with open(self.urls_path, "rb") as urls:
+            urls.seek(self.url_offsets[row])
+            return urls.readline().rstrip(b"\n").decode("utf-8")
+
+    def is_near_duplicate(self, simhash: str, threshold: float) -> bool:
+        """True when an accepted document's fingerprint is at least threshold similar"""
+        # Largest Hamming distance that still counts, same test as 1 - distance / bits >= threshold
+        max_distance = max(
+            (distance for distance in range(self.fingerprint_bits + 1)
+             if 1 - distance / self.fingerprint_bits >= threshold),
+            default=-1
+        )
+        fingerprint = int(simhash, 2)
+        high, low = fingerprint >> 64, fingerprint & _LOW_64
+        # bin().count rather than int.bit_count(), which needs Python 3.10
+        return any(
+            bin(high ^ other_high).count("1") + bin(low ^ other_low).count("1") <= max_distance
+            for other_high, other_low in zip(self.fingerprint_high, self.fingerprint_low)
+        )
+
+    def close(self) -> None:
+        """Flush the spill files, after which rows can be read back"""
+        for f in (self.urls_file, self.link_graph_file):
+            if not f.closed:
+                f.close()
+
+    def rows(self) -> Iterator[Tuple[int, str, int, str]]:
+        """(doc_id, url, token_count, simhash) per document in insertion order, URLs read back from the spill file"""
+        self.close()
+        with open(self.urls_path, "rb") as urls:
+            for row, doc_id in enumerate(self.doc_ids):
+                url = urls.readline().rstrip(b"\n").decode("utf-8")
+                fingerprint = self.fingerprint_high[row] << 64 | self.fingerprint_low[row]
+                yield doc_id, url, self.token_counts[doc_id], format(fingerprint, f"0{self.fingerprint_bits}b")
+
+    def link_graph(self) -> Dict[int, Dict]:
+        """{doc_id: {'url', 'outgoing_links'}} for link analysis, loaded from the link-graph file"""
+        self.close()
+        urls = {doc_id: url for doc_id, url, _, _ in self.rows()}
+        graph = {}
+        with open(self.link_graph_path) as f:
+            for line in f:
+                doc_id, outgoing_links = json.loads(line)
+                graph[doc_id] = {'url': urls[doc_id], 'outgoing_links': outgoing_links}
+        return graph
@@ -0,0 +1,222 @@
+import json
+import math
+import time
+import heapq
+import bisect
+import pickle
+
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from utils.constants import (
+    INDEX_PEEK_FILE,
+    INDEX_IMPACT_FILE,
+    INDEX_IMPACT_MAP_FILE,
+    INDEX_IMPACT_META_FILE,
+    CONFIG
+)
+
+
+class ImpactIndexGenerator:
+    """
+    Builds the impact-ordered index profile from the standard pickle index.
+
+    Every posting's tf-idf contribution (which already folds in the HTML tag
+    importance) is quantized to an integer impact in [1, 2^bits - 1]. Contributions
+    are skewed, most are a small fraction of the largest, so impacts are spread
+    evenly over the logarithm of the contribution between the corpus-wide smallest
+    and largest: every impact covers the same relative range, and common terms keep
+    as many distinct impacts as rare ones. Queries sum each impact's value (see
+    impact_values), which is within a few percent of the contributions it stands
+    for. Each term is stored as segments of (impact, doc_ids) in descending impact
+    order, with the doc_ids packed as a uint32 array and no positions, so a term's
+    record is a fraction of the size of its full postings.
+    """
+    def __init__(self, index_pickle: str = INDEX_PEEK_FILE, output_pickle: str = INDEX_IMPACT_FILE,
+                 output_json: str = INDEX_IMPACT_MAP_FILE, output_meta: str = INDEX_IMPACT_META_FILE,
+                 bits: Optional[int] = None):
+        self.index_pickle = Path(index_pickle)
+        self.output_pickle = Path(output_pickle)
+        self.output_json = Path(output_json)
+        self.output_meta = Path(output_meta)
+        self.bits = bits or CONFIG['impact_bits']
+        self.levels = (1 << self.bits) - 1
+
+    def _iter_terms(self):
+        with open(self.index_pickle, "rb") as pkl_file:
+            while True:
+                try:
+                    yield pickle.load(pkl_file)
+                except EOFError:
+                    return
+
+    def quantize(self, contribution: float, low: float, high: float) -> int:
+        """Impact of a contribution, given the smallest positive and the largest contribution"""
+        if contribution <= low or high <= low:
+            return 1 if high > low else self.levels
+        step = math.log(high / low) / self.levels
+        return max(1, min(self.levels, 1 + int(math.log(contribution / low) / step)))
+
+    def generate(self) -> None:
+        """Write impact segments, the term:position map and the quantization metadata"""
+        # Pass 1: global bounds so impacts are comparable across terms
+        low, high = math.inf, 0.0
+        for _, postings in self._iter_terms():
+            for posting in postings:
+                if posting[3] > 0:
+                    low = min(low, posting[3])
+                    high = max(high, posting[3])
+        if high == 0.0:
+            low = 0.0
+
+        # Pass 2: group each term's postings into descending impact segments
+        seek_positions = {}
+        with open(self.output_pickle, "wb") as impact_file:
+            for term, postings in self._iter_terms():
+                segments: Dict[int, List[int]] = {}
+                for posting in postings:
+                    segments.setdefault(self.quantize(posting[3], low, high), []).append(posting[0])
+
+                seek_positions[term] = impact_file.tell()
+                record = [
+                    (impact, array('I', sorted(doc_ids)).tobytes())
+                    for impact, doc_ids in sorted(segments.items(), reverse=True)
+                ]
+                pickle.dump((term, record), impact_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with open(self.output_json, "w") as json_file:
+            json.dump(seek_positions, json_file)
+        with open(self.output_meta, "w") as meta_file:
+            json.dump({'bits': self.bits, 'low': low, 'high': high}, meta_file)
+
+        size_kb = self.output_pickle.stat().st_size / 1024
+        print(f"Impact index written to {self.output_pickle} ({size_kb:.2f} KB, {self.bits}-bit impacts)")
+
+
+def impact_values(meta: Dict) -> List[float]:
+    """
+    The contribution each impact stands for, indexed by impact: the geometric middle
+    of the range it covers. Impact indexes written before log quantization store a
+    linear 'scale' instead.
+    """
+    levels = (1 << meta['bits']) - 1
+    if 'scale' in meta:
+        return [impact * meta['scale'] for impact in range(levels + 1)]
+    low, high = meta['low'], meta['high']
+    if high <= low:
+        return [0.0] + [high] * levels
+    step = math.log(high / low) / levels
+    return [0.0] + [low * math.exp((impact - 0.5) * step) for impact in range(1, levels + 1)]
+
+
+def decode_segments(record: List[Tuple[int, bytes]]) -> List[Tuple[int, array]]:
+    """Unpack the doc_id bytes of an impact record"""
+    decoded = []
+    for impact, packed in record:
+        doc_ids = array('I')
+        doc_ids.frombytes(packed)
+        decoded.append((impact, doc_ids))
+    return decoded
+
+
+def score_at_a_time(segments_by_term: Dict[str, List[Tuple[int, array]]], query_counts: Dict[str, int],
+                    k: int, deadline: Optional[float] = None, required: Sequence[str] = (),
+                    values: Optional[Sequence[float]] = None,
+                    candidates: Optional[Set[int]] = None) -> Tuple[Dict[int, float], Dict[int, int], bool]:
+    """
+    Anytime score-at-a-time evaluation.
+
+    A segment adds its impact's value (values[impact], or the impact itself without
+    values) times the query term count to each of its documents' accumulators, and
+    segments from all terms are processed in descending order of that contribution.
+    Only documents containing every required term (and in candidates, when given) can be ranked.
+    Evaluation stops early once the k-th best rankable accumulator leads every
+    other document by more than the most any document could still gain, so the
+    top-k set cannot change; the remaining segments are then looked up for those
+    k documents only, which leaves their accumulators exact. It also stops when
+    time.perf_counter() passes deadline, with best-so-far accumulators.
+
+    Returns (accumulators, matched term bitmasks, approximate).
+    """
+    terms = [term for term in query_counts if segments_by_term.get(term)]
+    required_mask = 0
+    for term in required:
+        if term not in terms:
+            return {}, {}, False
+        required_mask |= 1 << terms.index(term)
+
+    def value(impact: int) -> float:
+        return values[impact] if values is not None else impact
+
+    queue = []
+    for term_idx, term in enumerate(terms):
+        weight = query_counts[term]
+        for seg_idx, (impact, doc_ids) in enumerate(segments_by_term[term]):
+            queue.append((value(impact) * weight, term_idx, seg_idx, doc_ids))
+    queue.sort(key=lambda segment: segment[0], reverse=True)
+
+    # Largest contribution each term can still add: its next unprocessed segment
+    remaining = [value(segments_by_term[term][0][0]) * query_counts[term] for term in terms]
+
+    accumulators: Dict[int, float] = {}
+    masks: Dict[int, int] = {}
+    # The stopping check is O(accumulators); running it only once as many postings
+    # have been added since the last one keeps it within the cost of accumulating
+    unchecked = 0
+    for processed, (contribution, term_idx, seg_idx, doc_ids) in enumerate(queue, 1):
+        bit = 1 << term_idx
+        for doc_id in doc_ids:
+            accumulators[doc_id] = accumulators.get(doc_id, 0) + contribution
+            masks[doc_id] = masks.get(doc_id, 0) | bit
+        unchecked += len(doc_ids)
+
+        segments = segments_by_term[terms[term_idx]]
+        remaining[term_idx] = (
+            value(segments[seg_idx + 1][0]) * query_counts[terms[term_idx]]
+            if seg_idx + 1 < len(segments) else 0
+        )
+        upper_bound = sum(remaining)
+        if upper_bound == 0:
+            return accumulators, masks, False
+
+        if unchecked >= len(accumulators):
+            unchecked = 0
+            top = _settled_top(accumulators, masks, required_mask, k, upper_bound, candidates)
+            if top is not None:
+                _complete(top, queue[processed:], accumulators, masks)
+                return accumulators, masks, False
+
+        if deadline is not None and time.perf_counter() >= deadline:
+            return accumulators, masks, True
+
+    return accumulators, masks, False
+
+
+def _settled_top(accumulators: Dict[int, float], masks: Dict[int, int], required_mask: int,
+                 k: int, upper_bound: float, candidates: Optional[Set[int]] = None) -> Optional[List[int]]:
+    """The top-k rankable doc_ids if no other document can still overtake them, else None"""
+    rankable = (
+        doc_id for doc_id in accumulators
+        if masks[doc_id] & required_mask == required_mask and (candidates is None or doc_id in candidates)
+    )
+    top = heapq.nlargest(k, rankable, key=accumulators.get)
+    if not top or len(top) < k:
+        return None
+    chosen = set(top)
+    # Documents not yet seen at all sit at 0
+    challenger = max((score for doc_id, score in accumulators.items() if doc_id not in chosen), default=0)
+    if accumulators[top[-1]] - challenger > upper_bound:
+        return top
+    return None
+
+
+def _complete(doc_ids: List[int], segments: List[Tuple[float, int, int, array]],
+              accumulators: Dict[int, float], masks: Dict[int, int]) -> None:
+    """Add the unprocessed segments' contributions to the given documents (segment doc_ids are sorted)"""
+    for contribution, term_idx, _, segment_doc_ids in segments:
+        for doc_id in doc_ids:
+            idx = bisect.bisect_left(segment_doc_ids, doc_id)
+            if idx < len(segment_doc_ids) and segment_doc_ids[idx] == doc_id:
+                accumulators[doc_id] += contribution
+                masks[doc_id] |= 1 << term_idx
@@ -1,18 +1,46 @@
 import json
+import heapq
 import pickle
 
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
-from utils.constants import INDEX_FILE, INDEX_PEEK_FILE, INDEX_MAP_FILE
+from utils.autocomplete import AutocompleteIndex
+from utils.spelling import SpellingCorrector
+from utils.link_quality import url_quality
+from utils.constants import (
+    INDEX_FILE,
+    INDEX_PEEK_FILE,
+    INDEX_MAP_FILE,
+    INDEX_CHAMPION_FILE,
+    INDEX_CHAMPION_MAP_FILE,
+    DOCS_FILE,
+    LINK_SCORES_FILE,
+    SURFACE_FORMS_FILE,
+    AUTOCOMPLETE_FILE,
+    SPELLING_FILE,
+    CONFIG
+)
 
 class IndexGenerator:
     """Handles generation of secondary index files for efficient search"""
 
-    def __init__(self, index_path: str, output_pickle: str, output_json: str):
+    def __init__(self, index_path: str, output_pickle: str, output_json: str,
+                 champion_pickle: Optional[str] = None, champion_json: Optional[str] = None,
+                 autocomplete_path: Optional[str] = None, spelling_path: Optional[str] = None,
+                 surface_forms_path: str = SURFACE_FORMS_FILE, docs_path: str = DOCS_FILE,
+                 link_scores_path: str = LINK_SCORES_FILE):
         self.index_path = Path(index_path)
         self.output_pickle = Path(output_pickle) 
         self.output_json = Path(output_json)
+        self.champion_pickle = Path(champion_pickle) if champion_pickle else None
+        self.champion_json = Path(champion_json) if champion_json else None
+        self.autocomplete_path = Path(autocomplete_path) if autocomplete_path else None
+        self.spelling_path = Path(spelling_path) if spelling_path else None
+        self.surface_forms_path = Path(surface_forms_path)
+        self.docs_path = Path(docs_path)
+        self.link_scores_path = Path(link_scores_path)
+        self.document_frequencies: Dict[str, int] = {}
 
 
     def generate_pickle_index(self) -> None:
@@ -22,8 +50,10 @@ class IndexGenerator:
                 index_data = json.load(file)
                 
             with open(self.output_pickle, "wb") as pkl_file:
-                # Write each term and its postings separately
+                # Write each term and its postings separately, sorted by doc_id for intersections
                 for term, postings in index_data.items():
+                    postings.sort(key=lambda posting: posting[0])
+                    self.document_frequencies[term] = len(postings)
                     pickle.dump((term, postings), pkl_file, protocol=pickle.HIGHEST_PROTOCOL)
                     
         except FileNotFoundError:
@@ -32,12 +62,13 @@ class IndexGenerator:
             print(f"Error: Invalid JSON in {self.index_path}")
 
 
-    def generate_seek_positions(self) -> Dict[str, int]:
+    def generate_seek_positions(self, pickle_path: Optional[Path] = None) -> Dict[str, int]:
         """Generate dictionary mapping terms to file positions"""
+        pickle_path = pickle_path or self.output_pickle
         seek_positions = {}
         
         try:
-            with open(self.output_pickle, "rb") as pkl_file:
+            with open(pickle_path, "rb") as pkl_file:
                 while True:
                     seek_pos = pkl_file.tell()
                     try:
@@ -48,17 +79,89 @@ class IndexGenerator:
             return seek_positions
             
         except FileNotFoundError:
-            print(f"Error: Pickle index file {self.output_pickle} not found")
+            print(f"Error: Pickle index file {pickle_path} not found")
             return {}
 
 
-    def save_secondary_index(self, seek_positions: Dict[str, int]) -> None:
+    def save_secondary_index(self, seek_positions: Dict[str, int], json_path: Optional[Path] = None) -> None:
         """Save term:position mapping to JSON file"""
+        json_path = json_path or self.output_json
         try:
-            with open(self.output_json, "w") as json_file:
+            with open(json_path, "w") as json_file:
                 json.dump(seek_positions, json_file, indent=4)
         except IOError:
-            print(f"Error: Could not write to {self.output_json}")
+            print(f"Error: Could not write to {json_path}")
+
+
+    def _load_static_quality(self) -> Dict[int, float]:
+        """Per-document link quality, blended the same way the ranking formula weighs it"""
+        try:
+            with open(self.docs_path) as f:
+                documents = json.load(f)
+            with open(self.link_scores_path) as f:
+                scores = json.load(f)
+        except FileNotFoundError:
+            print("No documents or link scores found, champion lists will use tf-idf only")
+            return {}
+
+        quality = {}
+        for doc_id, doc in documents.items():
+            url = doc['url']
+            quality[int(doc_id)] = url_quality(scores, url)
+        return quality
+
+
+    def generate_champion_index(self) -> None:
+        """
+        Write the tier-1 index: for every term with more than r postings, the top-r by
+        tf-idf blended with static link quality, kept in doc_id order so they can be
+        intersected like tier 2. Shorter postings lists would be copied whole, tier-1
+        search reads those terms from the full index instead.
+        """
+        quality = self._load_static_quality()
+        list_size = CONFIG['champion_list_size']
+        quality_weight = CONFIG['champion_quality_weight']
+
+        with open(self.output_pickle, "rb") as pkl_file, open(self.champion_pickle, "wb") as champion_file:
+            while True:
+                try:
+                    term, postings = pickle.load(pkl_file)
+                except EOFError:
+                    break
+                if len(postings) <= list_size:
+                    continue
+                postings = heapq.nlargest(
+                    list_size,
+                    postings,
+                    key=lambda posting: posting[3] + quality_weight * quality.get(posting[0], 0.0)
+                )
+                postings.sort(key=lambda posting: posting[0])
+                pickle.dump((term, postings), champion_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.save_secondary_index(self.generate_seek_positions(self.champion_pickle), self.champion_json)
+
+
+    def _load_surface_forms(self) -> Optional[Dict[str, int]]:
+        try:
+            with open(self.surface_forms_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            print(f"No surface forms in {self.surface_forms_path}, skipping autocomplete and spelling indexes")
+            return None
+
+
+    def generate_autocomplete_index(self, surface_counts: Dict[str, int]) -> None:
+        """Write the completion index over the surface forms the indexer saw, ranked by their stems' dfs"""
+        autocomplete = AutocompleteIndex.build(surface_counts, self.document_frequencies)
+        autocomplete.save(self.autocomplete_path)
+        print(f"Autocomplete index: {len(autocomplete)} words, {len(autocomplete.top)} precomputed prefixes")
+
+
+    def generate_spelling_index(self, surface_counts: Dict[str, int]) -> None:
+        """Write the delete dictionary used to correct query words that match no index term"""
+        corrector = SpellingCorrector.build(surface_counts, self.document_frequencies)
+        corrector.save(self.spelling_path)
+        print(f"Spelling index: {len(corrector)} words, {len(corrector.keys)} deletes")
 
 
     def generate(self) -> None:
@@ -66,6 +169,14 @@ class IndexGenerator:
         self.generate_pickle_index()
         seek_positions = self.generate_seek_positions()
         self.save_secondary_index(seek_positions)
+        if self.champion_pickle and self.champion_json:
+            self.generate_champion_index()
+        if self.autocomplete_path or self.spelling_path:
+            surface_counts = self._load_surface_forms()
+            if surface_counts is not None and self.autocomplete_path:
+                self.generate_autocomplete_index(surface_counts)
+            if surface_counts is not None and self.spelling_path:
+                self.generate_spelling_index(surface_counts)
         print("Index generation completed successfully!")
 
 
@@ -73,9 +184,13 @@ def main():
     generator = IndexGenerator(
         index_path=INDEX_FILE,
         output_pickle=INDEX_PEEK_FILE,
-        output_json=INDEX_MAP_FILE
+        output_json=INDEX_MAP_FILE,
+        champion_pickle=INDEX_CHAMPION_FILE,
+        champion_json=INDEX_CHAMPION_MAP_FILE,
+        autocomplete_path=AUTOCOMPLETE_FILE,
+        spelling_path=SPELLING_FILE
     )
     generator.generate()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
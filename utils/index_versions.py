@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import shutil
+import filecmp
+
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from utils.constants import (
+    FULL_ANALYTICS_DIR,
+    BUILD_STAGING_DIR,
+    INDEX_VERSIONS_DIR,
+    INDEX_MANIFEST_FILE,
+    DOCS_FILE,
+    LINK_SCORES_FILE,
+    INDEX_PEEK_FILE,
+    INDEX_MAP_FILE,
+    INDEX_CHAMPION_FILE,
+    INDEX_CHAMPION_MAP_FILE,
+    INDEX_IMPACT_FILE,
+    INDEX_IMPACT_MAP_FILE,
+    INDEX_IMPACT_META_FILE,
+    STATIC_DIR,
+    AUTOCOMPLETE_FILE,
+    SPELLING_FILE,
+    DOC_STORE_FILE,
+    DOC_STORE_INDEX_FILE,
+    SHARD_DIR,
+    CONFIG
+)
+
+
+# Build outputs that make up one servable index, by role
+VERSION_ARTIFACTS = {
+    'docs': DOCS_FILE,
+    'link_scores': LINK_SCORES_FILE,
+    'index': INDEX_PEEK_FILE,
+    'map': INDEX_MAP_FILE,
+    'champions': INDEX_CHAMPION_FILE,
+    'champion_map': INDEX_CHAMPION_MAP_FILE,
+    'impact': INDEX_IMPACT_FILE,
+    'impact_map': INDEX_IMPACT_MAP_FILE,
+    'impact_meta': INDEX_IMPACT_META_FILE,
+    'static': STATIC_DIR,
+    'autocomplete': AUTOCOMPLETE_FILE,
+    'spelling': SPELLING_FILE,
+    'doc_store': DOC_STORE_FILE,
+    'doc_store_index': DOC_STORE_INDEX_FILE
+}
+
+
+def version_paths(version: str, versions_dir: str = INDEX_VERSIONS_DIR) -> Dict[str, Path]:
+    """File layout of one published version, mirroring the full_analytics files"""
+    root = Path(versions_dir) / version
+    paths = {role: root / Path(artifact).relative_to(FULL_ANALYTICS_DIR) for role, artifact in VERSION_ARTIFACTS.items()}
+    paths['shards'] = root / Path(SHARD_DIR).name
+    paths['dir'] = root
+    return paths
+
+
+def staged_path(artifact: str, staging_dir: str = BUILD_STAGING_DIR) -> Path:
+    """Where a build writes a full_analytics file, or SHARD_DIR, until it is published"""
+    if artifact == SHARD_DIR:
+        return Path(staging_dir) / Path(SHARD_DIR).name
+    return Path(staging_dir) / Path(artifact).relative_to(FULL_ANALYTICS_DIR)
+
+
+def engine_args(paths: Dict[str, Path]) -> Dict[str, str]:
+    """SearchEngine keyword arguments that serve the documents and auxiliary files of a version"""
+    return {
+        'docs_path': str(paths['docs']),
+        'link_scores_path': str(paths['link_scores']),
+        'autocomplete_path': str(paths['autocomplete']),
+        'spelling_path': str(paths['spelling']),
+        'doc_store_path': str(paths['doc_store']),
+        'doc_store_index_path': str(paths['doc_store_index'])
+    }
+
+
+def read_manifest(manifest_path: str = INDEX_MANIFEST_FILE) -> Optional[Dict]:
+    try:
+        with open(manifest_path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(manifest: Dict, manifest_path: Path) -> None:
+    """Replace the manifest in one rename, so readers see either the old or the new one"""
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, manifest_path)
+
+
+def _snapshot(source: Path, target: Path, previous: Optional[Path]) -> Tuple[int, int]:
+    """
+    Copy a file or directory tree into a version, hard-linking every file that is
+    identical to its counterpart in the previous version. Returns (copied, linked).
+    """
+    if source.is_dir():
+        target.mkdir()
+        copied = linked = 0
+        for child in sorted(source.iterdir()):
+            child_copied, child_linked = _snapshot(
+                child, target / child.name, previous / child.name if previous is not None else None
+            )
+            copied += child_copied
+            linked += child_linked
+        return copied, linked
+
+    if previous is not None and previous.is_file() and filecmp.cmp(source, previous, shallow=False):
+        try:
+            os.link(previous, target)
+            return 0, 1
+        except OSError:
+            pass   # No hard links on this filesystem
+    shutil.copy2(source, target)
+    return 1, 0
+
+
+def publish_version(artifacts: Iterable[str], source_dir: str = FULL_ANALYTICS_DIR,
+                    versions_dir: str = INDEX_VERSIONS_DIR, keep: Optional[int] = None,
+                    shard_dir: Optional[str] = None) -> str:
+    """
+    Snapshot a finished build into a new immutable version directory and make it current.
+
+    artifacts are the VERSION_ARTIFACTS roles the build produced, laid out under
+    source_dir as under full_analytics; only those are published, so files left
+    over from an earlier build never end up in the version. Files are copied
+    rather than linked to the build outputs, which belong to the build directory.
+    Versions are never written once published, though, so a file identical to the
+    current version's is hard-linked to it, and a rebuild only writes the artifacts
+    that changed. With shard_dir, the shards written by ShardBuilder are published
+    with the version. Versions beyond the newest `keep` are deleted; processes
+    still reading one keep their open handles valid.
+    """
+    versions_root = Path(versions_dir)
+    versions_root.mkdir(parents=True, exist_ok=True)
+    manifest_path = versions_root / Path(INDEX_MANIFEST_FILE).name
+    manifest = read_manifest(manifest_path) or {'current': None, 'versions': []}
+
+    version = time.strftime("v%Y%m%d-%H%M%S")
+    suffix = 1
+    while (versions_root / version).exists():
+        suffix += 1
+        version = time.strftime("v%Y%m%d-%H%M%S") + f"-{suffix}"
+
+    previous = versions_root / manifest['current'] if manifest['current'] else None
+
+    # Stage under a temporary name so a half-copied version is never visible
+    staging = versions_root / f".{version}.partial"
+    staging.mkdir()
+    sources: Dict[Path, Path] = {}
+    for role in artifacts:
+        relative = Path(VERSION_ARTIFACTS[role]).relative_to(FULL_ANALYTICS_DIR)
+        sources[relative] = Path(source_dir) / relative
+    if shard_dir is not None:
+        sources[Path(Path(SHARD_DIR).name)] = Path(shard_dir)
+    missing = [str(source) for source in sources.values() if not source.exists()]
+    if missing:
+        shutil.rmtree(staging)
+        raise FileNotFoundError(f"Build outputs missing, not publishing: {', '.join(missing)}")
+    files = []
+    copied = linked = 0
+    for relative, source in sources.items():
+        artifact_copied, artifact_linked = _snapshot(
+            source, staging / relative, previous / relative if previous is not None else None
+        )
+        copied += artifact_copied
+        linked += artifact_linked
+        files.append(str(relative))
+    os.rename(staging, versions_root / version)
+
+    manifest['versions'].append({'name': version, 'created_at': time.time(), 'files': files})
+    manifest['current'] = version
+
+    keep = keep or CONFIG['index_versions_kept']
+    retired = manifest['versions'][:-keep]
+    manifest['versions'] = manifest['versions'][-keep:]
+    _write_manifest(manifest, manifest_path)
+
+    for entry in retired:
+        shutil.rmtree(versions_root / entry['name'], ignore_errors=True)
+    print(f"Published index version {version} ({len(files)} artifacts, {copied} files copied, {linked} unchanged linked)")
+    return version
+
+
+def promote_build(staging_dir: str = BUILD_STAGING_DIR, target_dir: str = FULL_ANALYTICS_DIR,
+                  shard_dir: str = SHARD_DIR) -> None:
+    """
+    Move a build's staged files into full_analytics, and its shards to shard_dir, each
+    with a rename. A process still reading a replaced file keeps reading the old
+    one: files in full_analytics are replaced, never truncated or rewritten.
+    """
+    staging = Path(staging_dir)
+    Path(target_dir).mkdir(parents=True, exist_ok=True)
+    for source in sorted(staging.iterdir()):
+        target = Path(shard_dir) if source.name == Path(SHARD_DIR).name else Path(target_dir) / source.name
+        if source.is_dir() and target.exists():
+            # A directory holding files cannot be renamed over, the old one is moved aside first
+            retired = target.with_name(f".{target.name}.old")
+            shutil.rmtree(retired, ignore_errors=True)
+            os.rename(target, retired)
+            os.rename(source, target)
+            shutil.rmtree(retired)
+        else:
+            os.replace(source, target)
+    staging.rmdir()
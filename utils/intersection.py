@@ -0,0 +1,93 @@
+import math
+import bisect
+
+from typing import List, Sequence, Tuple
+
+
+def gallop(values: Sequence[int], target: int, lo: int = 0) -> int:
+    """Return the first index >= lo whose value is >= target, using exponential then binary search"""
+    n = len(values)
+    if lo >= n or values[lo] >= target:
+        return lo
+
+    # Double the step until we overshoot the target, then binary search the last gap
+    step = 1
+    hi = lo + 1
+    while hi < n and values[hi] < target:
+        lo = hi
+        step <<= 1
+        hi = lo + step
+    return bisect.bisect_left(values, target, lo + 1, min(hi + 1, n))
+
+
+class DocIdView:
+    """Read-only sequence over the doc_ids of a doc_id-ordered postings list, without copying them out"""
+    __slots__ = ('postings',)
+
+    def __init__(self, postings: Sequence):
+        self.postings = postings
+
+    def __len__(self) -> int:
+        return len(self.postings)
+
+    def __getitem__(self, idx: int) -> int:
+        return self.postings[idx][0]
+
+
+class SkipPointers:
+    """
+    Every sqrt(n)-th doc_id of a long list.
+
+    Advancing first binary searches the small sample to find the block that can
+    hold the target, then gallops inside that block only, so long jumps over a
+    common term's postings cost O(log sqrt(n)) instead of touching the big list.
+    """
+    def __init__(self, doc_ids: Sequence[int], stride: int = 0):
+        self.doc_ids = doc_ids
+        self.stride = stride or max(int(math.sqrt(len(doc_ids))), 1)
+        self.samples = [doc_ids[i] for i in range(0, len(doc_ids), self.stride)]
+
+    def advance(self, target: int, lo: int = 0) -> int:
+        """First index >= lo whose doc_id is >= target"""
+        block = bisect.bisect_right(self.samples, target) - 1
+        if block > 0:
+            lo = max(lo, block * self.stride)
+        return gallop(self.doc_ids, target, lo)
+
+
+def intersect(doc_id_lists: List[Sequence[int]], skip_threshold: int = 1024) -> List[Tuple[int, List[int]]]:
+    """
+    Intersect ascending doc_id lists, starting from the shortest one.
+
+    Returns (doc_id, indexes) pairs where indexes[i] is the position of doc_id
+    in doc_id_lists[i], so callers can get back to the matching postings. Lists
+    longer than skip_threshold are advanced through skip pointers.
+    """
+    if not doc_id_lists or any(not doc_ids for doc_ids in doc_id_lists):
+        return []
+
+    order = sorted(range(len(doc_id_lists)), key=lambda i: len(doc_id_lists[i]))
+    shortest = doc_id_lists[order[0]]
+    cursors = [0] * len(doc_id_lists)
+    skips = {
+        i: SkipPointers(doc_id_lists[i]) for i in order[1:]
+        if len(doc_id_lists[i]) > skip_threshold
+    }
+    matches = []
+
+    for idx, doc_id in enumerate(shortest):
+        cursors[order[0]] = idx
+        for list_idx in order[1:]:
+            doc_ids = doc_id_lists[list_idx]
+            if list_idx in skips:
+                cursor = skips[list_idx].advance(doc_id, cursors[list_idx])
+            else:
+                cursor = gallop(doc_ids, doc_id, cursors[list_idx])
+            cursors[list_idx] = cursor
+            if cursor == len(doc_ids):
+                return matches          # One list is exhausted, nothing further can match
+            if doc_ids[cursor] != doc_id:
+                break
+        else:
+            matches.append((doc_id, list(cursors)))
+    return matches
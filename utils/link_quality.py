@@ -0,0 +1,18 @@
+from typing import Dict
+
+
+def static_quality(auth: float, hub: float, page_rank: float) -> float:
+    """
+    Query-independent part of a document's score: the blend of its HITS and
+    PageRank scores used by ranking, champion selection and the static store.
+    """
+    return 0.1 * auth + 0.1 * hub + 0.2 * page_rank
+
+
+def url_quality(link_scores: Dict, url: str) -> float:
+    """static_quality of a URL given the saved link_scores.json contents"""
+    return static_quality(
+        link_scores['hits']['authority'].get(url, 0.0),
+        link_scores['hits']['hub'].get(url, 0.0),
+        link_scores['pagerank'].get(url, 0.0)
+    )
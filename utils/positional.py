@@ -0,0 +1,60 @@
+import heapq
+import bisect
+
+from typing import List, Optional, Sequence, Tuple
+
+
+def count_phrase_matches(position_lists: List[Sequence[int]], offsets: List[int]) -> int:
+    """
+    Count phrase occurrences in one document.
+
+    position_lists[i] holds the ascending token positions of the i-th phrase term
+    and offsets[i] its offset inside the phrase. A match is a start position s
+    where every term i occurs at s + offsets[i].
+    """
+    if not position_lists or any(not positions for positions in position_lists):
+        return 0
+
+    # Drive the scan from the term with the fewest positions
+    anchor = min(range(len(position_lists)), key=lambda i: len(position_lists[i]))
+    matches = 0
+    cursors = [0] * len(position_lists)
+
+    for anchor_pos in position_lists[anchor]:
+        start = anchor_pos - offsets[anchor]
+        for i, positions in enumerate(position_lists):
+            if i == anchor:
+                continue
+            wanted = start + offsets[i]
+            cursor = bisect.bisect_left(positions, wanted, cursors[i])
+            cursors[i] = cursor
+            if cursor == len(positions):
+                return matches
+            if positions[cursor] != wanted:
+                break
+        else:
+            matches += 1
+    return matches
+
+
+def min_covering_window(position_lists: List[Sequence[int]]) -> Optional[int]:
+    """Length of the smallest span of tokens containing at least one position from every list"""
+    if not position_lists or any(not positions for positions in position_lists):
+        return None
+
+    heap: List[Tuple[int, int, int]] = [(positions[0], i, 0) for i, positions in enumerate(position_lists)]
+    heapq.heapify(heap)
+    current_max = max(positions[0] for positions in position_lists)
+    best = current_max - heap[0][0] + 1
+
+    while True:
+        lowest, list_idx, pos_idx = heapq.heappop(heap)
+        best = min(best, current_max - lowest + 1)
+        if best == len(position_lists):
+            return best                 # Terms are adjacent, cannot do better
+        pos_idx += 1
+        if pos_idx == len(position_lists[list_idx]):
+            return best
+        next_pos = position_lists[list_idx][pos_idx]
+        current_max = max(current_max, next_pos)
+        heapq.heappush(heap, (next_pos, list_idx, pos_idx))
@@ -0,0 +1,169 @@
+import threading
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class FrequencySketch:
+    """Count-min sketch with periodic halving, used to estimate how often a key was requested"""
+    def __init__(self, width: int = 4096, depth: int = 4, sample_size: Optional[int] = None):
+        self.width = 1 << max(width - 1, 1).bit_length()   # Round up to a power of two for masking
+        self.depth = depth
+        self.mask = self.width - 1
+        self.table = [[0] * self.width for _ in range(depth)]
+        self.sample_size = sample_size or 10 * self.width
+        self.additions = 0
+
+    def _indexes(self, key: Hashable):
+        for seed in range(self.depth):
+            yield seed, hash((seed, key)) & self.mask
+
+    def increment(self, key: Hashable) -> None:
+        for row, idx in self._indexes(key):
+            if self.table[row][idx] < 255:
+                self.table[row][idx] += 1
+        self.additions += 1
+
+        # Age all counters so old popularity fades out
+        if self.additions >= self.sample_size:
+            self.table = [[count >> 1 for count in row] for row in self.table]
+            self.additions //= 2
+
+    def estimate(self, key: Hashable) -> int:
+        return min(self.table[row][idx] for row, idx in self._indexes(key))
+
+
+class PostingsCache:
+    """
+    Byte-budgeted postings cache.
+
+    Sizes are whatever the caller passes to put(); FileHandler passes an estimate
+    of the decoded postings' memory, not the length of the pickled record, which
+    is several times smaller.
+
+    Entries live in a segmented LRU: new entries enter the probation segment and are
+    promoted to the protected segment on their second hit. When the budget is full a
+    candidate is only admitted if the frequency sketch says it is requested more often
+    than the entry it would evict (TinyLFU admission), so one-off scans of huge
+    postings lists cannot flush the hot terms.
+    """
+    def __init__(self, max_bytes: int, protected_ratio: float = 0.8):
+        self.max_bytes = max_bytes
+        self.protected_bytes = int(max_bytes * protected_ratio)
+        self.probation: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self.protected: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self.sketch = FrequencySketch()
+        self.lock = threading.Lock()
+
+        # Counters
+        self.used_bytes = 0
+        self.used_protected = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+        self.bytes_loaded = 0
+        self.bytes_evicted = 0
+
+    def __len__(self) -> int:
+        return len(self.probation) + len(self.protected)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.probation or key in self.protected
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value or None, recording the access"""
+        with self.lock:
+            self.sketch.increment(key)
+
+            if key in self.protected:
+                self.protected.move_to_end(key)
+                self.hits += 1
+                return self.protected[key][0]
+
+            if key in self.probation:
+                value, size = self.probation.pop(key)
+                self._promote(key, value, size)
+                self.hits += 1
+                return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any, size: int) -> bool:
+        """Offer a value of `size` bytes to the cache, returns whether it was admitted"""
+        with self.lock:
+            self.bytes_loaded += size
+            if key in self:
+                return True
+            if size > self.max_bytes:
+                self.rejections += 1
+                return False
+
+            # Make room, but only if every entry it would evict is colder than the candidate;
+            # the victims are chosen first so a rejected candidate evicts nothing
+            victims = self._victims(self.used_bytes + size - self.max_bytes)
+            candidate_freq = self.sketch.estimate(key)
+            if any(self.sketch.estimate(victim_key) >= candidate_freq for _, victim_key in victims):
+                self.rejections += 1
+                return False
+            for segment, victim_key in victims:
+                self._evict(segment, victim_key)
+
+            self.probation[key] = (value, size)
+            self.used_bytes += size
+            return True
+
+    def _victims(self, needed: int) -> List[Tuple[OrderedDict, Hashable]]:
+        """Least recently used entries, probation first, whose sizes add up to at least `needed` bytes"""
+        victims = []
+        freed = 0
+        for segment in (self.probation, self.protected):
+            for victim_key, (_, victim_size) in segment.items():
+                if freed >= needed:
+                    return victims
+                victims.append((segment, victim_key))
+                freed += victim_size
+        return victims
+
+    def _promote(self, key: Hashable, value: Any, size: int) -> None:
+        """Move an entry into the protected segment, demoting protected LRU entries if needed"""
+        self.protected[key] = (value, size)
+        self.used_protected += size
+        while self.used_protected > self.protected_bytes and len(self.protected) > 1:
+            demoted_key, (demoted_value, demoted_size) = self.protected.popitem(last=False)
+            self.used_protected -= demoted_size
+            self.probation[demoted_key] = (demoted_value, demoted_size)
+
+    def _evict(self, segment: OrderedDict, key: Hashable) -> None:
+        _, size = segment.pop(key)
+        if segment is self.protected:
+            self.used_protected -= size
+        self.used_bytes -= size
+        self.evictions += 1
+        self.bytes_evicted += size
+
+    def clear(self) -> None:
+        with self.lock:
+            self.probation.clear()
+            self.protected.clear()
+            self.used_bytes = 0
+            self.used_protected = 0
+
+    def stats(self) -> Dict[str, float]:
+        """Export cache counters"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'rejections': self.rejections,
+                'entries': len(self),
+                'bytes': self.used_bytes,
+                'protected_bytes': self.used_protected,
+                'max_bytes': self.max_bytes,
+                'bytes_loaded': self.bytes_loaded,
+                'bytes_evicted': self.bytes_evicted
+            }
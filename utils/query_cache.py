@@ -0,0 +1,83 @@
+import time
+import threading
+
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class QueryResultCache:
+    """
+    LRU cache of ranked results keyed on the normalized query plan.
+
+    The key is the multiset of stemmed query terms plus the result depth, so
+    "Machine Learning", "learning machine" and "machine  learning!" all share an
+    entry. Every entry is tagged with the index version it was computed against;
+    seeing a new version drops the whole cache.
+    """
+    def __init__(self, max_entries: int, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.index_version: Optional[str] = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query_terms: List[str], max_results: int, phrases: List = (), mode: str = "or") -> Hashable:
+        """Canonical key for a tokenized query"""
+        return (
+            tuple(sorted(Counter(query_terms).items())),
+            tuple(sorted(tuple(phrase) for phrase in phrases)),
+            max_results,
+            mode
+        )
+
+    def _check_version(self, index_version: str) -> None:
+        if index_version != self.index_version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.index_version = index_version
+
+    def get(self, key: Hashable, index_version: str) -> Optional[Any]:
+        with self.lock:
+            self._check_version(index_version)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self.entries[key]
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, index_version: str) -> None:
+        with self.lock:
+            self._check_version(index_version)
+            self.entries[key] = (time.monotonic(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self.entries),
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,252 @@
+import os
+import sys
+import json
+import time
+import queue
+import random
+import pstats
+import cProfile
+import threading
+
+from pathlib import Path
+from contextlib import contextmanager
+from collections import Counter, defaultdict, deque
+from typing import Dict, List, Optional, Tuple
+
+from utils.query_trace import QueryTrace
+
+
+def _function_key(code) -> str:
+    """Same file:line(function) naming as pstats, so both profile kinds aggregate together"""
+    return f"{code.co_filename}:{code.co_firstlineno}({code.co_name})"
+
+
+class StackSampler:
+    """
+    Statistical profiler for the threads currently running a query.
+
+    A daemon thread wakes every interval_ms and records the Python stack of each
+    watched thread, cut off at the frame that started watching. Cost is one stack
+    walk per watched thread per tick, independent of how many calls the query makes.
+    """
+    def __init__(self, interval_ms: float = 2.0):
+        self.interval_s = interval_ms / 1000
+        self.lock = threading.Lock()
+        self.watched: Dict[int, Tuple[object, Counter]] = {}
+        self.thread: Optional[threading.Thread] = None
+
+    def watch(self, stop_frame) -> Counter:
+        """Start sampling the calling thread below stop_frame, returns the live sample counter"""
+        samples = Counter()
+        with self.lock:
+            self.watched[threading.get_ident()] = (stop_frame, samples)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="query-stack-sampler", daemon=True)
+                self.thread.start()
+        return samples
+
+    def unwatch(self) -> None:
+        with self.lock:
+            self.watched.pop(threading.get_ident(), None)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval_s)
+            with self.lock:
+                watched = list(self.watched.items())
+            if not watched:
+                continue
+            frames = sys._current_frames()
+            for thread_id, (stop_frame, samples) in watched:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None and frame is not stop_frame:
+                    stack.append(_function_key(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    samples[tuple(reversed(stack))] += 1
+
+
+class QueryProfiler:
+    """
+    Opt-in profiling hook around SearchEngine.search.
+
+    Every query is profiled, by the stack sampler ("sampling") or by cProfile
+    ("cprofile", exact call counts but a much larger overhead). Profiles of queries
+    slower than threshold_ms are always written to out_dir, together with the query
+    text and its terms' document frequencies; other queries are written with
+    probability sample_rate, as a baseline. The oldest files are deleted beyond max_files,
+    counting the ones already in out_dir at start-up and those this profiler wrote since.
+    Profiles are summarized and written by a background thread, so the query only
+    pays for handing them over; beyond max_pending queued profiles new ones are dropped.
+    """
+    def __init__(self, mode: str = "sampling", out_dir: str = "query_profiles", threshold_ms: float = 250,
+                 sample_rate: float = 0.0, max_files: int = 500, interval_ms: float = 2.0,
+                 max_pending: int = 100):
+        if mode not in ("sampling", "cprofile"):
+            raise ValueError(f"Unknown query profiler mode {mode!r}")
+        self.mode = mode
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self.interval_ms = interval_ms
+        self.sampler = StackSampler(interval_ms) if mode == "sampling" else None
+        self.written = 0
+        self.dropped = 0   # Profiles not written because the writer was max_pending behind
+        self.skipped = 0   # cProfile queries not profiled because another profiler was active
+        self.counts_lock = threading.Lock()   # Queries on several threads update dropped and skipped
+        # Names start with the millisecond timestamp, so they sort oldest first. Listed once here
+        # and kept up to date by the writer thread, rather than listing out_dir on every write.
+        self.files = deque(sorted(self.out_dir.glob("*.json")))
+        self.pending: queue.Queue = queue.Queue(maxsize=max_pending)
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    @contextmanager
+    def profile(self, trace: QueryTrace):
+        """Profile the enclosed query, and keep the profile if it was slow or sampled"""
+        profiler = samples = None
+        if self.sampler is not None:
+            samples = self.sampler.watch(sys._getframe(2))   # Frames below the `with` in the caller
+        else:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one active cProfile per process
+                profiler = None
+                with self.counts_lock:
+                    self.skipped += 1
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            if profiler is not None:
+                profiler.disable()
+            if self.sampler is not None:
+                self.sampler.unwatch()
+
+        slow = elapsed_ms >= self.threshold_ms
+        if not slow and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return
+        if samples is None and profiler is None:
+            return
+        profile = {
+            'query': trace.query,
+            'terms': trace.terms,
+            'dfs': self._document_frequencies(trace),
+            'elapsed_ms': elapsed_ms,
+            'slow': slow,
+            'timestamp': time.time(),
+            'pid': os.getpid(),
+            'kind': self.mode,
+            'trace': trace.to_dict()
+        }
+        try:
+            self.pending.put_nowait((profile, samples, profiler))
+        except queue.Full:
+            with self.counts_lock:
+                self.dropped += 1
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            profile, samples, profiler = item
+            try:
+                if samples is not None:
+                    profile['functions'] = self._functions_from_samples(samples)
+                    profile['stacks'] = [[list(stack), count] for stack, count in samples.most_common()]
+                else:
+                    profile['functions'] = self._functions_from_cprofile(profiler)
+                    profile['stacks'] = []
+                self._write(profile)
+            except Exception as e:
+                print(f"Query profile not written: {e}")
+            finally:
+                self.pending.task_done()
+
+    def flush(self) -> None:
+        """Wait until every queued profile is written"""
+        self.pending.join()
+
+    def close(self) -> None:
+        """Write the queued profiles and stop the writer thread"""
+        self.pending.put(None)
+        self.writer.join()
+
+    def _functions_from_samples(self, samples: Counter) -> Dict[str, Dict[str, float]]:
+        """Self time from the leaf frame of each sample, total time from every distinct frame on its stack"""
+        functions = defaultdict(lambda: {'self_ms': 0.0, 'total_ms': 0.0, 'calls': 0})
+        for stack, count in samples.items():
+            sampled_ms = count * self.interval_ms
+            functions[stack[-1]]['self_ms'] += sampled_ms
+            for key in set(stack):
+                functions[key]['total_ms'] += sampled_ms
+        return dict(functions)
+
+    @staticmethod
+    def _functions_from_cprofile(profiler: cProfile.Profile) -> Dict[str, Dict[str, float]]:
+        functions = {}
+        for (filename, line, name), (_, calls, self_s, total_s, _) in pstats.Stats(profiler).stats.items():
+            functions[f"{filename}:{line}({name})"] = {
+                'self_ms': self_s * 1000,
+                'total_ms': total_s * 1000,
+                'calls': calls
+            }
+        return functions
+
+    @staticmethod
+    def _document_frequencies(trace: QueryTrace) -> Dict[str, int]:
+        """
+        Postings count of each term as the query fetched it, so nothing is read again.
+        When the champion tier answered, that is the length of the term's champion list.
+        """
+        return {term: trace.fetches[term]['postings'] if term in trace.fetches else 0
+                for term in dict.fromkeys(trace.terms)}
+
+    def _write(self, profile: Dict) -> None:
+        """Called from the writer thread only"""
+        name = f"{int(profile['timestamp'] * 1000)}_{profile['pid']}_{profile['elapsed_ms']:.0f}ms.json"
+        tmp_path = self.out_dir / f".{name}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(profile, f)
+        path = self.out_dir / name
+        os.replace(tmp_path, path)
+        if not self.files or self.files[-1] != path:   # Same name in the same millisecond replaces the file
+            self.files.append(path)
+        self.written += 1
+
+        while len(self.files) > self.max_files:
+            self.files.popleft().unlink(missing_ok=True)
+
+
+def load_profiles(profile_dir: str, min_ms: float = 0.0, slow_only: bool = True) -> List[Dict]:
+    """Read the profiles in a directory, skipping files that are mid-write or were rotated away"""
+    profiles = []
+    for path in sorted(Path(profile_dir).glob("*.json")):
+        try:
+            with open(path) as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if profile['elapsed_ms'] >= min_ms and (profile['slow'] or not slow_only):
+            profiles.append(profile)
+    return profiles
+
+
+def aggregate_functions(profiles: List[Dict]) -> Dict[str, Dict[str, float]]:
+    """Sum per-function time over profiles, with the number of profiles each function appeared in"""
+    totals = defaultdict(lambda: {'self_ms': 0.0, 'total_ms': 0.0, 'calls': 0, 'queries': 0})
+    for profile in profiles:
+        for key, stats in profile['functions'].items():
+            entry = totals[key]
+            entry['self_ms'] += stats['self_ms']
+            entry['total_ms'] += stats['total_ms']
+            entry['calls'] += stats['calls']
+            entry['queries'] += 1
+    return dict(totals)
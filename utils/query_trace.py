@@ -0,0 +1,306 @@
+import json
+import time
+import heapq
+import bisect
+import threading
+
+from contextlib import contextmanager
+from collections import Counter, deque
+from typing import Dict, List, Optional, Sequence
+
+# Upper bounds of the latency histogram buckets in milliseconds, +Inf is implicit
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Query pipeline stages in execution order, the keys of QueryTrace.spans
+TRACE_STAGES = ("tokenize", "spell", "result_cache", "lookup", "fetch", "score", "topk", "rerank", "materialize", "snippets")
+
+
+class QueryTrace:
+    """
+    Timing breakdown of one query.
+
+    Spans are milliseconds per pipeline stage (a stage entered twice, say a champion
+    fetch followed by a full fetch, accumulates). Postings fetches are recorded per
+    term; "lookup" and the byte counts come from those, and since terms are fetched
+    in parallel their lookup time is summed over threads rather than wall time.
+    """
+    def __init__(self, query: str):
+        self.query = query
+        self.started_at = time.perf_counter()
+        self.timestamp = time.time()
+        self.terms: List[str] = []
+        self.spans: Dict[str, float] = {}
+        self.fetches: Dict[str, Dict] = {}
+        self.result_count = 0
+        self.cached = False
+        self.coalesced = False   # Served by an identical query already in flight, no work of its own
+        self.approximate = False
+        self.correction: Optional[str] = None   # Spelling-corrected query, suggested or searched instead
+        self.total_ms = 0.0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage: str):
+        span_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, (time.perf_counter() - span_start) * 1000)
+
+    def add(self, stage: str, elapsed_ms: float) -> None:
+        with self.lock:
+            self.spans[stage] = self.spans.get(stage, 0.0) + elapsed_ms
+
+    def record_fetch(self, term: str, cache_hit: bool, bytes_read: int, lookup_ms: float, postings: int) -> None:
+        """Note one postings list fetch, called from the fetching thread"""
+        with self.lock:
+            self.spans['lookup'] = self.spans.get('lookup', 0.0) + lookup_ms
+            self.fetches[term] = {
+                'cache_hit': cache_hit,
+                'bytes_read': bytes_read,
+                'postings': postings
+            }
+
+    def merge(self, parts: Sequence["QueryTrace"]) -> None:
+        """
+        Fold in the traces of parts of this query that ran in parallel, such as its
+        shards: each stage adds the slowest part's time, and a term's fetches add up.
+        """
+        with self.lock:
+            for stage in {stage for part in parts for stage in part.spans}:
+                self.spans[stage] = self.spans.get(stage, 0.0) + max(part.spans.get(stage, 0.0) for part in parts)
+            for part in parts:
+                for term, fetch in part.fetches.items():
+                    merged = self.fetches.setdefault(term, {'cache_hit': True, 'bytes_read': 0, 'postings': 0})
+                    merged['cache_hit'] = merged['cache_hit'] and fetch['cache_hit']
+                    merged['bytes_read'] += fetch['bytes_read']
+                    merged['postings'] += fetch['postings']
+
+    def finish(self, results: Sequence) -> "QueryTrace":
+        self.total_ms = (time.perf_counter() - self.started_at) * 1000
+        self.result_count = len(results)
+        self.approximate = any(result.approximate for result in results)
+        return self
+
+    @property
+    def cache_hits(self) -> int:
+        return sum(fetch['cache_hit'] for fetch in self.fetches.values())
+
+    @property
+    def cache_misses(self) -> int:
+        return len(self.fetches) - self.cache_hits
+
+    @property
+    def bytes_read(self) -> int:
+        return sum(fetch['bytes_read'] for fetch in self.fetches.values())
+
+    def to_dict(self) -> Dict:
+        return {
+            'query': self.query,
+            'timestamp': self.timestamp,
+            'terms': self.terms,
+            'total_ms': self.total_ms,
+            'spans': dict(self.spans),
+            'fetches': dict(self.fetches),
+            'result_count': self.result_count,
+            'cached': self.cached,
+            'coalesced': self.coalesced,
+            'approximate': self.approximate,
+            'correction': self.correction
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "QueryTrace":
+        """Rebuild a trace sent from another process"""
+        trace = cls(data['query'])
+        trace.timestamp = data['timestamp']
+        trace.terms = data['terms']
+        trace.total_ms = data['total_ms']
+        trace.spans = data['spans']
+        trace.fetches = data['fetches']
+        trace.result_count = data['result_count']
+        trace.cached = data['cached']
+        trace.coalesced = data.get('coalesced', False)
+        trace.approximate = data['approximate']
+        trace.correction = data.get('correction')
+        return trace
+
+    def summary(self) -> str:
+        """One-line breakdown for interactive use"""
+        spans = ", ".join(f"{stage} {self.spans[stage]:.1f}" for stage in TRACE_STAGES if stage in self.spans)
+        cache = "result cache hit" if self.cached else (
+            f"{self.cache_hits}/{len(self.fetches)} postings cached, {self.bytes_read / 1024:.1f} KB read"
+        )
+        return f"{self.total_ms:.1f} ms ({spans}); {cache}"
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout"""
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside its bucket, as histogram_quantile() does"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for idx, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if idx == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[idx - 1] if idx else 0.0
+                return lower + (self.buckets[idx] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class QueryMetrics:
+    """
+    Aggregates query traces: per-stage latency histograms, postings cache and
+    byte counters, the most queried terms, and the slowest recent queries.
+    With trace_log set, every trace is also appended to that JSON lines file.
+    """
+    def __init__(self, max_traces: int = 1000, slow_queries_kept: int = 20, hot_terms_kept: int = 1000,
+                 trace_log: Optional[str] = None):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.result_cache_hits = 0
+        self.coalesced = 0
+        self.approximate = 0
+        self.empty = 0
+        self.postings_hits = 0
+        self.postings_misses = 0
+        self.bytes_read = 0
+        self.total = Histogram()
+        self.stages: Dict[str, Histogram] = {stage: Histogram() for stage in TRACE_STAGES}
+        self.term_counts: Counter = Counter()
+        self.hot_terms_kept = hot_terms_kept
+        self.recent: deque = deque(maxlen=max_traces)
+        self.slow_queries_kept = slow_queries_kept
+        self.slowest: List = []   # Min-heap of (total_ms, sequence, trace)
+        self.trace_log_path = trace_log
+        self.trace_log = None   # Opened on the first trace
+
+    def record(self, trace: QueryTrace) -> None:
+        with self.lock:
+            self.queries += 1
+            self.result_cache_hits += trace.cached
+            self.coalesced += trace.coalesced
+            self.approximate += trace.approximate
+            self.empty += trace.result_count == 0
+            self.postings_hits += trace.cache_hits
+            self.postings_misses += trace.cache_misses
+            self.bytes_read += trace.bytes_read
+            self.total.observe(trace.total_ms)
+            for stage, elapsed_ms in trace.spans.items():
+                self.stages.setdefault(stage, Histogram()).observe(elapsed_ms)
+
+            self.term_counts.update(trace.terms)
+            if len(self.term_counts) > 10 * self.hot_terms_kept:
+                # Keep memory bounded, the tail is noise anyway
+                self.term_counts = Counter(dict(self.term_counts.most_common(self.hot_terms_kept)))
+
+            self.recent.append(trace)
+            entry = (trace.total_ms, self.queries, trace)
+            if len(self.slowest) < self.slow_queries_kept:
+                heapq.heappush(self.slowest, entry)
+            elif trace.total_ms > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+            if self.trace_log_path:
+                if self.trace_log is None:
+                    self.trace_log = open(self.trace_log_path, "a")
+                self.trace_log.write(json.dumps(trace.to_dict()) + "\n")
+                self.trace_log.flush()
+
+    def close(self) -> None:
+        """Close the trace log; a later trace reopens it"""
+        with self.lock:
+            if self.trace_log is not None:
+                self.trace_log.close()
+                self.trace_log = None
+
+    def hot_terms(self, n: int = 20) -> List:
+        with self.lock:
+            return self.term_counts.most_common(n)
+
+    def slow_queries(self, n: Optional[int] = None) -> List[QueryTrace]:
+        with self.lock:
+            return [trace for _, _, trace in sorted(self.slowest, key=lambda entry: entry[0], reverse=True)[:n]]
+
+    def last_trace(self) -> Optional[QueryTrace]:
+        with self.lock:
+            return self.recent[-1] if self.recent else None
+
+    def stats(self) -> Dict:
+        with self.lock:
+            lookups = self.postings_hits + self.postings_misses
+            return {
+                'queries': self.queries,
+                'result_cache_hit_rate': self.result_cache_hits / self.queries if self.queries else 0.0,
+                'coalesced': self.coalesced,
+                'postings_cache_hit_rate': self.postings_hits / lookups if lookups else 0.0,
+                'bytes_read': self.bytes_read,
+                'approximate': self.approximate,
+                'empty': self.empty,
+                'latency_ms': {
+                    stage: {
+                        'count': histogram.count,
+                        'mean': histogram.sum / histogram.count,
+                        'p50': histogram.quantile(0.5),
+                        'p95': histogram.quantile(0.95),
+                        'p99': histogram.quantile(0.99)
+                    }
+                    for stage, histogram in (('total', self.total), *self.stages.items())
+                    if histogram.count
+                }
+            }
+
+    def to_prometheus(self, prefix: str = "search") -> str:
+        """Counters and histograms in the Prometheus text exposition format (latencies in seconds)"""
+        lines = []
+
+        def counter(name: str, help_text: str, value: float) -> None:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            lines.append(f"{prefix}_{name} {value}")
+
+        def histogram(name: str, histogram: Histogram, labels: str = "") -> None:
+            cumulative = 0
+            for bound, bucket_count in zip((*histogram.buckets, None), histogram.counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound is None else repr(bound / 1000)
+                lines.append(f'{prefix}_{name}_bucket{{{labels}le="{le}"}} {cumulative}')
+            selector = f"{{{labels.rstrip(',')}}}" if labels else ""
+            lines.append(f"{prefix}_{name}_sum{selector} {histogram.sum / 1000}")
+            lines.append(f"{prefix}_{name}_count{selector} {histogram.count}")
+
+        with self.lock:
+            counter("queries_total", "Queries served.", self.queries)
+            counter("result_cache_hits_total", "Queries answered from the result cache.", self.result_cache_hits)
+            counter("coalesced_queries_total", "Queries that shared an identical in-flight query's results.", self.coalesced)
+            counter("approximate_results_total", "Queries cut short by their deadline.", self.approximate)
+            counter("empty_results_total", "Queries with no results.", self.empty)
+            counter("postings_cache_hits_total", "Postings lists served from the cache.", self.postings_hits)
+            counter("postings_cache_misses_total", "Postings lists read from the index file.", self.postings_misses)
+            counter("postings_read_bytes_total", "Bytes of postings read from the index file.", self.bytes_read)
+
+            lines.append(f"# HELP {prefix}_query_duration_seconds End-to-end query latency.")
+            lines.append(f"# TYPE {prefix}_query_duration_seconds histogram")
+            histogram("query_duration_seconds", self.total)
+
+            lines.append(f"# HELP {prefix}_stage_duration_seconds Latency of each query pipeline stage.")
+            lines.append(f"# TYPE {prefix}_stage_duration_seconds histogram")
+            for stage, stage_histogram in self.stages.items():
+                if stage_histogram.count:
+                    histogram("stage_duration_seconds", stage_histogram, f'stage="{stage}",')
+        return "\n".join(lines) + "\n"
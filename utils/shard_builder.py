@@ -0,0 +1,107 @@
+import json
+import pickle
+
+from pathlib import Path
+from typing import Dict, List
+
+from utils.index_generator import IndexGenerator
+from utils.constants import (
+    INDEX_PEEK_FILE,
+    SHARD_DIR,
+    DOCS_FILE,
+    LINK_SCORES_FILE,
+    CONFIG
+)
+
+
+def shard_paths(shard_id: int, shard_dir: str = SHARD_DIR) -> Dict[str, Path]:
+    """File layout of one shard, mirroring the unsharded full_analytics files"""
+    root = Path(shard_dir) / f"shard_{shard_id}"
+    return {
+        'dir': root,
+        'index': root / "index_peek.pkl",
+        'map': root / "index_map_position.json",
+        'champions': root / "index_champions.pkl",
+        'champion_map': root / "index_map_champions.json"
+    }
+
+
+class ShardBuilder:
+    """
+    Splits the merged index into N document-partitioned shards.
+
+    A document lives in shard doc_id % N, so every shard gets its own dictionary
+    and postings for the documents it owns. The tf-idf values carried by the
+    postings were computed against corpus-wide document frequencies before the
+    split, so scores from different shards are directly comparable; those
+    global statistics are also written to the shard manifest.
+    """
+    def __init__(self, num_shards: int = None, index_pickle: str = INDEX_PEEK_FILE, shard_dir: str = SHARD_DIR,
+                 docs_path: str = DOCS_FILE, link_scores_path: str = LINK_SCORES_FILE):
+        self.num_shards = num_shards or CONFIG['num_shards']
+        self.index_pickle = Path(index_pickle)
+        self.shard_dir = Path(shard_dir)
+        self.docs_path = Path(docs_path)
+        self.link_scores_path = Path(link_scores_path)
+
+    def build(self) -> None:
+        paths = [shard_paths(shard_id, self.shard_dir) for shard_id in range(self.num_shards)]
+        for shard in paths:
+            shard['dir'].mkdir(parents=True, exist_ok=True)
+
+        shard_files = [open(shard['index'], "wb") for shard in paths]
+        seek_positions: List[Dict[str, int]] = [{} for _ in paths]
+        global_df: Dict[str, int] = {}
+
+        try:
+            with open(self.index_pickle, "rb") as pkl_file:
+                while True:
+                    try:
+                        term, postings = pickle.load(pkl_file)
+                    except EOFError:
+                        break
+
+                    global_df[term] = len(postings)
+                    split: List[List] = [[] for _ in paths]
+                    for posting in postings:
+                        split[posting[0] % self.num_shards].append(posting)
+
+                    for shard_id, shard_postings in enumerate(split):
+                        if shard_postings:
+                            seek_positions[shard_id][term] = shard_files[shard_id].tell()
+                            pickle.dump((term, shard_postings), shard_files[shard_id], protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            for shard_file in shard_files:
+                shard_file.close()
+
+        for shard, positions in zip(paths, seek_positions):
+            with open(shard['map'], "w") as f:
+                json.dump(positions, f)
+            # Each shard gets its own tier-1 champion lists
+            IndexGenerator(
+                index_path=self.index_pickle,
+                output_pickle=shard['index'],
+                output_json=shard['map'],
+                champion_pickle=shard['champions'],
+                champion_json=shard['champion_map'],
+                docs_path=self.docs_path,
+                link_scores_path=self.link_scores_path
+            ).generate_champion_index()
+
+        with open(self.docs_path) as f:
+            doc_ids = [int(doc_id) for doc_id in json.load(f)]
+
+        manifest = {
+            'num_shards': self.num_shards,
+            'num_docs': len(doc_ids),
+            'docs_per_shard': [
+                sum(1 for doc_id in doc_ids if doc_id % self.num_shards == shard_id)
+                for shard_id in range(self.num_shards)
+            ],
+            'terms_per_shard': [len(positions) for positions in seek_positions],
+            'global_df': global_df
+        }
+        with open(self.shard_dir / "manifest.json", "w") as f:
+            json.dump(manifest, f)
+
+        print(f"Split index into {self.num_shards} shards under {self.shard_dir}")
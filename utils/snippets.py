@@ -0,0 +1,104 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils.tokenizer import TOKEN_PATTERN
+from utils.doc_store import DocumentStore
+from utils.constants import CONFIG
+
+
+@dataclass(frozen=True)
+class Snippet:
+    text: str
+    highlights: Tuple[Tuple[int, int], ...]   # Character spans [start, end) of the query terms in text
+
+    def marked(self, before: str = "**", after: str = "**", escape: Callable[[str], str] = str) -> str:
+        """The text with every highlight wrapped in before/after, the text itself passed through escape"""
+        pieces = []
+        end = 0
+        for start, stop in self.highlights:
+            pieces.extend((escape(self.text[end:start]), before, escape(self.text[start:stop]), after))
+            end = stop
+        pieces.append(escape(self.text[end:]))
+        return "".join(pieces)
+
+
+def _token_end(text: str, offset: int) -> int:
+    """
+    End of the token starting at offset. Tokens are found in the lowercased text,
+    so the original character may not match the pattern (the Kelvin sign lowercases
+    to 'k'), in which case only that character is taken.
+    """
+    match = TOKEN_PATTERN.match(text, offset)
+    return match.end() if match else min(offset + 1, len(text))
+
+
+def best_window(hits: List[Tuple[int, str]], window: int) -> Tuple[int, int]:
+    """
+    First and last position of the hits inside the best run of `window` tokens:
+    the one covering the most distinct terms, then the most hits, then the earliest.
+    hits are (position, term) pairs sorted by position.
+    """
+    counts: Counter = Counter()
+    best = None
+    lo = 0
+    for hi, (position, term) in enumerate(hits):
+        counts[term] += 1
+        while position - hits[lo][0] >= window:
+            counts[hits[lo][1]] -= 1
+            if not counts[hits[lo][1]]:
+                del counts[hits[lo][1]]
+            lo += 1
+        rank = (len(counts), hi - lo + 1)
+        if best is None or rank > best[0]:
+            best = (rank, hits[lo][0], position)
+    return best[1], best[2]
+
+
+class SnippetGenerator:
+    """
+    Query-biased snippets cut from the document store.
+
+    The postings already hold every position of the query terms in a result, and
+    the store maps positions to character offsets, so the best window is found
+    from the positions alone and only its slice of the text is touched: nothing
+    is re-tokenized or scanned at query time. Documents without a matched
+    position get their opening window.
+    """
+    def __init__(self, store: DocumentStore, window_tokens: int = CONFIG['snippet_tokens']):
+        self.store = store
+        self.window_tokens = window_tokens
+
+    def snippet(self, doc_id: int, positions: Dict[str, Sequence[int]]) -> Optional[Snippet]:
+        """Snippet of a document given the token positions of each matched query term"""
+        document = self.store.get(doc_id)
+        if document is None:
+            return None
+        text, offsets = document
+        if not offsets:
+            return None
+        hits = sorted(
+            (position, term)
+            for term, term_positions in positions.items()
+            for position in term_positions
+            if position < len(offsets)
+        )
+
+        # Center the matched span in the window, without running past either end of the document
+        start = 0
+        if hits:
+            first, last = best_window(hits, self.window_tokens)
+            start = first - (self.window_tokens - (last - first + 1)) // 2
+            start = max(0, min(start, len(offsets) - self.window_tokens))
+        end = min(start + self.window_tokens, len(offsets)) - 1
+
+        prefix = "... " if start > 0 else ""
+        suffix = " ..." if end < len(offsets) - 1 else ""
+        base = offsets[start] - len(prefix)
+        highlights = tuple(
+            (offsets[position] - base, _token_end(text, offsets[position]) - base)
+            for position, _ in hits
+            if start <= position <= end
+        )
+        body = text[offsets[start]:_token_end(text, offsets[end])]
+        return Snippet(prefix + body + suffix, highlights)
@@ -0,0 +1,192 @@
+import zlib
+import bisect
+import pickle
+
+from array import array
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set
+
+from utils.tokenizer import TOKEN_PATTERN, get_stemmer
+from utils.constants import STOP_WORDS, CONFIG
+
+
+@dataclass
+class Correction:
+    word: str          # As typed
+    suggestion: str    # Dictionary word replacing it
+    distance: int      # Edit distance between the two
+    df: int            # Documents containing the suggestion's stem
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    """The word and every string made by deleting up to max_distance of its characters"""
+    deletes = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {candidate[:i] + candidate[i + 1:] for candidate in frontier for i in range(len(candidate))}
+        deletes |= frontier
+    return deletes
+
+
+def _key(delete: str) -> int:
+    return zlib.crc32(delete.encode("utf-8"))
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Optimal string alignment distance (adjacent swaps count as one edit), max_distance + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    # A shared prefix and suffix cost nothing, only the middle needs the table
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return min(len(a) + len(b), max_distance + 1)
+
+    # Only cells within max_distance of the diagonal can stay under the limit, the rest are left at it
+    over = max_distance + 1
+    previous_previous = None
+    previous = [j if j <= max_distance else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        current[0] = row_min = i if i <= max_distance else over
+        char = a[i - 1]
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            value = previous[j - 1] + (char != b[j - 1])
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if (previous_previous is not None and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1]
+                    and previous_previous[j - 2] + 1 < value):
+                value = previous_previous[j - 2] + 1
+            current[j] = value if value < over else over
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return over
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class SpellingCorrector:
+    """
+    Symmetric-delete (SymSpell) spelling correction over the corpus vocabulary.
+
+    Every dictionary word's prefix is indexed under each string obtained by
+    deleting up to max_edit_distance characters from it. A misspelling within that
+    distance shares at least one such delete with the word, so a lookup generates
+    the deletes of the typed word and only measures the edit distance to the few
+    words they lead to, instead of to the whole vocabulary. Deletes are stored as
+    a sorted array of (crc32 of delete, word id) packed in 64 bits; hash
+    collisions only add candidates, which the distance check then rejects.
+    """
+    def __init__(self, words: List[str], dfs: array, keys: array, max_edit_distance: int, prefix_length: int):
+        self.words = words
+        self.dfs = dfs                  # Per word, documents containing its stem
+        self.keys = keys                # Sorted crc32(delete) << 32 | word id
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+
+    @classmethod
+    def build(cls, surface_counts: Dict[str, int], dfs: Dict[str, int],
+              max_edit_distance: int = CONFIG['spelling_max_edit_distance'],
+              prefix_length: int = CONFIG['spelling_prefix_length'],
+              min_count: int = CONFIG['spelling_min_count']) -> "SpellingCorrector":
+        """Dictionary of the words seen at least min_count times whose stem is an index term"""
+        stemmer = get_stemmer()
+        words = []
+        word_dfs = array('I')
+        for surface, count in sorted(surface_counts.items()):
+            if count < min_count or surface in STOP_WORDS or not surface.isalpha():
+                continue
+            stem = stemmer.stem(surface)
+            if stem in dfs:
+                words.append(surface)
+                word_dfs.append(dfs[stem])
+
+        keys = sorted(
+            _key(delete) << 32 | word_id
+            for word_id, word in enumerate(words)
+            for delete in _deletes(word[:prefix_length], max_edit_distance)
+        )
+        return cls(words, word_dfs, array('Q', keys), max_edit_distance, prefix_length)
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            pickle.dump({
+                'words': self.words,
+                'dfs': self.dfs,
+                'keys': self.keys,
+                'max_edit_distance': self.max_edit_distance,
+                'prefix_length': self.prefix_length
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> "SpellingCorrector":
+        with open(path, "rb") as f:
+            return cls(**pickle.load(f))
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def _candidates(self, word: str) -> Set[int]:
+        candidates = set()
+        for delete in _deletes(word[:self.prefix_length], self.max_edit_distance):
+            key = _key(delete) << 32
+            idx = bisect.bisect_left(self.keys, key)
+            while idx < len(self.keys) and self.keys[idx] >> 32 == key >> 32:
+                candidates.add(self.keys[idx] & 0xFFFFFFFF)
+                idx += 1
+        return candidates
+
+    def lookup(self, word: str) -> Optional[Correction]:
+        """Closest dictionary word within max_edit_distance, the most widespread one among equally close words"""
+        word = word.lower()
+        best = None
+        best_rank = None
+        for word_id in self._candidates(word):
+            candidate = self.words[word_id]
+            # Once a match is found, farther candidates are cut off as soon as they exceed its distance
+            limit = best_rank[0] if best_rank is not None else self.max_edit_distance
+            distance = edit_distance(word, candidate, limit)
+            if distance > limit:
+                continue
+            rank = (distance, -self.dfs[word_id], candidate)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = word_id, rank
+        if best is None:
+            return None
+        return Correction(word, self.words[best], best_rank[0], self.dfs[best])
+
+    def correct(self, query: str, is_known: Callable[[str], bool]) -> Optional[str]:
+        """
+        The query with each word whose stem is_known rejects replaced by its correction,
+        None when no word needed (or had) one. Quotes and spacing are kept.
+        """
+        stemmer = get_stemmer()
+        pieces = []
+        end = 0
+        changed = False
+        for match in TOKEN_PATTERN.finditer(query):
+            word = match.group().lower()
+            if word in STOP_WORDS or not word.isalpha():
+                continue
+            stem = stemmer.stem(word)
+            if len(stem) == 1 or is_known(stem):
+                continue
+            correction = self.lookup(word)
+            if correction is None or correction.suggestion == word:
+                continue
+            pieces.append(query[end:match.start()])
+            pieces.append(correction.suggestion)
+            end = match.end()
+            changed = True
+        if not changed:
+            return None
+        pieces.append(query[end:])
+        return "".join(pieces)
@@ -0,0 +1,33 @@
+import threading
+
+from collections import defaultdict, deque
+from typing import Dict
+
+
+class StageTimings:
+    """Per-stage latency samples for the ranking pipeline"""
+    def __init__(self, max_samples: int = 10000):
+        self.lock = threading.Lock()
+        self.max_samples = max_samples
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.totals_ms: Dict[str, float] = defaultdict(float)
+        self.samples: Dict[str, deque] = {}
+
+    def record(self, stage: str, elapsed_ms: float) -> None:
+        with self.lock:
+            self.counts[stage] += 1
+            self.totals_ms[stage] += elapsed_ms
+            self.samples.setdefault(stage, deque(maxlen=self.max_samples)).append(elapsed_ms)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self.lock:
+            summary = {}
+            for stage, samples in self.samples.items():
+                ordered = sorted(samples)
+                summary[stage] = {
+                    'count': self.counts[stage],
+                    'mean_ms': self.totals_ms[stage] / self.counts[stage],
+                    'p50_ms': ordered[len(ordered) // 2],
+                    'p99_ms': ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))]
+                }
+            return summary
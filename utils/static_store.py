@@ -0,0 +1,231 @@
+import json
+import mmap
+import bisect
+
+from array import array
+from pathlib import Path
+from collections.abc import Mapping
+from typing import Iterator, Optional, Tuple
+
+from utils.link_quality import static_quality
+from utils.constants import (
+    DOCS_FILE,
+    LINK_SCORES_FILE,
+    INDEX_MAP_FILE,
+    INDEX_CHAMPION_MAP_FILE,
+    STATIC_DIR
+)
+
+
+# One file per flat array, so every process can map it read-only and share the page cache
+DOC_URL_OFFSETS = "doc_url_offsets.bin"     # uint64[max_doc_id + 2], url byte ranges by doc_id
+DOC_URLS = "doc_urls.bin"                   # utf-8 urls back to back
+DOC_SCORES = "doc_scores.bin"               # float64[max_doc_id + 1][4]: authority, hub, pagerank, static blend
+TERM_OFFSETS = "term_offsets.bin"           # uint64[num_terms + 1], term byte ranges in sorted order
+TERMS = "terms.bin"                         # utf-8 terms sorted bytewise
+TERM_SEEKS = "term_seeks.bin"               # uint64[num_terms], postings offset of each sorted term
+SORTED_SEEKS = "sorted_seeks.bin"           # uint64[num_terms], postings offsets ascending (record boundaries)
+CHAMPION_PREFIX = "champion_"               # Same four term files for the tier-1 champion index
+META = "meta.json"
+
+SCORE_FIELDS = 4
+
+
+class StaticStoreBuilder:
+    """Converts documents.json, link_scores.json and the term maps into flat binary arrays"""
+    def __init__(self, static_dir: str = STATIC_DIR, docs_path: str = DOCS_FILE,
+                 link_scores_path: str = LINK_SCORES_FILE, index_map_path: str = INDEX_MAP_FILE,
+                 champion_map_path: str = INDEX_CHAMPION_MAP_FILE):
+        self.static_dir = Path(static_dir)
+        self.docs_path = Path(docs_path)
+        self.link_scores_path = Path(link_scores_path)
+        self.index_map_path = Path(index_map_path)
+        self.champion_map_path = Path(champion_map_path)
+
+    def build(self) -> None:
+        self.static_dir.mkdir(parents=True, exist_ok=True)
+
+        with open(self.docs_path) as f:
+            documents = {int(doc_id): doc['url'] for doc_id, doc in json.load(f).items()}
+        try:
+            with open(self.link_scores_path) as f:
+                link_scores = json.load(f)
+        except FileNotFoundError:
+            link_scores = {'hits': {'authority': {}, 'hub': {}}, 'pagerank': {}}
+
+        # Documents, addressed directly by doc_id
+        num_slots = max(documents, default=-1) + 1
+        url_offsets = array('Q', [0])
+        scores = array('d')
+        with open(self.static_dir / DOC_URLS, "wb") as url_file:
+            for doc_id in range(num_slots):
+                url = documents.get(doc_id, "")
+                url_file.write(url.encode("utf-8"))
+                url_offsets.append(url_file.tell())
+
+                auth = link_scores['hits']['authority'].get(url, 0.0)
+                hub = link_scores['hits']['hub'].get(url, 0.0)
+                page_rank = link_scores['pagerank'].get(url, 0.0)
+                scores.extend((auth, hub, page_rank, static_quality(auth, hub, page_rank)))
+        self._write_array(DOC_URL_OFFSETS, url_offsets)
+        self._write_array(DOC_SCORES, scores)
+
+        num_terms = self._write_term_dictionary(self.index_map_path)
+        num_champion_terms = 0
+        if self.champion_map_path.exists():
+            num_champion_terms = self._write_term_dictionary(self.champion_map_path, CHAMPION_PREFIX)
+
+        with open(self.static_dir / META, "w") as f:
+            json.dump({
+                'num_docs': len(documents),
+                'doc_slots': num_slots,
+                'num_terms': num_terms,
+                'num_champion_terms': num_champion_terms
+            }, f)
+        print(f"Static store written to {self.static_dir} ({len(documents)} docs, {num_terms} terms)")
+
+    def _write_term_dictionary(self, map_path: Path, prefix: str = "") -> int:
+        """Term map sorted for binary search, plus the record boundaries of its index file"""
+        with open(map_path) as f:
+            seek_positions = json.load(f)
+        encoded = sorted((term.encode("utf-8"), seek) for term, seek in seek_positions.items())
+        term_offsets = array('Q', [0])
+        with open(self.static_dir / (prefix + TERMS), "wb") as term_file:
+            for term_bytes, _ in encoded:
+                term_file.write(term_bytes)
+                term_offsets.append(term_file.tell())
+        self._write_array(prefix + TERM_OFFSETS, term_offsets)
+        self._write_array(prefix + TERM_SEEKS, array('Q', (seek for _, seek in encoded)))
+        self._write_array(prefix + SORTED_SEEKS, array('Q', sorted(seek_positions.values())))
+        return len(encoded)
+
+    def _write_array(self, name: str, values: array) -> None:
+        with open(self.static_dir / name, "wb") as f:
+            values.tofile(f)
+
+
+class MappedTermMap(Mapping):
+    """Read-only term -> postings offset mapping, binary searched over the mapped sorted term table"""
+    def __init__(self, terms: memoryview, term_offsets: memoryview, term_seeks: memoryview):
+        self.terms = terms
+        self.term_offsets = term_offsets
+        self.term_seeks = term_seeks
+
+    def _term_at(self, idx: int) -> bytes:
+        return bytes(self.terms[self.term_offsets[idx]:self.term_offsets[idx + 1]])
+
+    def _find(self, term: str) -> Optional[int]:
+        target = term.encode("utf-8")
+        lo, hi = 0, len(self.term_seeks)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term_at(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.term_seeks) and self._term_at(lo) == target:
+            return lo
+        return None
+
+    def __getitem__(self, term: str) -> int:
+        idx = self._find(term)
+        if idx is None:
+            raise KeyError(term)
+        return self.term_seeks[idx]
+
+    def __contains__(self, term) -> bool:
+        return isinstance(term, str) and self._find(term) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for idx in range(len(self.term_seeks)):
+            yield self._term_at(idx).decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self.term_seeks)
+
+
+class MappedTermDictionary:
+    """Term map and record boundaries of one index file, the part of the store a FileHandler needs"""
+    def __init__(self, term_map: MappedTermMap, sorted_seeks: memoryview):
+        self.term_map = term_map
+        self.sorted_seeks = sorted_seeks
+
+
+class MappedStaticStore:
+    """
+    Memory-mapped view of the static index structures.
+
+    Nothing is parsed into Python dicts: urls, link scores and the term dictionary
+    are read straight out of read-only mappings, so any number of searcher
+    processes share one copy through the OS page cache.
+    """
+    def __init__(self, static_dir: str = STATIC_DIR):
+        self.static_dir = Path(static_dir)
+        self.files = []
+        self.maps = []
+        self.views = []
+
+        self.url_offsets = self._map(DOC_URL_OFFSETS, 'Q')
+        self.urls = self._map(DOC_URLS)
+        self.scores = self._map(DOC_SCORES, 'd')
+        self.term_map, self.sorted_seeks = self._map_term_dictionary()
+        self.doc_slots = len(self.url_offsets) - 1
+
+        # Tier-1 champion dictionary, for handlers opened on the champion index
+        self.champions: Optional[MappedTermDictionary] = None
+        if (self.static_dir / (CHAMPION_PREFIX + TERMS)).exists():
+            self.champions = MappedTermDictionary(*self._map_term_dictionary(CHAMPION_PREFIX))
+
+    def _map_term_dictionary(self, prefix: str = "") -> Tuple[MappedTermMap, memoryview]:
+        term_map = MappedTermMap(
+            self._map(prefix + TERMS),
+            self._map(prefix + TERM_OFFSETS, 'Q'),
+            self._map(prefix + TERM_SEEKS, 'Q')
+        )
+        return term_map, self._map(prefix + SORTED_SEEKS, 'Q')
+
+    def _map(self, name: str, fmt: Optional[str] = None) -> memoryview:
+        path = self.static_dir / name
+        if path.stat().st_size == 0:
+            view = memoryview(b"")
+        else:
+            f = open(path, "rb")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.files.append(f)
+            self.maps.append(mapped)
+            view = memoryview(mapped)
+        self.views.append(view)
+        if fmt:
+            view = view.cast(fmt)
+            self.views.append(view)
+        return view
+
+    def url(self, doc_id: int) -> str:
+        return bytes(self.urls[self.url_offsets[doc_id]:self.url_offsets[doc_id + 1]]).decode("utf-8")
+
+    def link_scores(self, doc_id: int) -> Tuple[float, float, float]:
+        """(authority, hub, pagerank) of a document"""
+        if doc_id >= self.doc_slots:
+            return 0.0, 0.0, 0.0
+        base = doc_id * SCORE_FIELDS
+        return self.scores[base], self.scores[base + 1], self.scores[base + 2]
+
+    def static_score(self, doc_id: int) -> float:
+        if doc_id >= self.doc_slots:
+            return 0.0
+        return self.scores[doc_id * SCORE_FIELDS + 3]
+
+    def close(self) -> None:
+        # Views onto a mapping must be released before the mapping can close
+        for view in reversed(self.views):
+            view.release()
+        for mapped in self.maps:
+            mapped.close()
+        for f in self.files:
+            f.close()
+
+
+def record_end(sorted_seeks, offset: int, file_size: int) -> int:
+    """End of the postings record starting at offset: the next record's start, or end of file"""
+    next_idx = bisect.bisect_right(sorted_seeks, offset)
+    return sorted_seeks[next_idx] if next_idx < len(sorted_seeks) else file_size
@@ -1,9 +1,22 @@
-import nltk
+import re
 
-from nltk.stem import PorterStemmer
-from nltk.tokenize import RegexpTokenizer
 from urllib.parse import urlparse
+from typing import List, Tuple
 from utils.constants import STOP_WORDS
+from utils.build_profiler import stage
+
+
+TOKEN_PATTERN = re.compile('[a-zA-Z0-9]+')
+_stemmer = None
+
+
+def get_stemmer():
+    """Shared Porter stemmer, nltk is only imported on first use since importing it takes seconds"""
+    global _stemmer
+    if _stemmer is None:
+        from nltk.stem import PorterStemmer
+        _stemmer = PorterStemmer()
+    return _stemmer
 
 
 def tokenize(text: str, for_query: bool = False) -> list:
@@ -11,24 +24,86 @@ def tokenize(text: str, for_query: bool = False) -> list:
     Tokenize and stem the input text.
 
     This function:
-    1. Uses NLTK's RegexpTokenizer to tokenize text into words
+    1. Splits text into alphanumeric words
     2. Converts to lowercase 
     3. Removes stop words
     4. Applies Porter stemming
     5. Removes single-character tokens
     """
-    # Initialize Porter Stemmer
-    stemmer = PorterStemmer()
+    stemmer = get_stemmer()
     
     # Tokenize text into words
-    re_tokenizer = RegexpTokenizer('[a-zA-Z0-9]+')
-    re_tokens = re_tokenizer.tokenize(text.lower())
+    with stage('tokenize'):
+        re_tokens = TOKEN_PATTERN.findall(text.lower())
 
     # Stem tokens
-    if for_query:
-        tokens = [stemmer.stem(token) for token in re_tokens if token.lower() not in STOP_WORDS]
-    else:
-        tokens = [stemmer.stem(token) for token in re_tokens]
+    with stage('stem'):
+        if for_query:
+            tokens = [stemmer.stem(token) for token in re_tokens if token.lower() not in STOP_WORDS]
+        else:
+            tokens = [stemmer.stem(token) for token in re_tokens]
 
     # Remove single-character tokens
-    return [token for token in tokens if len(token) != 1]
\ No newline at end of file
+    return [token for token in tokens if len(token) != 1]
+
+
+def token_offsets(text: str, stems: List[str]) -> List[int]:
+    """
+    Character offset in text of each token tokenize(text) returned as stems, so
+    a posting position can be mapped back to the page text.
+    """
+    lowered = text.lower()
+    words = [match for match in TOKEN_PATTERN.finditer(lowered) if len(match.group()) > 1]
+    if len(words) != len(stems):
+        # Only single-character stems are dropped, and a word longer than that almost never stems to one
+        stemmer = get_stemmer()
+        words = [match for match in words if len(stemmer.stem(match.group())) != 1]
+    if len(lowered) == len(text):
+        return [match.start() for match in words]
+    # Some characters lowercase to several ('İ' to 'i' and a combining dot), shifting
+    # the lowered text's offsets, so map them back to the character they came from
+    original = [offset for offset, char in enumerate(text) for _ in char.lower()]
+    return [original[match.start()] for match in words]
+
+
+def tokenize_phrase(text: str) -> List[Tuple[str, int]]:
+    """
+    Tokenize a quoted phrase into (stem, offset) pairs.
+
+    Offsets line up with the token positions stored in the index, which count
+    every token (stop words included) except single-character stems. Stop words
+    are dropped from the result but still advance the offset, unless the phrase
+    is made only of stop words.
+    """
+    stemmer = get_stemmer()
+
+    terms = []
+    offset = 0
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        stem = stemmer.stem(token)
+        if len(stem) == 1:
+            continue
+        terms.append((stem, offset, token in STOP_WORDS))
+        offset += 1
+
+    content_terms = [(stem, pos) for stem, pos, is_stop in terms if not is_stop]
+    return content_terms or [(stem, pos) for stem, pos, _ in terms]
+
+
+def parse_query(query: str) -> Tuple[List[str], List[List[Tuple[str, int]]]]:
+    """Split a query into bag-of-words terms and its quoted phrases"""
+    phrases = []
+    for phrase_text in re.findall(r'"([^"]+)"', query):
+        phrase = tokenize_phrase(phrase_text)
+        if len(phrase) > 1:
+            phrases.append(phrase)
+
+    terms = tokenize(query.replace('"', ' '), for_query=True)
+    # Stop-word-only phrases still need their terms fetched
+    seen = set(terms)
+    for phrase in phrases:
+        for stem, _ in phrase:
+            if stem not in seen:
+                terms.append(stem)
+                seen.add(stem)
+    return terms, phrases